@@ -1,7 +1,11 @@
 from django.contrib import admin
+from django.contrib.auth import get_permission_codename
+from django.core.exceptions import PermissionDenied
+from django.template.response import TemplateResponse
 
+from . import slow_queries
 from .models import User, Workout, MuscleGroup, StrengthTrainingExercise, EnduranceTrainingExercise, BalanceExercise, \
-    FlexibilityExercise, Exercise, Challenge
+    FlexibilityExercise, Exercise, Challenge, SlowQuery
 
 admin.site.register(User)
 admin.site.register(Workout)
@@ -56,3 +60,44 @@ admin.site.register(FlexibilityExercise, FlexibilityExerciseAdmin)
 admin.site.register(StrengthTrainingExercise, StrengthTrainingExerciseAdmin)
 admin.site.register(EnduranceTrainingExercise, EnduranceTrainingExerciseAdmin)
 admin.site.register(BalanceExercise, BalanceExerciseAdmin)
+
+
+class SlowQueryAdmin(admin.ModelAdmin):
+    """Lists the slow-query log of the answering process, slowest first; `SlowQuery` has no table to query."""
+    change_list_template = "admin/slow_queries.html"
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+    def has_clear_permission(self, request):
+        """Clearing the log takes the delete permission of `SlowQuery`, as there are no entries to delete one by one."""
+        opts = self.model._meta
+        return request.user.has_perm("%s.%s" % (opts.app_label, get_permission_codename("delete", opts)))
+
+    def changelist_view(self, request, extra_context=None):
+        if not self.has_view_permission(request):
+            raise PermissionDenied
+        can_clear = self.has_clear_permission(request)
+        if request.method == "POST" and "clear" in request.POST:
+            if not can_clear:
+                raise PermissionDenied
+            slow_queries.log.clear()
+        context = dict(
+            self.admin_site.each_context(request),
+            opts=self.model._meta,
+            title="Slow queries",
+            entries=slow_queries.log.get_entries(),
+            threshold_ms=slow_queries.get_threshold() * 1000,
+            can_clear=can_clear,
+            **(extra_context or {}),
+        )
+        return TemplateResponse(request, self.change_list_template, context)
+
+
+admin.site.register(SlowQuery, SlowQueryAdmin)
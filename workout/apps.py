@@ -1,6 +1,27 @@
 from django.apps import AppConfig
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save
 
 
 class WorkoutConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'workout'
+
+    def ready(self):
+        from . import page_cache
+        from .database import configure_connection
+        from .models import Challenge, MuscleGroup, UserChallenge, Workout
+        from .views_helper import get_exercises_types
+
+        # Tunes SQLite connections for concurrent server processes:
+        connection_created.connect(configure_connection, dispatch_uid="workout.database.configure_connection")
+
+        # Every change of a user's data makes their cached pages miss:
+        for signal in (post_save, post_delete):
+            signal.connect(page_cache.invalidate_workout, sender=Workout, dispatch_uid="workout.page_cache.workout")
+            signal.connect(page_cache.invalidate_owner, sender=UserChallenge, dispatch_uid="workout.page_cache.user_challenge")
+            signal.connect(page_cache.invalidate_participants, sender=Challenge, dispatch_uid="workout.page_cache.challenge")
+            # Muscle groups are shown on the pages of everyone using them:
+            signal.connect(page_cache.invalidate_all, sender=MuscleGroup, dispatch_uid="workout.page_cache.muscle_group")
+            for exercise_type in get_exercises_types():
+                signal.connect(page_cache.invalidate_owner, sender=exercise_type, dispatch_uid="workout.page_cache.%s" % exercise_type.__name__)
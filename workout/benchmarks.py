@@ -0,0 +1,230 @@
+"""
+benchmarks.py
+
+Per-view benchmarks: every page of `workout/urls.py` is requested through the Django test client
+against datasets of several sizes made by `manage.py seed_load`, recording wall time, SQL query
+count and peak memory. Results are checked against the per-view `VIEW_BUDGETS` and against a
+stored baseline, see `manage.py benchmark_views`.
+
+Query counts are the same on every machine, so the budgets and the baseline's query counts are a
+hard gate. Time and memory depend on the machine and its load: growth over the baseline is only
+reported by `check_timings()`, unless it's compared with a baseline made on the same machine.
+"""
+
+import io
+import statistics
+import time
+import tracemalloc
+
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import F
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from .models import ExerciseIndex, UserChallenge
+
+# `seed_load` options of each dataset size:
+BENCHMARK_SIZES = {
+    "small": {"users": 10, "workouts": 10, "exercises": 5},
+    "medium": {"users": 50, "workouts": 50, "exercises": 5},
+    "large": {"users": 200, "workouts": 100, "exercises": 5},
+}
+
+# GET routes, with the ids of the benchmark user's data filled in. Routes changing data (logout,
+# delete, complete, share, join and all POSTs) are left out so every size measures the same data:
+ROUTES = {
+    "login": "/",
+    "register": "/user/register",
+    "dashboard": "/dashboard",
+    "new_workout": "/workout",
+    "workout": "/workout/{workout_id}",
+    "edit_workout": "/workout/{workout_id}/edit",
+    "new_exercise": "/exercise",
+    "muscle_group": "/musclegroup",
+    "exercise": "/exercise/{exercise_id}?exercise_type={exercise_type}",
+    "view_all": "/history",
+    "profile": "/profile",
+    "edit_profile": "/profile/edit",
+    "edit_profile_password": "/profile/edit/password",
+    "profile_online": "/profile/{user_id}",
+    "statistics": "/statistics",
+    "challenges": "/challenges",
+    "view_challenge": "/challenge/{workout_id}",
+    "preview_challenge": "/prechallenge/{workout_id}",
+}
+
+# Upper limits per view: `queries` must not depend on the dataset size, `ms` is a generous latency cap.
+# Counts include the session and session user lookups:
+DEFAULT_BUDGET = {"queries": 10, "ms": 500}
+VIEW_BUDGETS = {
+    "login": {"queries": 2},
+    "register": {"queries": 2},
+    "dashboard": {"queries": 4},
+    "new_workout": {"queries": 3},
+    # One query per exercise type on the page:
+    "workout": {"queries": 8},
+    "edit_workout": {"queries": 7},
+    # Lists all of the user's exercises, so it's the slowest page on big accounts:
+    "new_exercise": {"queries": 9, "ms": 1000},
+    "muscle_group": {"queries": 3},
+    "exercise": {"queries": 8},
+    "view_all": {"queries": 9},
+    "profile": {"queries": 8},
+    "edit_profile": {"queries": 2},
+    "edit_profile_password": {"queries": 2},
+    "profile_online": {"queries": 8},
+    "statistics": {"queries": 10},
+    "challenges": {"queries": 4},
+    "view_challenge": {"queries": 10},
+    "preview_challenge": {"queries": 7},
+}
+
+# A view is slower than the baseline if its time or peak memory grew by more than `tolerance` and
+# more than these absolute amounts (which absorb timer and allocator noise):
+MIN_REGRESSION_MS = 5
+MIN_REGRESSION_KB = 64
+
+
+def get_budget(view):
+    return dict(DEFAULT_BUDGET, **VIEW_BUDGETS.get(view, {}))
+
+
+def get_route_arguments():
+    """
+    Picks the benchmark user and the ids the routes need.
+
+    The user is the owner of a seeded challenge, so the challenge pages are theirs to view.
+    """
+    user_challenge = (
+        UserChallenge.objects.filter(workout__user=F("user"))
+        .select_related("workout").order_by("id").first()
+    )
+    exercise = ExerciseIndex.objects.filter(user__id=user_challenge.user_id).order_by("id").first()
+    return {
+        "user_id": user_challenge.user_id,
+        "workout_id": user_challenge.workout_id,
+        "exercise_id": exercise.exercise_id,
+        "exercise_type": exercise.exercise_type,
+    }
+
+
+def measure(client, url, repeat):
+    """
+    Requests `url` `repeat` times, then once more under `tracemalloc` (which slows it down too much to time).
+
+    Returns:
+        Dictionary with the median `ms`, the `queries` of one request, its `peak_kb` and `status`.
+    """
+    timings = []
+    for _ in range(repeat):
+        # `CaptureQueriesContext` sees nothing once the bounded query log is full, e.g. after seeding:
+        connection.queries_log.clear()
+        with CaptureQueriesContext(connection) as queries:
+            started_at = time.perf_counter()
+            response = client.get(url)
+            timings.append((time.perf_counter() - started_at) * 1000)
+
+    tracemalloc.start()
+    try:
+        client.get(url)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "ms": round(statistics.median(timings), 2),
+        "queries": len(queries),
+        "peak_kb": round(peak / 1024, 1),
+        "status": response.status_code,
+    }
+
+
+def run_benchmarks(sizes, repeat=5, seed=0):
+    """
+    Seeds each dataset size in turn and measures every route on it.
+
+    Must run against a disposable (test) database, which is flushed before each size.
+
+    Returns:
+        `{size: {view: measurement}}`, see `measure()`.
+    """
+    results = {}
+    # The manifest storage needs `collectstatic`; cached session users and pages would hide the
+    # per-request queries, which the budgets are about:
+    with override_settings(
+        STATICFILES_STORAGE="django.contrib.staticfiles.storage.StaticFilesStorage",
+        SESSION_USER_CACHE_TTL=0,
+        PAGE_CACHE_ENABLED=False,
+        BCRYPT_ROUNDS=4,
+    ):
+        for size in sizes:
+            call_command("flush", interactive=False, verbosity=0)
+            call_command("seed_load", seed=seed, stdout=io.StringIO(), **BENCHMARK_SIZES[size])
+
+            arguments = get_route_arguments()
+            client = Client()
+            session = client.session
+            session["user_id"] = arguments["user_id"]
+            session.save()
+
+            results[size] = {
+                view: measure(client, url.format(**arguments), repeat)
+                for view, url in ROUTES.items()
+            }
+    return results
+
+
+def check_results(results, baseline=None):
+    """
+    Compares benchmark results to the view budgets and to the query counts of a baseline.
+
+    Args:
+        results: Output of `run_benchmarks()`.
+        baseline: Earlier output of `run_benchmarks()`, or `None`.
+
+    Returns:
+        List of failure messages, empty if everything is within budget.
+    """
+    failures = []
+    for size, views in results.items():
+        for view, result in views.items():
+            label = "%s/%s" % (size, view)
+            budget = get_budget(view)
+            if result["status"] >= 400:
+                failures.append("%s: status %d" % (label, result["status"]))
+            if result["queries"] > budget["queries"]:
+                failures.append("%s: %d queries, budget is %d" % (label, result["queries"], budget["queries"]))
+            if result["ms"] > budget["ms"]:
+                failures.append("%s: %.1f ms, budget is %d ms" % (label, result["ms"], budget["ms"]))
+
+            previous = (baseline or {}).get(size, {}).get(view)
+            if previous is not None and result["queries"] > previous["queries"]:
+                failures.append("%s: %d queries, baseline is %d" % (label, result["queries"], previous["queries"]))
+    return failures
+
+
+def check_timings(results, baseline, tolerance=0.5):
+    """
+    Compares the time and peak memory of benchmark results to a baseline.
+
+    Args:
+        results: Output of `run_benchmarks()`.
+        baseline: Earlier output of `run_benchmarks()`, or `None`.
+        tolerance: Allowed relative growth of time and peak memory over the baseline.
+
+    Returns:
+        List of messages about the views that got slower or use more memory.
+    """
+    messages = []
+    for size, views in results.items():
+        for view, result in views.items():
+            label = "%s/%s" % (size, view)
+            previous = (baseline or {}).get(size, {}).get(view)
+            if previous is None:
+                continue
+            if result["ms"] > previous["ms"] * (1 + tolerance) and result["ms"] - previous["ms"] > MIN_REGRESSION_MS:
+                messages.append("%s: %.1f ms, baseline is %.1f ms" % (label, result["ms"], previous["ms"]))
+            if result["peak_kb"] > previous["peak_kb"] * (1 + tolerance) and result["peak_kb"] - previous["peak_kb"] > MIN_REGRESSION_KB:
+                messages.append("%s: %.0f KB peak, baseline is %.0f KB" % (label, result["peak_kb"], previous["peak_kb"]))
+    return messages
@@ -0,0 +1,121 @@
+"""
+database.py
+
+SQLite tuning for concurrent server processes.
+
+Every new SQLite connection gets the `SQLITE_PRAGMAS` (see `apps.WorkoutConfig.ready()`): the WAL
+journal lets readers and a writer work at the same time, `synchronous=NORMAL` syncs at checkpoints
+instead of every commit, and `busy_timeout` makes a blocked writer wait for the lock rather than
+fail. A transaction that read before writing can still fail at once with "database is locked"
+when another process committed in between, which waiting doesn't solve, so the views writing
+under contention retry whole with `retry_on_locked`.
+
+Unlike the others, the journal mode is stored in the database file. It's left as it is for the
+`SQLITE_KEEP_JOURNAL_MODE` databases, by default the development database tracked by git, which
+any `manage.py` command would otherwise convert to WAL, next to new `-wal` and `-shm` files.
+"""
+
+import os
+import random
+import sqlite3
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.db import OperationalError, connection as default_connection
+
+DEFAULT_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "busy_timeout": 5000,
+    "mmap_size": 256 * 1024 * 1024,
+    # Negative sizes are in KiB:
+    "cache_size": -64 * 1024,
+    "temp_store": "MEMORY",
+}
+
+# Pragmas written into the database file rather than set on the connection:
+PERSISTENT_PRAGMAS = ("journal_mode",)
+
+LOCKED_MESSAGES = ("database is locked", "database table is locked")
+
+
+def apply_pragmas(raw_connection, pragmas):
+    """Runs `PRAGMA name = value` for each pragma on a DB-API connection, bypassing Django's query log."""
+    for name, value in pragmas.items():
+        raw_connection.execute("PRAGMA %s = %s" % (name, value))
+
+
+def get_pragmas(database_name):
+    """Returns the `SQLITE_PRAGMAS` of a database, without the persistent ones for `SQLITE_KEEP_JOURNAL_MODE` databases."""
+    pragmas = dict(getattr(settings, "SQLITE_PRAGMAS", DEFAULT_PRAGMAS))
+    kept = {os.path.abspath(path) for path in getattr(settings, "SQLITE_KEEP_JOURNAL_MODE", [])}
+    if os.path.abspath(str(database_name)) in kept:
+        for name in PERSISTENT_PRAGMAS:
+            pragmas.pop(name, None)
+    return pragmas
+
+
+def configure_connection(sender, connection, **kwargs):
+    """`connection_created` receiver applying `SQLITE_PRAGMAS` to SQLite connections."""
+    if connection.vendor == "sqlite":
+        apply_pragmas(connection.connection, get_pragmas(connection.settings_dict["NAME"]))
+
+
+def is_locked_error(error):
+    # Django wraps the errors of the driver, raw connections raise them as they are:
+    return isinstance(error, (OperationalError, sqlite3.OperationalError)) and str(error).startswith(LOCKED_MESSAGES)
+
+
+def get_backoff(attempt, base_delay, max_delay, rng=random):
+    """Seconds to wait before retry `attempt` (from 0): exponential, capped and fully jittered so retries spread out."""
+    return rng.uniform(0, min(max_delay, base_delay * 2 ** attempt))
+
+
+def call_with_retry(func, retries=None, base_delay=None, max_delay=None, is_retryable=is_locked_error, on_retry=None, sleep=time.sleep):
+    """
+    Calls `func()`, calling it again after a jittered backoff while it fails with a retryable error.
+
+    Args:
+        func: Callable doing a complete unit of work, e.g. a transaction.
+        retries: Attempts after the first, `SQLITE_WRITE_RETRIES` by default.
+        base_delay: Largest wait before the first retry in seconds, doubled every retry, `SQLITE_RETRY_DELAY` by default.
+        max_delay: Cap of the wait, `SQLITE_RETRY_MAX_DELAY` by default.
+        is_retryable: Predicate on the raised exception.
+        on_retry: Called with the exception before every retry.
+
+    Raises:
+        The last exception, once the retries are used up.
+    """
+    if retries is None:
+        retries = getattr(settings, "SQLITE_WRITE_RETRIES", 5)
+    if base_delay is None:
+        base_delay = getattr(settings, "SQLITE_RETRY_DELAY", 0.01)
+    if max_delay is None:
+        max_delay = getattr(settings, "SQLITE_RETRY_MAX_DELAY", 0.5)
+
+    for attempt in range(retries + 1):
+        try:
+            return func()
+        except Exception as error:
+            if attempt == retries or not is_retryable(error):
+                raise
+            if on_retry is not None:
+                on_retry(error)
+            sleep(get_backoff(attempt, base_delay, max_delay))
+
+
+def retry_on_locked(view):
+    """
+    Decorator for views writing under contention: runs the view again if the database was locked.
+
+    The view must not have side effects before its writes, as it's run again from the start.
+    Inside an outer transaction (e.g. `ATOMIC_REQUESTS`) only the whole transaction could be
+    retried, so the error is raised as is.
+    """
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if default_connection.in_atomic_block:
+            return view(request, *args, **kwargs)
+        return call_with_retry(lambda: view(request, *args, **kwargs))
+    return wrapper
@@ -0,0 +1,286 @@
+"""
+load_replay.py
+
+Replays a request mix with concurrent simulated users, used by `manage.py replay_load`.
+
+The mix is either rebuilt from the application logs (the `GET request to login` lines counted by
+`log_analysis.LogAnalyzer`) or given as a profile of route weights. `views.py` only logs the form
+pages and a few POSTs, so the routes of `DEFAULT_PROFILE` the logs can't count (the dashboard,
+statistics, history, workout and challenge pages) are added to a rebuilt mix with their profile weights. Every simulated user logs in
+as one of the users made by `manage.py seed_load`, then requests routes drawn from the mix, either
+through the WSGI application in-process or over HTTP against a running server. Latencies are
+reported per route as throughput and percentiles.
+"""
+
+import http.cookiejar
+import random
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from collections import defaultdict
+
+from django.db import connections
+from django.db.models import Max
+from django.test import Client
+
+from .benchmarks import ROUTES
+from .log_analysis import LogAnalyzer, read_entries
+from .models import ExerciseIndex, User, Workout
+
+# `{route: (method, url, form data)}`, the pages of `benchmarks.ROUTES` and the POSTs safe to repeat:
+REPLAY_ROUTES = dict(
+    {view: ("GET", url, None) for view, url in ROUTES.items()},
+    login_post=("POST", "/user/login", {"username": "{username}", "password": "{password}"}),
+    # Joins the challenge, then leaves it on the next request:
+    join_challenge=("POST", "/challenge/{challenge_workout_id}/join", {}),
+    complete_workout=("POST", "/workout/{workout_id}/complete", {}),
+)
+
+# Routes of the endpoints `views.py` logs; the other logged POSTs create data from forms and aren't replayed:
+LOG_ENDPOINTS = {
+    "GET login": "login",
+    "POST login": "login_post",
+    "GET register": "register",
+    "GET new workout": "new_workout",
+    "GET new exercise": "new_exercise",
+    "GET edit workout": "edit_workout",
+    "GET edit exercise": "exercise",
+    "GET edit profile": "edit_profile",
+    "GET edit profile password": "edit_profile_password",
+    "POST complete workout": "complete_workout",
+}
+
+DEFAULT_PROFILE = {
+    "dashboard": 5,
+    "workout": 3,
+    "view_all": 2,
+    "statistics": 2,
+    "challenges": 1,
+    "join_challenge": 1,
+    "profile": 1,
+    "login_post": 1,
+}
+
+PERCENTILES = [50, 90, 95, 99]
+
+
+def get_mix_from_logs(paths):
+    """
+    Counts the logged requests of each replayable route.
+
+    Returns:
+        `({route: weight}, {endpoint: count})`, the second with the logged endpoints that aren't replayed.
+    """
+    analyzer = LogAnalyzer().feed(read_entries(paths))
+    mix, skipped = defaultdict(int), {}
+    for endpoint, count in analyzer.requests.items():
+        if endpoint in LOG_ENDPOINTS:
+            mix[LOG_ENDPOINTS[endpoint]] += count
+        else:
+            skipped[endpoint] = count
+    return dict(mix), skipped
+
+
+def add_unlogged_routes(mix, profile=DEFAULT_PROFILE):
+    """
+    Adds the routes of `profile` that `views.py` doesn't log to a mix rebuilt from the logs.
+
+    Their weights are scaled by how often the logged routes of `profile` were requested, so e.g. the
+    dashboard keeps its share relative to the logins; by the whole mix if the logs have none of them.
+
+    Returns:
+        `({route: weight}, [added routes])`.
+    """
+    logged_routes = set(LOG_ENDPOINTS.values())
+    unlogged = {route: weight for route, weight in profile.items() if route not in logged_routes}
+    profile_logged = sum(weight for route, weight in profile.items() if route in logged_routes)
+    requested = sum(mix.get(route, 0) for route in profile if route in logged_routes)
+    if profile_logged and requested:
+        scale = requested / profile_logged
+    else:
+        scale = sum(mix.values()) / sum(profile.values())
+
+    merged = dict(mix)
+    for route, weight in unlogged.items():
+        merged[route] = weight * scale
+    return merged, sorted(unlogged)
+
+
+def get_user_arguments(count, password, username_prefix="load"):
+    """
+    Picks up to `count` users with workouts and the ids their routes need.
+
+    Only users made by `seed_load` (named `load<id>`) are picked by default, as their password is known.
+
+    Returns:
+        List of dictionaries filling the placeholders of `REPLAY_ROUTES`.
+    """
+    latest = list(
+        Workout.objects.filter(user__username__startswith=username_prefix).values("user_id").annotate(workout_id=Max("id")).order_by("user_id")[:count]
+    )
+    usernames = dict(User.objects.filter(id__in=[row["user_id"] for row in latest]).values_list("id", "username"))
+    challenge_workout_ids = list(
+        Workout.objects.filter(is_shared=True).exclude(challenge=None).order_by("id").values_list("id", flat=True)[:100]
+    )
+    exercises = {
+        entry.user_id: entry
+        for entry in ExerciseIndex.objects.filter(workout_id__in=[row["workout_id"] for row in latest])
+    }
+
+    arguments = []
+    for i, row in enumerate(latest):
+        exercise = exercises.get(row["user_id"])
+        challenge_workout_id = challenge_workout_ids[i % len(challenge_workout_ids)] if challenge_workout_ids else row["workout_id"]
+        arguments.append({
+            "user_id": row["user_id"],
+            "username": usernames[row["user_id"]],
+            "password": password,
+            "workout_id": row["workout_id"],
+            # Challenge pages need a challenge workout:
+            "challenge_workout_id": challenge_workout_id,
+            "exercise_id": exercise.exercise_id if exercise else 0,
+            "exercise_type": exercise.exercise_type if exercise else "",
+        })
+    return arguments
+
+
+class InProcessClient:
+    """Requests the WSGI application directly, through Django's test client."""
+
+    def __init__(self):
+        # Errors are counted as 500 responses instead of raised:
+        self.client = Client(raise_request_exception=False)
+
+    def request(self, method, url, data):
+        if method == "POST":
+            return self.client.post(url, data).status_code
+        return self.client.get(url).status_code
+
+    def close(self):
+        # Every thread has its own database connection:
+        connections.close_all()
+
+
+class NoRedirectHandler(urllib.request.HTTPRedirectHandler):
+    """Reports redirects as they are, like the test client, instead of timing the next page too."""
+
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+class HttpClient:
+    """Requests a running server, keeping the session and CSRF cookies of one user."""
+
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip("/")
+        self.cookies = http.cookiejar.CookieJar()
+        self.opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(self.cookies), NoRedirectHandler)
+
+    def get_csrf_token(self):
+        for cookie in self.cookies:
+            if cookie.name == "csrftoken":
+                return cookie.value
+        # The login page sets it:
+        self.request("GET", "/", None)
+        return next((cookie.value for cookie in self.cookies if cookie.name == "csrftoken"), "")
+
+    def request(self, method, url, data):
+        headers, body = {}, None
+        if method == "POST":
+            token = self.get_csrf_token()
+            headers = {"X-CSRFToken": token, "Referer": self.base_url + "/"}
+            body = urllib.parse.urlencode(dict(data, csrfmiddlewaretoken=token)).encode()
+        request = urllib.request.Request(self.base_url + url, data=body, headers=headers, method=method)
+        try:
+            with self.opener.open(request, timeout=30) as response:
+                response.read()
+                return response.status
+        except urllib.error.HTTPError as error:
+            return error.code
+
+    def close(self):
+        pass
+
+
+def replay(make_client, users, mix, duration=None, requests=None, think=0, seed=0):
+    """
+    Runs one thread per simulated user until `duration` seconds passed or each made `requests` requests.
+
+    Args:
+        make_client: Callable returning a new `InProcessClient` or `HttpClient`.
+        users: Output of `get_user_arguments()`.
+        mix: `{route: weight}` of `REPLAY_ROUTES`.
+        think: Average pause in seconds between the requests of a user.
+
+    Returns:
+        `({route: [(milliseconds, status)]}, elapsed seconds)`.
+    """
+    routes = list(mix)
+    weights = [mix[route] for route in routes]
+    results = defaultdict(list)
+    lock = threading.Lock()
+    started_at = time.perf_counter()
+    deadline = started_at + duration if duration else None
+
+    def run(index, arguments):
+        rng = random.Random(seed + index)
+        client = make_client()
+        try:
+            # Logging in isn't measured, it's the session the other requests need:
+            method, url, data = REPLAY_ROUTES["login_post"]
+            client.request(method, url, {key: value.format(**arguments) for key, value in data.items()})
+            made = 0
+            while (requests is None or made < requests) and (deadline is None or time.perf_counter() < deadline):
+                route = rng.choices(routes, weights)[0]
+                method, url, data = REPLAY_ROUTES[route]
+                data = {key: value.format(**arguments) for key, value in (data or {}).items()}
+                request_started_at = time.perf_counter()
+                try:
+                    status = client.request(method, url.format(**arguments), data)
+                except Exception:
+                    status = 0
+                elapsed = (time.perf_counter() - request_started_at) * 1000
+                with lock:
+                    results[route].append((elapsed, status))
+                made += 1
+                if think:
+                    time.sleep(rng.expovariate(1 / think))
+        finally:
+            client.close()
+
+    threads = [threading.Thread(target=run, args=(i, arguments), daemon=True) for i, arguments in enumerate(users)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return dict(results), time.perf_counter() - started_at
+
+
+def percentile(sorted_values, percent):
+    """Nearest-rank percentile of an ascending list."""
+    index = max(0, -(-len(sorted_values) * percent // 100) - 1)
+    return sorted_values[int(index)]
+
+
+def summarize(results, elapsed):
+    """
+    Returns `[{route, requests, errors, per_second, p50, p90, p95, p99, max}]`, busiest route first.
+
+    Errors are responses with a status of 400 or more, and requests that failed without one (status 0).
+    """
+    rows = []
+    for route, samples in sorted(results.items(), key=lambda item: -len(item[1])):
+        timings = sorted(ms for ms, _ in samples)
+        row = {
+            "route": route,
+            "requests": len(samples),
+            "errors": sum(1 for _, status in samples if status == 0 or status >= 400),
+            "per_second": len(samples) / elapsed if elapsed else 0,
+            "max": timings[-1],
+        }
+        for percent in PERCENTILES:
+            row["p%d" % percent] = percentile(timings, percent)
+        rows.append(row)
+    return rows
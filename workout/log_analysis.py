@@ -0,0 +1,162 @@
+"""
+log_analysis.py
+
+Streaming analysis of the application logs (`workout_<date>.log`, see `settings.LOGGING`), used by
+`manage.py analyze_logs`.
+
+Lines are read one at a time and folded into fixed-size state, so memory stays bounded however
+large the logs are: counters per endpoint (a fixed set of views), a window of recent login
+failures, the busiest minutes in a heap and at most `max_messages` distinct validation errors.
+Files must be given in chronological order, which sorting their date-stamped names does.
+"""
+
+import datetime
+import heapq
+import re
+from collections import Counter, deque
+
+# `2024-06-19 10:38:40,157 - DEBUG - GET request to login: `; other lines continue a traceback:
+LINE_PATTERN = re.compile(r"^(\d{4})-(\d\d)-(\d\d) (\d\d):(\d\d):(\d\d),\d{3} - ([A-Z]+) - (.*?)(?:: )?$")
+REQUEST_PATTERN = re.compile(r"^(GET|POST) request to (.+)$")
+
+LOGIN_FAILURES = {"User could not be logged in.", "Login attempt throttled."}
+# ERROR messages that are not a form's validation errors:
+NOT_VALIDATION_PATTERN = re.compile(r"^Internal Server Error: |could not be |^Error creating workout: |^User does not have permission ")
+
+
+def parse_line(line):
+    """
+    Parses a log line.
+
+    Returns:
+        `(datetime, level, message)`, or `None` for traceback and other continuation lines.
+    """
+    match = LINE_PATTERN.match(line.rstrip("\r\n"))
+    if match is None:
+        return None
+    year, month, day, hour, minute, second, level, message = match.groups()
+    return datetime.datetime(int(year), int(month), int(day), int(hour), int(minute), int(second)), level, message
+
+
+def read_entries(paths):
+    """Yields the parsed entries of the files, in order, one line in memory at a time."""
+    for path in paths:
+        with open(path, encoding="utf-8", errors="replace") as file:
+            for line in file:
+                entry = parse_line(line)
+                if entry is not None:
+                    yield entry
+
+
+class LogAnalyzer:
+    """
+    Folds log entries into request, login failure, validation error and traffic statistics.
+
+    Args:
+        burst_window: Seconds within which `burst_threshold` login failures make a burst.
+        burst_threshold: Login failures within `burst_window` reported as a burst.
+        top: Busiest minutes kept.
+        max_messages: Distinct validation errors counted; rarer ones are evicted beyond that.
+    """
+
+    def __init__(self, burst_window=60, burst_threshold=5, top=10, max_messages=1000):
+        self.burst_window = datetime.timedelta(seconds=burst_window)
+        self.burst_threshold = burst_threshold
+        self.top = top
+        self.max_messages = max_messages
+
+        self.entries = 0
+        self.first = self.last = None
+        self.requests = Counter()
+        # Busiest minute of each endpoint:
+        self.endpoint_peaks = Counter()
+        self.active_minutes = 0
+        # `(count, minute)` of the busiest minutes, smallest first:
+        self.peak_minutes = []
+        self.validation_errors = Counter()
+        self.login_failures = 0
+        # `[start, end, count]` of each burst:
+        self.bursts = []
+
+        self._minute = None
+        self._minute_requests = Counter()
+        self._recent_failures = deque()
+        self._burst = None
+
+    def feed(self, entries):
+        for at, level, message in entries:
+            self.add(at, level, message)
+        self.close_minute()
+        return self
+
+    def add(self, at, level, message):
+        self.entries += 1
+        if self.first is None:
+            self.first = at
+        self.last = at
+
+        minute = at.replace(second=0)
+        if minute != self._minute:
+            self.close_minute()
+            self._minute = minute
+
+        request = REQUEST_PATTERN.match(message)
+        if request:
+            endpoint = "%s %s" % request.groups()
+            self.requests[endpoint] += 1
+            self._minute_requests[endpoint] += 1
+        elif message in LOGIN_FAILURES:
+            self.add_login_failure(at)
+        elif level == "ERROR" and not NOT_VALIDATION_PATTERN.search(message):
+            self.add_validation_error(message)
+
+    def close_minute(self):
+        """Folds the finished minute into the peaks."""
+        if not self._minute_requests:
+            return
+        self.active_minutes += 1
+        total = sum(self._minute_requests.values())
+        for endpoint, count in self._minute_requests.items():
+            self.endpoint_peaks[endpoint] = max(self.endpoint_peaks[endpoint], count)
+        if len(self.peak_minutes) < self.top:
+            heapq.heappush(self.peak_minutes, (total, self._minute))
+        elif total > self.peak_minutes[0][0]:
+            heapq.heapreplace(self.peak_minutes, (total, self._minute))
+        self._minute_requests.clear()
+
+    def add_login_failure(self, at):
+        self.login_failures += 1
+        recent = self._recent_failures
+        recent.append(at)
+        while at - recent[0] > self.burst_window:
+            recent.popleft()
+
+        if self._burst is not None and at - self._burst[1] <= self.burst_window:
+            # Still going:
+            self._burst[1] = at
+            self._burst[2] += 1
+        elif len(recent) >= self.burst_threshold:
+            self._burst = [recent[0], at, len(recent)]
+            self.bursts.append(self._burst)
+        else:
+            self._burst = None
+
+    def add_validation_error(self, message):
+        counter = self.validation_errors
+        if message not in counter and len(counter) >= self.max_messages:
+            # Makes room by dropping the rarer half, so counts of frequent errors stay exact:
+            for rare, _ in counter.most_common()[self.max_messages // 2:]:
+                del counter[rare]
+        counter[message] += 1
+
+    def get_endpoint_rows(self):
+        """Returns `(endpoint, count, average per active minute, peak per minute)`, busiest first."""
+        minutes = max(self.active_minutes, 1)
+        return [
+            (endpoint, count, count / minutes, self.endpoint_peaks[endpoint])
+            for endpoint, count in self.requests.most_common()
+        ]
+
+    def get_peak_minutes(self):
+        """Returns `(minute, requests)` of the busiest minutes, busiest first."""
+        return [(minute, count) for count, minute in sorted(self.peak_minutes, reverse=True)]
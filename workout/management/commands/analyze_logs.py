@@ -0,0 +1,65 @@
+import csv
+import glob
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from workout.log_analysis import LogAnalyzer, read_entries
+
+
+class Command(BaseCommand):
+    help = "Summarizes the workout_*.log files: request rates per endpoint, login failure bursts, validation errors and peak minutes."
+
+    def add_arguments(self, parser):
+        parser.add_argument("paths", nargs="*", help="Log files or glob patterns, defaults to LOG_DIR/workout_*.log.")
+        parser.add_argument("--format", choices=["text", "csv"], default="text")
+        parser.add_argument("--burst-window", type=int, default=60, help="Seconds within which login failures count as a burst.")
+        parser.add_argument("--burst-threshold", type=int, default=5, help="Login failures within the window making a burst.")
+        parser.add_argument("--top", type=int, default=10, help="Busiest minutes and most frequent validation errors listed.")
+
+    def handle(self, *args, **options):
+        patterns = options["paths"] or [os.path.join(getattr(settings, "LOG_DIR", settings.BASE_DIR), "workout_*.log")]
+        # Date-stamped names sort chronologically:
+        paths = sorted({path for pattern in patterns for path in glob.glob(str(pattern))})
+        if not paths:
+            raise CommandError("No log files found.")
+
+        analyzer = LogAnalyzer(options["burst_window"], options["burst_threshold"], options["top"]).feed(read_entries(paths))
+        if options["format"] == "csv":
+            self.write_csv(analyzer, options["top"])
+        else:
+            self.write_text(analyzer, paths, options["top"])
+
+    def write_csv(self, analyzer, top):
+        writer = csv.writer(self.stdout, lineterminator="\n")
+        writer.writerow(["section", "name", "count", "per_minute", "peak_per_minute", "until"])
+        for endpoint, count, per_minute, peak in analyzer.get_endpoint_rows():
+            writer.writerow(["endpoint", endpoint, count, "%.3f" % per_minute, peak, ""])
+        for minute, count in analyzer.get_peak_minutes():
+            writer.writerow(["peak_minute", minute.isoformat(), count, "", "", ""])
+        for start, end, count in analyzer.bursts:
+            writer.writerow(["login_burst", start.isoformat(), count, "", "", end.isoformat()])
+        for message, count in analyzer.validation_errors.most_common(top):
+            writer.writerow(["validation_error", message, count, "", "", ""])
+
+    def write_text(self, analyzer, paths, top):
+        self.stdout.write("%d entries in %d files, %s to %s, %d minutes with requests\n" % (
+            analyzer.entries, len(paths), analyzer.first, analyzer.last, analyzer.active_minutes,
+        ))
+
+        self.stdout.write(self.style.MIGRATE_HEADING("Requests per endpoint (count, average and peak per minute)"))
+        for endpoint, count, per_minute, peak in analyzer.get_endpoint_rows():
+            self.stdout.write("    %-32s %8d %8.2f %6d" % (endpoint, count, per_minute, peak))
+
+        self.stdout.write(self.style.MIGRATE_HEADING("Busiest minutes"))
+        for minute, count in analyzer.get_peak_minutes():
+            self.stdout.write("    %s %6d" % (minute.strftime("%Y-%m-%d %H:%M"), count))
+
+        self.stdout.write(self.style.MIGRATE_HEADING("Login failures: %d, in %d bursts" % (analyzer.login_failures, len(analyzer.bursts))))
+        for start, end, count in analyzer.bursts:
+            self.stdout.write("    %s to %s %6d" % (start, end.time(), count))
+
+        self.stdout.write(self.style.MIGRATE_HEADING("Validation errors"))
+        for message, count in analyzer.validation_errors.most_common(top):
+            self.stdout.write("    %6d %s" % (count, message))
@@ -0,0 +1,121 @@
+import multiprocessing
+import os
+import random
+import sqlite3
+import statistics
+import tempfile
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from workout.database import DEFAULT_PRAGMAS, apply_pragmas, call_with_retry, is_locked_error
+
+SCHEMA = """
+CREATE TABLE challenge_member (id INTEGER PRIMARY KEY, user_id INTEGER, workout_id INTEGER, joined_at TEXT);
+CREATE INDEX challenge_member_workout_user ON challenge_member (workout_id, user_id);
+"""
+
+
+def join_or_leave(raw_connection, rng, users, workouts):
+    """One `join_challenge` transaction: read the membership, then insert or delete it, as Django runs it (`BEGIN` is deferred)."""
+    user_id, workout_id = rng.randrange(users), rng.randrange(workouts)
+    raw_connection.execute("BEGIN")
+    try:
+        row = raw_connection.execute(
+            "SELECT id FROM challenge_member WHERE workout_id = ? AND user_id = ?", (workout_id, user_id),
+        ).fetchone()
+        if row:
+            raw_connection.execute("DELETE FROM challenge_member WHERE id = ?", row)
+        else:
+            raw_connection.execute(
+                "INSERT INTO challenge_member (user_id, workout_id, joined_at) VALUES (?, ?, datetime('now'))", (user_id, workout_id),
+            )
+        raw_connection.execute("COMMIT")
+    except BaseException:
+        if raw_connection.in_transaction:
+            raw_connection.execute("ROLLBACK")
+        raise
+
+
+def run_worker(path, tuning, seconds, users, workouts, seed, results):
+    """
+    Runs transactions for `seconds` in its own process, like a gunicorn worker, and reports its counts and latencies.
+
+    `tuning` is `None` for Django's defaults, else `(pragmas, retry options)`; settings aren't read
+    here, as spawned processes don't have them.
+    """
+    # Django's SQLite defaults: autocommit with a 5 second busy timeout:
+    raw_connection = sqlite3.connect(path, timeout=5, isolation_level=None)
+    if tuning:
+        pragmas, retry_options = tuning
+        apply_pragmas(raw_connection, pragmas)
+    rng = random.Random(seed)
+    latencies, errors, retries = [], 0, [0]
+
+    def on_retry(error):
+        retries[0] += 1
+
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        started_at = time.perf_counter()
+        try:
+            if tuning:
+                call_with_retry(lambda: join_or_leave(raw_connection, rng, users, workouts), on_retry=on_retry, **retry_options)
+            else:
+                join_or_leave(raw_connection, rng, users, workouts)
+        except sqlite3.OperationalError as error:
+            if not is_locked_error(error):
+                raise
+            errors += 1
+            continue
+        latencies.append((time.perf_counter() - started_at) * 1000)
+    raw_connection.close()
+    results.put((latencies, errors, retries[0]))
+
+
+class Command(BaseCommand):
+    help = "Measures join_challenge-like write throughput of concurrent processes on SQLite, with default settings and with the tuned pragmas and retries."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=8, help="Concurrent writing processes.")
+        parser.add_argument("--seconds", type=float, default=5, help="Duration of each run.")
+        parser.add_argument("--users", type=int, default=1000)
+        parser.add_argument("--workouts", type=int, default=20)
+
+    def handle(self, *args, **options):
+        pragmas = getattr(settings, "SQLITE_PRAGMAS", DEFAULT_PRAGMAS)
+        retry_options = {
+            "retries": getattr(settings, "SQLITE_WRITE_RETRIES", 5),
+            "base_delay": getattr(settings, "SQLITE_RETRY_DELAY", 0.01),
+            "max_delay": getattr(settings, "SQLITE_RETRY_MAX_DELAY", 0.5),
+        }
+        self.stdout.write("%-8s %8s %10s %8s %8s %8s %8s" % ("setup", "commits", "commits/s", "errors", "retries", "p50 ms", "p99 ms"))
+        for tuned in (False, True):
+            with tempfile.TemporaryDirectory() as directory:
+                path = os.path.join(directory, "benchmark.sqlite3")
+                with sqlite3.connect(path) as raw_connection:
+                    raw_connection.executescript(SCHEMA)
+                    if tuned:
+                        # Stored in the file, like on a database the server has opened before:
+                        apply_pragmas(raw_connection, pragmas)
+                raw_connection.close()
+
+                results = multiprocessing.Queue()
+                workers = [
+                    multiprocessing.Process(target=run_worker, args=(path, (pragmas, retry_options) if tuned else None, options["seconds"], options["users"], options["workouts"], seed, results))
+                    for seed in range(options["workers"])
+                ]
+                for worker in workers:
+                    worker.start()
+                reports = [results.get() for _ in workers]
+                for worker in workers:
+                    worker.join()
+
+            latencies = sorted(latency for report in reports for latency in report[0])
+            quantiles = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else [0] * 99
+            self.stdout.write("%-8s %8d %10.1f %8d %8d %8.2f %8.2f" % (
+                "tuned" if tuned else "default", len(latencies), len(latencies) / options["seconds"],
+                sum(report[1] for report in reports), sum(report[2] for report in reports),
+                quantiles[49], quantiles[98],
+            ))
@@ -0,0 +1,71 @@
+import json
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from workout.benchmarks import BENCHMARK_SIZES, check_results, check_timings, run_benchmarks
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "benchmark_baseline.json")
+
+
+class Command(BaseCommand):
+    help = "Benchmarks every page on seeded datasets in a test database; fails on budget or baseline query regressions, and reports slower views."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sizes", default="small,medium", help="Comma separated sizes out of: %s." % ", ".join(BENCHMARK_SIZES))
+        parser.add_argument("--repeat", type=int, default=5, help="Requests per view; the median time is reported.")
+        parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="Baseline JSON to compare with.")
+        parser.add_argument("--update-baseline", action="store_true", help="Write the results to the baseline instead of comparing.")
+        parser.add_argument("--tolerance", type=float, default=0.5, help="Allowed relative growth of time and memory over the baseline.")
+        parser.add_argument("--strict-timings", action="store_true", help="Also fail on time and memory growth; only meaningful with a --baseline made on this machine.")
+
+    def handle(self, *args, **options):
+        sizes = options["sizes"].split(",")
+        unknown = [size for size in sizes if size not in BENCHMARK_SIZES]
+        if unknown:
+            raise CommandError("Unknown sizes: %s." % ", ".join(unknown))
+
+        # Never seed the real database:
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            results = run_benchmarks(sizes, repeat=options["repeat"])
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        for size, views in results.items():
+            self.stdout.write(self.style.MIGRATE_HEADING("%s:" % size))
+            for view, result in views.items():
+                self.stdout.write("  %-22s %8.2f ms %4d queries %9.1f KB peak  %d" % (
+                    view, result["ms"], result["queries"], result["peak_kb"], result["status"],
+                ))
+
+        if options["update_baseline"]:
+            baseline = {}
+            if os.path.exists(options["baseline"]):
+                with open(options["baseline"]) as file:
+                    baseline = json.load(file)
+            baseline.update(results)
+            with open(options["baseline"], "w") as file:
+                json.dump(baseline, file, indent=2, sort_keys=True)
+                file.write("\n")
+            self.stdout.write(self.style.SUCCESS("Baseline written to %s." % options["baseline"]))
+            return
+
+        baseline = None
+        if os.path.exists(options["baseline"]):
+            with open(options["baseline"]) as file:
+                baseline = json.load(file)
+        failures = check_results(results, baseline)
+        slower = check_timings(results, baseline, tolerance=options["tolerance"])
+        if options["strict_timings"]:
+            failures += slower
+        elif slower:
+            # The committed baseline was timed on another machine:
+            self.stderr.write("Slower than the baseline (not failing without --strict-timings):\n  " + "\n  ".join(slower))
+        if failures:
+            raise CommandError("Benchmark regressions:\n  " + "\n  ".join(failures))
+        self.stdout.write(self.style.SUCCESS("All views within budget."))
@@ -0,0 +1,37 @@
+import time
+
+import bcrypt
+from django.core.management.base import BaseCommand
+
+from workout.passwords import get_rounds
+
+
+class Command(BaseCommand):
+    help = "Measures bcrypt on this machine and suggests the `BCRYPT_ROUNDS` closest to a target latency."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--target-ms", type=float, default=250, help="Target time of one hash, in milliseconds.")
+        parser.add_argument("--min-rounds", type=int, default=10)
+        parser.add_argument("--max-rounds", type=int, default=16)
+        parser.add_argument("--samples", type=int, default=3, help="Hashes timed per cost factor (the fastest counts).")
+
+    def handle(self, *args, **options):
+        target = options["target_ms"]
+        chosen = options["min_rounds"]
+
+        for rounds in range(options["min_rounds"], options["max_rounds"] + 1):
+            salt = bcrypt.gensalt(rounds)
+            timings = []
+            for _ in range(options["samples"]):
+                started_at = time.perf_counter()
+                bcrypt.hashpw(b"calibrate_bcrypt", salt)
+                timings.append((time.perf_counter() - started_at) * 1000)
+            elapsed = min(timings)
+            self.stdout.write("rounds=%d: %.1f ms" % (rounds, elapsed))
+
+            if elapsed > target:
+                break
+            chosen = rounds
+
+        self.stdout.write("Current BCRYPT_ROUNDS = %d" % get_rounds())
+        self.stdout.write(self.style.SUCCESS("BCRYPT_ROUNDS = %d" % chosen))
@@ -0,0 +1,71 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count, Q, Sum
+from django.utils import timezone
+
+from workout.models import *
+from workout.views_helper import get_exercises_types, get_history_rows, get_statistics_rows
+
+
+def get_hot_queries(user_id, workout_id):
+    """Returns `(label, QuerySet)` pairs of the per-user queries behind the busiest pages."""
+    now = timezone.now()
+    queries = [
+        ("dashboard: recent workouts", Workout.objects.filter(user__id=user_id).order_by('-id')[:4]),
+        ("dashboard: user challenges", UserChallenge.objects.filter(user__id=user_id)),
+        ("new_workout: workouts", Workout.objects.filter(user__id=user_id).order_by('-updated_at')),
+        ("profile_online: shared workouts", Workout.objects.filter(user__id=user_id, is_shared=True).order_by('-updated_at')[:5]),
+        ("challenges: shared challenges", Workout.objects.filter(Q(is_shared=True) & ~Q(challenge=None))),
+        ("view_challenge: participants", UserChallenge.objects.filter(workout_id=workout_id)),
+        ("view_challenge: user entry", UserChallenge.objects.filter(workout_id=workout_id, user_id=user_id)),
+        ("history: first page", get_history_rows(user_id)[:20]),
+        ("statistics: first page", get_statistics_rows(user_id, 'updated_at', 'desc')[:20]),
+        ("statistics: chart windows", ExerciseDailyStat.objects.filter(user__id=user_id).values('exercise_type', 'muscle_group_id').annotate(
+            total=Sum('count'), week=Sum('count', filter=Q(day__gte=now - timedelta(weeks=1))),
+        ).order_by()),
+        ("rebuild_statistics: user's days", StrengthTrainingExercise.objects.filter(user__id=user_id, updated_at__gte=now - timedelta(days=30)).values('user_id').annotate(count=Count('id')).order_by()),
+    ]
+    for exercise_type in get_exercises_types():
+        queries.append((
+            "workout: %s" % exercise_type.__name__,
+            exercise_type.objects.filter(workout_id=workout_id).order_by('name', 'muscle_group_id', 'id'),
+        ))
+    return queries
+
+
+class Command(BaseCommand):
+    help = "Prints the query plan and timing of the hot per-user queries, e.g. on a database filled by `seed_load`."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--user", type=int, help="User id to query for, defaults to the user with the most workouts.")
+        parser.add_argument("--repeat", type=int, default=5, help="Times each query is run; the fastest run is reported.")
+        parser.add_argument("--analyze", action="store_true", help="Run ANALYZE first, so the planner knows the table sizes.")
+
+    def handle(self, *args, **options):
+        if options["analyze"]:
+            with connection.cursor() as cursor:
+                cursor.execute("ANALYZE")
+
+        user_id = options["user"]
+        if user_id is None:
+            busiest = Workout.objects.values('user_id').annotate(count=Count('id')).order_by('-count').first()
+            if busiest is None:
+                raise CommandError("There are no workouts to query, run `manage.py seed_load` first.")
+            user_id = busiest['user_id']
+        workout = Workout.objects.filter(user__id=user_id).order_by('-id').first()
+        workout_id = workout.id if workout else 0
+
+        self.stdout.write("User %d, workout %d\n" % (user_id, workout_id))
+        for label, queryset in get_hot_queries(user_id, workout_id):
+            timings = []
+            for _ in range(options["repeat"]):
+                started_at = time.perf_counter()
+                list(queryset._chain())
+                timings.append((time.perf_counter() - started_at) * 1000)
+
+            self.stdout.write(self.style.MIGRATE_HEADING("%s (%.2f ms)" % (label, min(timings))))
+            for line in queryset.explain().splitlines():
+                self.stdout.write("    " + line)
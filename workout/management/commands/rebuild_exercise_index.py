@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from workout.models import ExerciseIndex
+
+
+class Command(BaseCommand):
+    help = "Rebuilds the `ExerciseIndex` table from the four exercise tables (repair)."
+
+    def handle(self, *args, **options):
+        created = ExerciseIndex.objects.rebuild()
+        self.stdout.write(self.style.SUCCESS("Rebuilt exercise index: %d rows." % created))
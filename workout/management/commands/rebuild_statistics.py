@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from workout.models import ExerciseDailyStat
+
+
+class Command(BaseCommand):
+    help = "Rebuilds the `ExerciseDailyStat` rollup from the exercise tables (backfill and repair)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--user", type=int, help="Only rebuild the rollup of this user id.")
+
+    def handle(self, *args, **options):
+        created = ExerciseDailyStat.objects.rebuild(user_id=options["user"])
+        self.stdout.write(self.style.SUCCESS("Rebuilt statistics rollup: %d rows." % created))
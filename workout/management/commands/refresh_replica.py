@@ -0,0 +1,31 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from workout.replicas import copy_database, get_replica_alias
+
+SQLITE_ENGINE = "django.db.backends.sqlite3"
+
+
+class Command(BaseCommand):
+    help = "Copies the SQLite database into the SQLite read replica with the online backup API, once or every --interval seconds."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--interval", type=float, default=0, help="Seconds between copies; copies once by default.")
+
+    def handle(self, *args, **options):
+        primary = settings.DATABASES["default"]
+        replica = settings.DATABASES.get(get_replica_alias())
+        if replica is None:
+            raise CommandError("No replica database is configured, set REPLICA_DATABASE_URL.")
+        if primary["ENGINE"] != SQLITE_ENGINE or replica["ENGINE"] != SQLITE_ENGINE:
+            raise CommandError("Only SQLite replicas are copied; other databases replicate themselves.")
+
+        while True:
+            started_at = time.perf_counter()
+            copy_database(str(primary["NAME"]), str(replica["NAME"]))
+            self.stdout.write("Copied %s to %s in %.2fs" % (primary["NAME"], replica["NAME"], time.perf_counter() - started_at))
+            if not options["interval"]:
+                return
+            time.sleep(options["interval"])
@@ -0,0 +1,84 @@
+import csv
+import glob
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from workout.load_replay import (
+    DEFAULT_PROFILE, PERCENTILES, REPLAY_ROUTES, HttpClient, InProcessClient,
+    add_unlogged_routes, get_mix_from_logs, get_user_arguments, replay, summarize,
+)
+
+
+class Command(BaseCommand):
+    help = "Replays a request mix from the logs or a profile with concurrent simulated users, reporting throughput and latency per route."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--logs", nargs="+", help="Log files or glob patterns to rebuild the request mix from; the pages the logs don't count are weighted as in the default mix.")
+        parser.add_argument("--profile", help="JSON file of route weights, e.g. {\"dashboard\": 5, \"join_challenge\": 1}.")
+        parser.add_argument("--url", help="Base URL of a running server, e.g. http://127.0.0.1:8000; requests the WSGI application in-process without it.")
+        parser.add_argument("--users", type=int, default=10, help="Concurrent simulated users, each logged in as a different seeded user.")
+        parser.add_argument("--duration", type=float, default=30, help="Seconds to run for.")
+        parser.add_argument("--requests", type=int, help="Requests per user, instead of --duration.")
+        parser.add_argument("--think", type=float, default=0, help="Average seconds between the requests of a user.")
+        parser.add_argument("--password", default="password123", help="Password of the seeded users.")
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--format", choices=["text", "csv"], default="text")
+
+    def handle(self, *args, **options):
+        mix = self.get_mix(options)
+        unknown = set(mix) - set(REPLAY_ROUTES)
+        if unknown:
+            raise CommandError("Unknown routes: %s. Known routes: %s." % (", ".join(sorted(unknown)), ", ".join(sorted(REPLAY_ROUTES))))
+
+        users = get_user_arguments(options["users"], options["password"])
+        if not users:
+            raise CommandError("There are no users with workouts, run `manage.py seed_load` first.")
+
+        if options["url"]:
+            make_client = lambda: HttpClient(options["url"])
+        else:
+            make_client = InProcessClient
+        results, elapsed = replay(
+            make_client, users, mix,
+            duration=None if options["requests"] else options["duration"], requests=options["requests"],
+            think=options["think"], seed=options["seed"],
+        )
+        rows = summarize(results, elapsed)
+
+        columns = ["route", "requests", "errors", "per_second"] + ["p%d" % percent for percent in PERCENTILES] + ["max"]
+        if options["format"] == "csv":
+            writer = csv.writer(self.stdout, lineterminator="\n")
+            writer.writerow(columns)
+            for row in rows:
+                writer.writerow([row["route"], row["requests"], row["errors"]] + ["%.2f" % row[column] for column in columns[3:]])
+            return
+
+        total = sum(row["requests"] for row in rows)
+        self.stdout.write("%d users, %d requests in %.1f s, %.1f requests/s\n" % (len(users), total, elapsed, total / elapsed))
+        self.stdout.write(self.style.MIGRATE_HEADING("%-22s %8s %6s %8s %s %8s  (ms)" % (
+            "route", "requests", "errors", "req/s", " ".join("%8s" % ("p%d" % percent) for percent in PERCENTILES), "max",
+        )))
+        for row in rows:
+            self.stdout.write("%-22s %8d %6d %8.1f %s %8.1f" % (
+                row["route"], row["requests"], row["errors"], row["per_second"],
+                " ".join("%8.1f" % row["p%d" % percent] for percent in PERCENTILES), row["max"],
+            ))
+
+    def get_mix(self, options):
+        if options["profile"]:
+            with open(options["profile"]) as file:
+                return json.load(file)
+        if options["logs"]:
+            paths = sorted({path for pattern in options["logs"] for path in glob.glob(pattern)})
+            if not paths:
+                raise CommandError("No log files found.")
+            mix, skipped = get_mix_from_logs(paths)
+            if skipped:
+                self.stderr.write("Not replayed: %s" % ", ".join("%s (%d)" % item for item in sorted(skipped.items())))
+            if not mix:
+                raise CommandError("The logs have no replayable requests.")
+            mix, added = add_unlogged_routes(mix)
+            self.stderr.write("Not logged, weighted as in the default mix: %s" % ", ".join(added))
+            return mix
+        return DEFAULT_PROFILE
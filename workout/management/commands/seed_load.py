@@ -0,0 +1,250 @@
+import json
+import random
+import time
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from workout.models import *
+from workout.passwords import hash_password
+from workout.views_helper import get_exercises_types
+
+MUSCLE_GROUP_NAMES = ["Chest", "Back", "Legs", "Shoulders", "Arms", "Core", "Glutes", "Calves"]
+EXERCISE_NAMES = ["Squat", "Bench Press", "Deadlift", "Row", "Run", "Plank", "Lunge", "Curl", "Stretch", "Swim"]
+
+# Type-specific columns and a generator of their values, in the order of `get_exercises_types()`:
+TYPE_FIELDS = [
+    (["weight", "repetitions"], lambda rng: (Decimal(rng.randint(10, 400)) / 2, rng.randint(1, 20))),
+    (["duration_minutes", "distance_km"], lambda rng: (rng.randint(5, 120), Decimal(rng.randint(50, 4200)) / 100)),
+    (["difficulty_level"], lambda rng: (rng.choice(["Easy", "Medium", "Hard"]),)),
+    (["stretch_type"], lambda rng: (rng.choice(["Static", "Dynamic", "Ballistic"]),)),
+]
+
+
+def next_id(model):
+    return (model.objects.aggregate(max_id=Max("id"))["max_id"] or 0) + 1
+
+
+def insert_rows(model, fields, rows):
+    """
+    Inserts rows with one `executemany`, bypassing model instances and the query compiler.
+
+    Args:
+        model: Model whose table is written.
+        fields: Field names, in the order of the values of `rows`.
+        rows: List of tuples of values ready for the database (see `Command.timestamp()`).
+    """
+    quote = connection.ops.quote_name
+    columns = [model._meta.get_field(field).column for field in fields]
+    sql = "INSERT INTO %s (%s) VALUES (%s)" % (
+        quote(model._meta.db_table), ", ".join(quote(column) for column in columns), ", ".join(["%s"] * len(columns)),
+    )
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, rows)
+
+
+class Command(BaseCommand):
+    help = "Fills the database with synthetic users, workouts, exercises and challenges for load and scale testing."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=100)
+        parser.add_argument("--workouts", type=int, default=20, help="Workouts per user.")
+        parser.add_argument("--exercises", type=int, default=5, help="Exercises per workout.")
+        parser.add_argument("--mix", default="4,2,1,1", help="Relative weights of strength, endurance, balance and flexibility exercises.")
+        parser.add_argument("--muscle-groups", type=int, default=len(MUSCLE_GROUP_NAMES))
+        parser.add_argument("--challenges", type=int, default=20)
+        parser.add_argument("--participants", type=int, default=10, help="Users joining each challenge, including its owner.")
+        parser.add_argument("--shared", type=float, default=0.1, help="Share of the other workouts that are shared.")
+        parser.add_argument("--days", type=int, default=90, help="Workouts are spread over this many past days.")
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--chunk-size", type=int, default=50000, help="Rows written per transaction.")
+        parser.add_argument("--password", default="password123", help="Password of every seeded user.")
+
+    def handle(self, *args, **options):
+        mix = [float(weight) for weight in options["mix"].split(",")]
+        if len(mix) != len(get_exercises_types()) or min(mix) < 0 or sum(mix) <= 0:
+            raise CommandError("--mix needs one non-negative weight per exercise type, e.g. 4,2,1,1.")
+
+        self.rng = random.Random(options["seed"])
+        self.options = options
+        self.now = timezone.now()
+        # Looked up once, these are called for every row:
+        self.adapt_datetime = connection.ops.adapt_datetimefield_value
+        self.timezone = timezone.get_current_timezone()
+        self.written = defaultdict(int)
+        started_at = time.perf_counter()
+
+        if connection.vendor == "sqlite":
+            # Index pages of the big tables stay in memory instead of being re-read for every chunk:
+            with connection.cursor() as cursor:
+                cursor.execute("PRAGMA cache_size = -262144")
+
+        muscle_group_ids = self.seed_muscle_groups()
+        user_ids = self.seed_users()
+        challenge_ids = self.seed_challenges()
+        challenge_workouts = self.seed_workouts(user_ids, muscle_group_ids, challenge_ids, mix)
+        self.seed_user_challenges(user_ids, challenge_workouts)
+        self.reset_sequences()
+
+        for model, count in self.written.items():
+            self.stdout.write("%s: %d" % (model.__name__, count))
+        self.stdout.write(self.style.SUCCESS(
+            "Seeded %d rows in %.1f s." % (sum(self.written.values()), time.perf_counter() - started_at)
+        ))
+
+    def write(self, model, fields, rows):
+        if rows:
+            insert_rows(model, fields, rows)
+            self.written[model] += len(rows)
+
+    def reset_sequences(self):
+        """Moves the id sequences past the explicit ids written, so the next ORM inserts don't reuse them (PostgreSQL; SQLite needs nothing)."""
+        statements = connection.ops.sequence_reset_sql(no_style(), list(self.written))
+        if statements:
+            with connection.cursor() as cursor:
+                for sql in statements:
+                    cursor.execute(sql)
+
+    def timestamp(self, value):
+        """Adapts a datetime for the database, as the ORM would."""
+        return self.adapt_datetime(value)
+
+    def seed_muscle_groups(self):
+        """Reuses the existing muscle groups and creates the missing ones."""
+        ids = list(MuscleGroup.objects.order_by("id").values_list("id", flat=True)[:self.options["muscle_groups"]])
+        first_id = next_id(MuscleGroup)
+        rows = []
+        for i in range(self.options["muscle_groups"] - len(ids)):
+            name = MUSCLE_GROUP_NAMES[i % len(MUSCLE_GROUP_NAMES)]
+            if i >= len(MUSCLE_GROUP_NAMES):
+                name += " %d" % (i // len(MUSCLE_GROUP_NAMES) + 1)
+            rows.append((first_id + i, name, name, self.timestamp(self.now), self.timestamp(self.now)))
+        with transaction.atomic():
+            self.write(MuscleGroup, ["id", "name", "description", "created_at", "updated_at"], rows)
+        return ids + [row[0] for row in rows]
+
+    def seed_users(self):
+        # Hashing is deliberately slow, so every seeded user shares one hash:
+        password = hash_password(self.options["password"])
+        now = self.timestamp(self.now)
+        first_id = next_id(User)
+        ids = list(range(first_id, first_id + self.options["users"]))
+        for start in range(0, len(ids), self.options["chunk_size"]):
+            with transaction.atomic():
+                self.write(User, ["id", "username", "email", "password", "created_at", "updated_at"], [
+                    (id, "load%d" % id, "load%d@example.com" % id, password, now, now)
+                    for id in ids[start:start + self.options["chunk_size"]]
+                ])
+        return ids
+
+    def seed_challenges(self):
+        now = self.timestamp(self.now)
+        first_id = next_id(Challenge)
+        rows = [
+            (first_id + i, "Challenge %d" % (first_id + i), self.rng.randint(1, 5), "Seeded challenge", now, now)
+            for i in range(self.options["challenges"])
+        ]
+        with transaction.atomic():
+            self.write(Challenge, ["id", "name", "level", "description", "created_at", "updated_at"], rows)
+        return [row[0] for row in rows]
+
+    def seed_workouts(self, user_ids, muscle_group_ids, challenge_ids, mix):
+        """
+        Creates the workouts with their exercises, `ExerciseIndex` and `ExerciseDailyStat` rows.
+
+        Every chunk of users is written in its own transaction. The seeded users are new, so their
+        rollup rows are summed up here rather than rebuilt from the exercise tables.
+
+        Returns `{workout_id: (owner id, challenge id, exercise count)}` of the challenge workouts.
+        """
+        total = len(user_ids) * self.options["workouts"]
+        if len(challenge_ids) > total:
+            raise CommandError("There are fewer workouts than challenges.")
+        first_id = next_id(Workout)
+        challenge_by_workout = dict(zip(
+            (first_id + i for i in self.rng.sample(range(total), len(challenge_ids))), challenge_ids,
+        ))
+        challenge_workouts = {}
+
+        exercise_types = get_exercises_types()
+        type_names = [exercise_type.__name__ for exercise_type in exercise_types]
+        exercise_ids = [next_id(exercise_type) for exercise_type in exercise_types]
+        type_indexes = range(len(exercise_types))
+        exercises_per_workout = self.options["exercises"]
+        rows_per_user = self.options["workouts"] * (1 + 2 * exercises_per_workout)
+        users_per_chunk = max(1, self.options["chunk_size"] // max(1, rows_per_user))
+        workout_id = first_id
+
+        for start in range(0, len(user_ids), users_per_chunk):
+            workouts, exercises, index = [], [[] for _ in exercise_types], []
+            # {(user, day, exercise type, muscle group): [count, weight volume, duration, distance]}:
+            stats = defaultdict(lambda: [0, Decimal(0), 0, Decimal(0)])
+
+            for user_id in user_ids[start:start + users_per_chunk]:
+                for _ in range(self.options["workouts"]):
+                    created_at = self.now - timedelta(seconds=self.rng.randint(0, self.options["days"] * 86400))
+                    challenge_id = challenge_by_workout.get(workout_id)
+                    is_shared = challenge_id is not None or self.rng.random() < self.options["shared"]
+                    workouts.append((
+                        workout_id, "Workout %d" % workout_id, "Seeded workout", self.rng.random() < 0.5, is_shared,
+                        user_id, challenge_id, self.timestamp(created_at), self.timestamp(created_at),
+                    ))
+                    if challenge_id is not None:
+                        challenge_workouts[workout_id] = (user_id, challenge_id, exercises_per_workout)
+
+                    for minute, type_index in enumerate(self.rng.choices(type_indexes, weights=mix, k=exercises_per_workout)):
+                        exercise_id = exercise_ids[type_index]
+                        exercise_ids[type_index] += 1
+                        name = self.rng.choice(EXERCISE_NAMES)
+                        muscle_group_id = self.rng.choice(muscle_group_ids)
+                        updated_at = created_at + timedelta(minutes=minute)
+                        stamp = self.timestamp(updated_at)
+                        values = TYPE_FIELDS[type_index][1](self.rng)
+
+                        exercises[type_index].append((exercise_id, name, name, workout_id, muscle_group_id, user_id, stamp, stamp) + values)
+                        index.append((type_names[type_index], exercise_id, user_id, workout_id, muscle_group_id, name, stamp))
+
+                        stat = stats[(user_id, updated_at.astimezone(self.timezone).date(), type_names[type_index], muscle_group_id)]
+                        # Same sums as the `rollup_values()` of strength and endurance exercises:
+                        stat[0] += 1
+                        if type_index == 0:
+                            stat[1] += values[0] * values[1]
+                        elif type_index == 1:
+                            stat[2] += values[0]
+                            stat[3] += values[1]
+                    workout_id += 1
+
+            with transaction.atomic():
+                self.write(Workout, ["id", "name", "description", "completed", "is_shared", "user", "challenge", "created_at", "updated_at"], workouts)
+                shared_fields = ["id", "name", "description", "workout", "muscle_group", "user", "created_at", "updated_at"]
+                for exercise_type, (fields, _), rows in zip(exercise_types, TYPE_FIELDS, exercises):
+                    self.write(exercise_type, shared_fields + fields, rows)
+                self.write(ExerciseIndex, ["exercise_type", "exercise_id", "user", "workout", "muscle_group", "name", "updated_at"], index)
+                self.write(
+                    ExerciseDailyStat,
+                    ["user", "day", "exercise_type", "muscle_group", "count", "weight_volume", "duration_minutes", "distance_km"],
+                    [
+                        (user_id, connection.ops.adapt_datefield_value(day), exercise_type, muscle_group_id, *stat)
+                        for (user_id, day, exercise_type, muscle_group_id), stat in stats.items()
+                    ],
+                )
+
+        return challenge_workouts
+
+    def seed_user_challenges(self, user_ids, challenge_workouts):
+        """Makes each challenge's owner and other random users join it, with some exercises done."""
+        joined_at = self.timestamp(self.now)
+        rows = []
+        for workout_id, (owner_id, challenge_id, exercise_count) in challenge_workouts.items():
+            others = [user_id for user_id in self.rng.sample(user_ids, min(len(user_ids), self.options["participants"])) if user_id != owner_id]
+            for user_id in [owner_id] + others[:self.options["participants"] - 1]:
+                status = [self.rng.random() < 0.5 for _ in range(exercise_count)]
+                rows.append((user_id, challenge_id, workout_id, joined_at, json.dumps(status)))
+        with transaction.atomic():
+            self.write(UserChallenge, ["user", "challenge", "workout", "joined_at", "exercise_status"], rows)
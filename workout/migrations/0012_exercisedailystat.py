@@ -0,0 +1,59 @@
+# Generated by Django 4.0 on 2026-10-18 10:12
+
+from django.db import migrations, models
+from django.db.models import Count, DecimalField, F, Sum
+from django.db.models.functions import TruncDate
+import django.db.models.deletion
+
+
+# Aggregates of `rollup_aggregates()` per exercise type, as they were when the rollup was added:
+ROLLUP_AGGREGATES = {
+    'StrengthTrainingExercise': lambda: {'weight_volume': Sum(F('weight') * F('repetitions'), output_field=DecimalField(max_digits=14, decimal_places=2))},
+    'EnduranceTrainingExercise': lambda: {'duration_minutes': Sum('duration_minutes'), 'distance_km': Sum('distance_km')},
+    'BalanceExercise': lambda: {},
+    'FlexibilityExercise': lambda: {},
+}
+
+
+def backfill_exercise_daily_stats(apps, schema_editor):
+    # Same rows as `ExerciseDailyStat.objects.rebuild()`:
+    ExerciseDailyStat = apps.get_model('workout', 'ExerciseDailyStat')
+    for exercise_type, aggregates in ROLLUP_AGGREGATES.items():
+        rows = (
+            apps.get_model('workout', exercise_type).objects.order_by()
+            .annotate(day=TruncDate('updated_at'))
+            .values('user_id', 'day', 'muscle_group_id')
+            .annotate(count=Count('id'), **aggregates())
+        )
+        ExerciseDailyStat.objects.bulk_create(
+            [ExerciseDailyStat(exercise_type=exercise_type, **row) for row in rows.iterator()],
+            batch_size=500,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('workout', '0011_alter_user_password'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExerciseDailyStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('exercise_type', models.CharField(max_length=50)),
+                ('count', models.IntegerField(default=0)),
+                ('weight_volume', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('duration_minutes', models.IntegerField(default=0)),
+                ('distance_km', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('muscle_group', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='workout.musclegroup')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='workout.user')),
+            ],
+            options={
+                'unique_together': {('user', 'day', 'exercise_type', 'muscle_group')},
+            },
+        ),
+        migrations.RunPython(backfill_exercise_daily_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 4.0 on 2026-10-18 10:13
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+EXERCISE_TYPES = ['StrengthTrainingExercise', 'EnduranceTrainingExercise', 'BalanceExercise', 'FlexibilityExercise']
+
+
+def backfill_exercise_index(apps, schema_editor):
+    ExerciseIndex = apps.get_model('workout', 'ExerciseIndex')
+    for exercise_type in EXERCISE_TYPES:
+        rows = apps.get_model('workout', exercise_type).objects.order_by().values_list('id', 'user_id', 'workout_id', 'muscle_group_id', 'name', 'updated_at')
+        ExerciseIndex.objects.bulk_create(
+            [
+                ExerciseIndex(exercise_type=exercise_type, exercise_id=id, user_id=user_id, workout_id=workout_id, muscle_group_id=muscle_group_id, name=name, updated_at=updated_at)
+                for id, user_id, workout_id, muscle_group_id, name, updated_at in rows.iterator()
+            ],
+            batch_size=500,
+        )
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('workout', '0012_exercisedailystat'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExerciseIndex',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('exercise_type', models.CharField(max_length=50)),
+                ('exercise_id', models.BigIntegerField()),
+                ('name', models.CharField(max_length=50)),
+                ('updated_at', models.DateTimeField()),
+                ('muscle_group', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='workout.musclegroup')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='workout.user')),
+                ('workout', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='workout.workout')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='exerciseindex',
+            index=models.Index(fields=['user', 'updated_at'], name='workout_exe_user_id_40c8b0_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='exerciseindex',
+            index=models.Index(fields=['workout', 'updated_at'], name='workout_exe_workout_b7ece2_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='exerciseindex',
+            unique_together={('exercise_type', 'exercise_id')},
+        ),
+        migrations.RunPython(backfill_exercise_index, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 4.0 on 2026-10-18 10:20
+
+from django.db import migrations, models
+from django.db.models import Count
+import django.db.models.functions.text
+
+
+def check_duplicates(apps, schema_editor):
+    # Existing users differing only by case would make the indexes fail; name them instead:
+    User = apps.get_model('workout', 'User')
+    for field in ['username', 'email']:
+        duplicates = (
+            User.objects.annotate(value=django.db.models.functions.text.Lower(field))
+            .values('value').annotate(count=Count('id')).filter(count__gt=1).values_list('value', flat=True)
+        )
+        if duplicates:
+            raise RuntimeError("Users share a %s (ignoring case), rename them before migrating: %s" % (field, ", ".join(duplicates)))
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('workout', '0013_exerciseindex'),
+    ]
+
+    operations = [
+        migrations.RunPython(check_duplicates, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='user',
+            constraint=models.UniqueConstraint(django.db.models.functions.text.Lower('username'), name='workout_user_username_lower_unique'),
+        ),
+        migrations.AddConstraint(
+            model_name='user',
+            constraint=models.UniqueConstraint(django.db.models.functions.text.Lower('email'), name='workout_user_email_lower_unique'),
+        ),
+    ]
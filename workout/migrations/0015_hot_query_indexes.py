@@ -0,0 +1,65 @@
+# Generated by Django 4.0 on 2026-10-18 10:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('workout', '0014_user_unique_username_email'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='balanceexercise',
+            index=models.Index(fields=['user', 'updated_at'], name='workout_bal_user_id_89abdb_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='balanceexercise',
+            index=models.Index(fields=['workout', 'name'], name='workout_bal_workout_3210f8_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='endurancetrainingexercise',
+            index=models.Index(fields=['user', 'updated_at'], name='workout_end_user_id_be0ba7_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='endurancetrainingexercise',
+            index=models.Index(fields=['workout', 'name'], name='workout_end_workout_5c2856_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='flexibilityexercise',
+            index=models.Index(fields=['user', 'updated_at'], name='workout_fle_user_id_1c5096_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='flexibilityexercise',
+            index=models.Index(fields=['workout', 'name'], name='workout_fle_workout_80c5d7_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='strengthtrainingexercise',
+            index=models.Index(fields=['user', 'updated_at'], name='workout_str_user_id_a069fe_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='strengthtrainingexercise',
+            index=models.Index(fields=['workout', 'name'], name='workout_str_workout_02adb5_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='userchallenge',
+            index=models.Index(fields=['workout', 'user'], name='workout_use_workout_e77fa6_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='workout',
+            index=models.Index(fields=['user', '-id'], name='workout_wor_user_id_33b533_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='workout',
+            index=models.Index(fields=['user', '-updated_at'], name='workout_wor_user_id_6bf4a0_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='workout',
+            index=models.Index(fields=['user', 'is_shared', '-updated_at'], name='workout_wor_user_id_e55c23_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='workout',
+            index=models.Index(condition=models.Q(('is_shared', True)), fields=['challenge'], name='workout_shared_challenge_idx'),
+        ),
+    ]
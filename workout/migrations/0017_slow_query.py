@@ -0,0 +1,31 @@
+# Generated by Django 4.0 on 2026-10-18 10:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('workout', '0015_hot_query_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SlowQuery',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('recorded_at', models.DateTimeField()),
+                ('duration_ms', models.FloatField()),
+                ('alias', models.CharField(max_length=50)),
+                ('view', models.CharField(max_length=255)),
+                ('sql', models.TextField()),
+                ('params', models.TextField()),
+                ('plan', models.TextField()),
+                ('source', models.TextField()),
+            ],
+            options={
+                'verbose_name_plural': 'slow queries',
+                'managed': False,
+            },
+        ),
+    ]
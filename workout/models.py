@@ -1,11 +1,116 @@
-from django.db import models
+from django.conf import settings
+from django.core.cache import caches
+from django.db import IntegrityError, models, transaction
+from django.db.models import Count, DecimalField, F, Q, Sum
+from django.db.models.functions import Lower, TruncDate
+from django.utils import timezone
 import re # regex for email validation
-import bcrypt # bcrypt for password encryption/decryption
+from . import page_cache, request_log # structured request log instead of stdout
+from .passwords import PasswordHashingBusy, check_password, hash_password, needs_rehash # bcrypt, off the request thread
+import copy
+import threading
+import time
+import uuid
+from collections import OrderedDict
 from decimal import * # for decimal number purposes
 
+# Error shown when a concurrent registration/update took the username or email first:
+USER_TAKEN_ERROR = "Username or email address is already registered to another user."
+
+# Error shown when the password hashing pool is saturated, see `passwords.PasswordHashingBusy`:
+PASSWORD_HASHING_BUSY_ERROR = "The server is busy, please try again in a moment."
+
+# In-process cache of session users: {user_id: (expires_at, version, User)}, see `UserManager.get_session_user()`.
+_session_users = OrderedDict()
+# Key of a user's version in the `SESSION_USER_CACHE_ALIAS` cache, shared by the workers:
+SESSION_USER_VERSION_KEY = "session_user:%s"
+_session_users_lock = threading.Lock()
+
+def get_session_user_cache():
+    """Cache holding the versions of the session users, see `UserManager.get_session_user()`."""
+    return caches[getattr(settings, "SESSION_USER_CACHE_ALIAS", "default")]
+
+
 class UserManager(models.Manager):
     """Additional instance method functions for `User`"""
 
+    def get_session_user(self, user_id):
+        """
+        Returns the logged in `User` for a session's `user_id`, or `None` if there is no such user.
+
+        Parameters:
+        - `self` - Instance to whom this method belongs.
+        - `user_id` - Id stored in `request.session["user_id"]`.
+
+        Users are kept in a small in-process LRU cache (`SESSION_USER_CACHE_SIZE` entries, each valid for
+        `SESSION_USER_CACHE_TTL` seconds) which `update()` and `update_password()` invalidate. Each entry
+        carries the user's version from the `SESSION_USER_CACHE_ALIAS` cache, which invalidating replaces,
+        so with a cache shared by the workers (see `CACHE_URL`) all of them drop the entry at once. Callers
+        get their own copy, so a cached instance is never shared between requests.
+        """
+        ttl = getattr(settings, "SESSION_USER_CACHE_TTL", 60)
+        version = None
+        if ttl > 0:
+            now = time.monotonic()
+            version = get_session_user_cache().get(SESSION_USER_VERSION_KEY % user_id)
+            with _session_users_lock:
+                cached = _session_users.get(user_id)
+                if cached is not None and cached[0] > now and cached[1] == version:
+                    _session_users.move_to_end(user_id)
+                    return copy.copy(cached[2])
+
+        try:
+            user = self.get(id=user_id)
+        except (User.DoesNotExist, ValueError):
+            return None
+        if ttl <= 0:
+            return user
+
+        with _session_users_lock:
+            _session_users[user_id] = (now + ttl, version, user)
+            _session_users.move_to_end(user_id)
+            while len(_session_users) > getattr(settings, "SESSION_USER_CACHE_SIZE", 1024):
+                _session_users.popitem(last=False)
+        return copy.copy(user)
+
+    def with_username(self, username):
+        """
+        Returns the users whose username equals `username`, ignoring case.
+
+        Parameters:
+        - `self` - Instance to whom this method belongs.
+        - `username` - Username to look for.
+
+        Filters on `LOWER(username)`, which is what the unique index of `User` covers, so this is an index seek.
+        """
+        return self.alias(username_lower=Lower('username')).filter(username_lower=username.lower())
+
+    def with_email(self, email):
+        """
+        Returns the users whose email equals `email`, ignoring case.
+
+        Parameters:
+        - `self` - Instance to whom this method belongs.
+        - `email` - Email address to look for.
+
+        Filters on `LOWER(email)`, which is what the unique index of `User` covers, so this is an index seek.
+        """
+        return self.alias(email_lower=Lower('email')).filter(email_lower=email.lower())
+
+    def invalidate_session_user(self, user_id):
+        """
+        Drops a user from the session user cache, after it was changed.
+
+        Parameters:
+        - `self` - Instance to whom this method belongs.
+        - `user_id` - Id of the changed user.
+        """
+        # Other workers see the new version:
+        get_session_user_cache().set(SESSION_USER_VERSION_KEY % user_id, uuid.uuid4().hex, timeout=None)
+        with _session_users_lock:
+            _session_users.pop(user_id, None)
+            _session_users.pop(str(user_id), None)
+
     def register(self, **kwargs):
         """
         Validates and registers a new user.
@@ -40,7 +145,7 @@ class UserManager(models.Manager):
         #-- EXISTING: --#
         #---------------#
         # Check for existing User via username:
-        if len(User.objects.filter(username=kwargs["username"][0])) > 0:
+        if self.with_username(kwargs["username"][0]).exists():
             errors.append('Username is already registered to another user.')
 
         #------------#
@@ -61,7 +166,7 @@ class UserManager(models.Manager):
                 #-- EXISTING: --#
                 #---------------#
                 # Check for existing User via email:
-                if len(User.objects.filter(email=kwargs["email"][0])) > 0:
+                if self.with_email(kwargs["email"][0]).exists():
                     errors.append('Email address is already registered to another user.')
 
         #---------------#
@@ -78,25 +183,26 @@ class UserManager(models.Manager):
         # Check for validation errors:
         # If none, hash password, create user and send new user back:
         if len(errors) == 0:
-            kwargs["password"][0] = bcrypt.hashpw((kwargs["password"][0]).encode(), bcrypt.gensalt(14))
-            
-            init_password = kwargs["password"][0]
-            
-            if(type(init_password) is bytes):
-                init_password = init_password.decode("utf-8")
-            
+            try:
+                init_password = hash_password(kwargs["password"][0])
+            except PasswordHashingBusy:
+                return {"errors": [PASSWORD_HASHING_BUSY_ERROR]}
+
             # Create new validated User:
             validated_user = {
                 "logged_in_user": User(username=kwargs["username"][0], email=kwargs["email"][0], password=init_password),
             }
-            # Save new User:
-            validated_user["logged_in_user"].save()
+            # Save new User; the unique indexes catch registrations racing past the checks above:
+            try:
+                with transaction.atomic():
+                    validated_user["logged_in_user"].save()
+            except IntegrityError:
+                return {"errors": [USER_TAKEN_ERROR]}
             # Return created User:
             return validated_user
         else:
-            # Else, if validation fails, print errors to console and return errors object:
-            for error in errors:
-                print("Validation Error: ", error)
+            # Else, if validation fails, record errors in the request log and return errors object:
+            request_log.add("validation_errors", *errors)
             # Prepare data for controller:
             errors = {
                 "errors": errors,
@@ -132,7 +238,7 @@ class UserManager(models.Manager):
             #------------------#
             # Look for existing User to login by username:
             try:
-                logged_in_user = User.objects.get(username=kwargs["username"][0])
+                logged_in_user = self.with_username(kwargs["username"][0]).get()
 
                 #------------------#
                 #---- PASSWORD ----#
@@ -141,21 +247,23 @@ class UserManager(models.Manager):
                 # Note: We must encode both prior to testing
                 try:
 
-                    password = kwargs["password"][0].encode()
-                    hashed = logged_in_user.password.encode()
-
-                    if not (bcrypt.checkpw(password, hashed)):
-                        print("ERROR: PASSWORD IS INCORRECT")
+                    if not check_password(kwargs["password"][0], logged_in_user.password):
+                        request_log.add("auth_failures", "password")
                         # Note: We send back a general error that does not specify what credential is invalid: this is for security purposes and is admittedly a slight inconvenience to our user, but makes it harder to gather information from the server during brute for attempts
                         errors.append("Username or password is incorrect.")
+                    elif needs_rehash(logged_in_user.password):
+                        # Stored hash uses an outdated cost factor, rehash while we have the plain password:
+                        self.rehash_password(logged_in_user, kwargs["password"][0])
 
                 except ValueError:
                     # If user's stored password is unable to be used by bcrypt (likely b/c password is not hashed):
                     errors.append('This user is corrupt. Please contact the administrator.')
+                except PasswordHashingBusy:
+                    errors.append(PASSWORD_HASHING_BUSY_ERROR)
 
             # If existing User is not found:
             except User.DoesNotExist:
-                print("ERROR: USERNAME IS INVALID")
+                request_log.add("auth_failures", "username")
                 # Note: See password validation note above:
                 errors.append('Username or password is incorrect.')
 
@@ -167,16 +275,33 @@ class UserManager(models.Manager):
             }
             # Send back validated logged in User:
             return validated_user
-        # Else, if validation fails print errors and return errors to controller:
+        # Else, if validation fails record errors in the request log and return errors to controller:
         else:
-            for error in errors:
-                print("Validation Error: ", error)
+            request_log.add("validation_errors", *errors)
             # Prepare data for controller:
             errors = {
                 "errors": errors,
             }
             return errors
 
+    def rehash_password(self, user, password):
+        """
+        Stores a new hash of a user's password, made with the current `BCRYPT_ROUNDS`.
+
+        Parameters:
+        - `self` - Instance to whom this method belongs.
+        - `user` - User whose password was just checked.
+        - `password` - The user's plain password.
+
+        If the hashing pool is busy the old hash is kept; the next login will try again.
+        """
+        try:
+            user.password = hash_password(password)
+        except PasswordHashingBusy:
+            return
+        User.objects.filter(id=user.id).update(password=user.password)
+        self.invalidate_session_user(user.id)
+
     def update(self, **kwargs):
         """
         Validates and updates a user.
@@ -208,7 +333,7 @@ class UserManager(models.Manager):
             errors.append('Username must contain letters, numbers and basic characters only.')
             
         # Check for existing User via username:
-        if (kwargs["old_username"] != kwargs["username"]) and len(User.objects.filter(username=kwargs["username"])) > 0:
+        if self.with_username(kwargs["username"]).exclude(id=kwargs['user_id']).exists():
             errors.append('Username is already registered to another user.')
         
         #------------#
@@ -226,7 +351,7 @@ class UserManager(models.Manager):
                 errors.append('Email field is not a valid email format.')
             else:
                 # Check for existing User via email:
-                if (kwargs["old_email"] != kwargs["email"]) and len(User.objects.filter(email=kwargs["email"])) > 0:
+                if self.with_email(kwargs["email"]).exclude(id=kwargs['user_id']).exists():
                     errors.append('Email address is already registered to another user.')
         
         #-----------------#
@@ -248,24 +373,26 @@ class UserManager(models.Manager):
         # Check for validation errors:
         # If none, update user and return new user:
         if len(errors) == 0:
-            # Update user:
-            user = User.objects.filter(id=kwargs['user_id']).update(username=kwargs['username'], email=kwargs['email'], profile_photo_url=profile_photo_url, background_photo_url=background_photo_url)
+            # Update user; the unique indexes catch updates racing past the checks above:
+            try:
+                with transaction.atomic():
+                    user = User.objects.filter(id=kwargs['user_id']).update(username=kwargs['username'], email=kwargs['email'], profile_photo_url=profile_photo_url, background_photo_url=background_photo_url)
+            except IntegrityError:
+                return {"errors": [USER_TAKEN_ERROR]}
+            self.invalidate_session_user(kwargs['user_id'])
             
             # Return updated User:
             updated_user = {
                 "updated_user": user
             }
-            print(updated_user)
             return updated_user
         else:
-            # Else, if validation fails, print errors to console and return errors object:
-            for error in errors:
-                print("Validation Error: ", error)
+            # Else, if validation fails, record errors in the request log and return errors object:
+            request_log.add("validation_errors", *errors)
             # Prepare data for controller:
             errors = {
                 "errors": errors,
             }
-            print(errors)
             return errors
 
     def update_password(self, **kwargs):
@@ -295,43 +422,39 @@ class UserManager(models.Manager):
                 errors.append('Password and confirmation must match.')
         
         # Compare passwords with bcrypt:
-        password = kwargs["current_password"].encode()
-        hashed = kwargs["old_password"].encode()
-
-        if not (bcrypt.checkpw(password, hashed)):
-            print("ERROR: PASSWORD IS INCORRECT")
-            # Note: We send back a general error that does not specify what credential is invalid: this is for security purposes and is admittedly a slight inconvenience to our user, but makes it harder to gather information from the server during brute for attempts
-            errors.append("Current Password is incorrect.")
+        try:
+            if not check_password(kwargs["current_password"], kwargs["old_password"]):
+                request_log.add("auth_failures", "password")
+                # Note: We send back a general error that does not specify what credential is invalid: this is for security purposes and is admittedly a slight inconvenience to our user, but makes it harder to gather information from the server during brute for attempts
+                errors.append("Current Password is incorrect.")
+        except PasswordHashingBusy:
+            return {"errors": [PASSWORD_HASHING_BUSY_ERROR]}
 
 
         # Check for validation errors:
         # If none, hash password, update user and return new user:
         if len(errors) == 0:
-            kwargs["new_password"] = bcrypt.hashpw((kwargs["new_password"]).encode(), bcrypt.gensalt(14))
-            
-            init_password = kwargs["new_password"]
-            
-            if(type(init_password) is bytes):
-                init_password = init_password.decode("utf-8")
-            
+            try:
+                init_password = hash_password(kwargs["new_password"])
+            except PasswordHashingBusy:
+                return {"errors": [PASSWORD_HASHING_BUSY_ERROR]}
+
             # Update user:
             user = User.objects.filter(id=kwargs['user_id']).update(password=init_password)
+            self.invalidate_session_user(kwargs['user_id'])
 
             # Return updated User:
             updated_user = {
                 "updated_user": user
             }
-            print(updated_user)
             return updated_user
         else:
-            # Else, if validation fails, print errors to console and return errors object:
-            for error in errors:
-                print("Validation Error: ", error)
+            # Else, if validation fails, record errors in the request log and return errors object:
+            request_log.add("validation_errors", *errors)
             # Prepare data for controller:
             errors = {
                 "errors": errors,
             }
-            print(errors)
             return errors
 class WorkoutManager(models.Manager):
     """Additional instance method functions for `Workout`"""
@@ -393,9 +516,8 @@ class WorkoutManager(models.Manager):
             # Return created Workout:
             return validated_workout
         else:
-            # Else, if validation fails, print errors to console and return errors object:
-            for error in errors:
-                print("Validation Error: ", error)
+            # Else, if validation fails, record errors in the request log and return errors object:
+            request_log.add("validation_errors", *errors)
             # Prepare data for controller:
             errors = {
                 "errors": errors,
@@ -455,22 +577,24 @@ class WorkoutManager(models.Manager):
         if len(errors) == 0:
             # Update workout:
             workout = Workout.objects.filter(id=kwargs['workout_id']).update(name=kwargs['name'], description=kwargs["description"])
+            # `update()` sends no signals; the owner's pages and the dashboards of challenge participants show the name:
+            page_cache.invalidate_users(
+                list(Workout.objects.filter(id=kwargs['workout_id']).values_list('user_id', flat=True))
+                + list(UserChallenge.objects.filter(workout_id=kwargs['workout_id']).values_list('user_id', flat=True))
+            )
 
             # Return updated Workout:
             updated_workout = {
                 "updated_workout": workout
             }
-            print(updated_workout)
             return updated_workout
         else:
-            # Else, if validation fails, print errors to console and return errors object:
-            for error in errors:
-                print("Validation Error: ", error)
+            # Else, if validation fails, record errors in the request log and return errors object:
+            request_log.add("validation_errors", *errors)
             # Prepare data for controller:
             errors = {
                 "errors": errors,
             }
-            print(errors)
             return errors
 
 class ExerciseManager(models.Manager):
@@ -526,15 +650,64 @@ class ExerciseManager(models.Manager):
             # Return created Workout:
             return validated_exercise
         else:
-            # Else, if validation fails, print errors to console and return errors object:
-            for error in errors:
-                print("Validation Error: ", error)
+            # Else, if validation fails, record errors in the request log and return errors object:
+            request_log.add("validation_errors", *errors)
             # Prepare data for controller:
             errors = {
                 "errors": errors,
             }
             return errors
 
+    def save_exercise(self, exercise):
+        """
+        Saves a new exercise and adds it to the statistics rollup and the exercise index.
+
+        Parameters:
+        - `self` - Instance to whom this method belongs.
+        - `exercise` - Unsaved exercise instance.
+        """
+        with transaction.atomic():
+            exercise.save()
+            ExerciseDailyStat.objects.record(exercise)
+            ExerciseIndex.objects.sync(exercise)
+        return exercise
+
+    def update_fields(self, exercise_id, **fields):
+        """
+        Updates an exercise through `QuerySet.update()`, moving it within the statistics rollup and refreshing its index row.
+
+        Parameters:
+        - `self` - Instance to whom this method belongs.
+        - `exercise_id` - Id of the exercise to update.
+        - `**fields` - Field values passed on to `update()`.
+
+        Returns the number of updated rows.
+        """
+        with transaction.atomic():
+            previous = self.filter(id=exercise_id).first()
+            updated = self.filter(id=exercise_id).update(**fields)
+            if previous is not None:
+                exercise = self.get(id=exercise_id)
+                ExerciseDailyStat.objects.discard(previous)
+                ExerciseDailyStat.objects.record(exercise)
+                ExerciseIndex.objects.sync(exercise)
+                # `update()` sends no signals:
+                page_cache.invalidate_users([exercise.user_id])
+        return updated
+
+    def delete_exercise(self, exercise):
+        """
+        Deletes an exercise and removes it from the statistics rollup and the exercise index.
+
+        Parameters:
+        - `self` - Instance to whom this method belongs.
+        - `exercise` - Saved exercise instance.
+        """
+        with transaction.atomic():
+            ExerciseDailyStat.objects.discard(exercise)
+            ExerciseIndex.objects.discard(exercise)
+            exercise.delete()
+
     class Meta:
         abstract = True
 
@@ -599,13 +772,12 @@ class StrengthTrainingExerciseManager(ExerciseManager):
                 "exercise" : StrengthTrainingExercise(name=validated_exercise["name"], description=validated_exercise["description"], workout=validated_exercise["workout"], muscle_group=validated_exercise["muscle_group"], user=kwargs["user"], weight=kwargs["weight"], repetitions=kwargs["repetitions"]),
             }
             # save 
-            st_exercise["exercise"].save()
+            self.save_exercise(st_exercise["exercise"])
             # Return created Workout:
             return st_exercise
         else:
-            # Else, if validation fails, print errors to console and return errors object:
-            for error in errors:
-                print("Validation Error: ", error)
+            # Else, if validation fails, record errors in the request log and return errors object:
+            request_log.add("validation_errors", *errors)
             # Prepare data for controller:
             errors = {
                 "errors": errors,
@@ -662,7 +834,7 @@ class StrengthTrainingExerciseManager(ExerciseManager):
 
         if len(errors) == 0:
             # Create new validated exercise:
-            st_exercise = StrengthTrainingExercise.objects.filter(id=kwargs['exercise_id']).update(name=validated_exercise["name"], description=validated_exercise["description"], workout=validated_exercise["workout"], muscle_group=validated_exercise["muscle_group"], user=kwargs["user"], weight=kwargs["weight"], repetitions=kwargs["repetitions"])
+            st_exercise = self.update_fields(kwargs['exercise_id'], name=validated_exercise["name"], description=validated_exercise["description"], workout=validated_exercise["workout"], muscle_group=validated_exercise["muscle_group"], user=kwargs["user"], weight=kwargs["weight"], repetitions=kwargs["repetitions"])
 
             updated_exercise = {
                 "exercise": st_exercise
@@ -671,9 +843,8 @@ class StrengthTrainingExerciseManager(ExerciseManager):
             # Return created Workout:
             return updated_exercise
         else:
-            # Else, if validation fails, print errors to console and return errors object:
-            for error in errors:
-                print("Validation Error: ", error)
+            # Else, if validation fails, record errors in the request log and return errors object:
+            request_log.add("validation_errors", *errors)
             # Prepare data for controller:
             errors = {
                 "errors": errors,
@@ -736,13 +907,12 @@ class EnduranceTrainingExerciseManager(ExerciseManager):
                 "exercise" : EnduranceTrainingExercise(name=kwargs["name"], description=kwargs["description"], workout=kwargs["workout"], muscle_group=kwargs["muscle_group"], user=kwargs["user"], duration_minutes=kwargs["duration_minutes"], distance_km=kwargs["distance_km"]),
             }
             # save 
-            et_exercise["exercise"].save()
+            self.save_exercise(et_exercise["exercise"])
             # Return created Workout
             return et_exercise
         else:
-            # Else, if validation fails, print errors to console and return errors object:
-            for error in errors:
-                print("Validation Error: ", error)
+            # Else, if validation fails, record errors in the request log and return errors object:
+            request_log.add("validation_errors", *errors)
             # Prepare data for controller:
             errors = {
                 "errors": errors,
@@ -798,7 +968,7 @@ class EnduranceTrainingExerciseManager(ExerciseManager):
 
         if len(errors) == 0:
             # Create new validated exercise:
-            et_exercise = EnduranceTrainingExercise.objects.filter(id=kwargs['exercise_id']).update(name=kwargs["name"], description=kwargs["description"], workout=kwargs["workout"], muscle_group=kwargs["muscle_group"], user=kwargs["user"], duration_minutes=kwargs["duration_minutes"], distance_km=kwargs["distance_km"])
+            et_exercise = self.update_fields(kwargs['exercise_id'], name=kwargs["name"], description=kwargs["description"], workout=kwargs["workout"], muscle_group=kwargs["muscle_group"], user=kwargs["user"], duration_minutes=kwargs["duration_minutes"], distance_km=kwargs["distance_km"])
             
             updated_exercise = {
                 "exercise": et_exercise
@@ -807,9 +977,8 @@ class EnduranceTrainingExerciseManager(ExerciseManager):
             # Return created Workout
             return updated_exercise
         else:
-            # Else, if validation fails, print errors to console and return errors object:
-            for error in errors:
-                print("Validation Error: ", error)
+            # Else, if validation fails, record errors in the request log and return errors object:
+            request_log.add("validation_errors", *errors)
             # Prepare data for controller:
             errors = {
                 "errors": errors,
@@ -863,13 +1032,12 @@ class BalanceExerciseManager(ExerciseManager):
                 "exercise" : BalanceExercise(name=kwargs["name"], description=kwargs["description"], workout=kwargs["workout"], muscle_group=kwargs["muscle_group"], user=kwargs["user"], difficulty_level=kwargs["difficulty_level"]),
             }
             # save 
-            b_exercise["exercise"].save()
+            self.save_exercise(b_exercise["exercise"])
             # Return created Workout
             return b_exercise
         else:
-            # Else, if validation fails, print errors to console and return errors object:
-            for error in errors:
-                print("Validation Error: ", error)
+            # Else, if validation fails, record errors in the request log and return errors object:
+            request_log.add("validation_errors", *errors)
             # Prepare data for controller:
             errors = {
                 "errors": errors,
@@ -916,7 +1084,7 @@ class BalanceExerciseManager(ExerciseManager):
 
         if len(errors) == 0:
             # Create new validated exercise:
-            b_exercise = BalanceExercise.objects.filter(id=kwargs['exercise_id']).update(name=kwargs["name"], description=kwargs["description"], workout=kwargs["workout"], muscle_group=kwargs["muscle_group"], user=kwargs["user"], difficulty_level=kwargs["difficulty_level"])
+            b_exercise = self.update_fields(kwargs['exercise_id'], name=kwargs["name"], description=kwargs["description"], workout=kwargs["workout"], muscle_group=kwargs["muscle_group"], user=kwargs["user"], difficulty_level=kwargs["difficulty_level"])
             
             updated_exercise = {
                 "exercise": b_exercise
@@ -925,9 +1093,8 @@ class BalanceExerciseManager(ExerciseManager):
             # Return created Workout
             return updated_exercise
         else:
-            # Else, if validation fails, print errors to console and return errors object:
-            for error in errors:
-                print("Validation Error: ", error)
+            # Else, if validation fails, record errors in the request log and return errors object:
+            request_log.add("validation_errors", *errors)
             # Prepare data for controller:
             errors = {
                 "errors": errors,
@@ -982,13 +1149,12 @@ class FlexibilityExerciseManager(ExerciseManager):
             }
             
             # save 
-            f_exercise["exercise"].save()
+            self.save_exercise(f_exercise["exercise"])
             # Return created Workout
             return f_exercise
         else:
-            # Else, if validation fails, print errors to console and return errors object:
-            for error in errors:
-                print("Validation Error: ", error)
+            # Else, if validation fails, record errors in the request log and return errors object:
+            request_log.add("validation_errors", *errors)
             # Prepare data for controller:
             errors = {
                 "errors": errors,
@@ -1019,8 +1185,6 @@ class FlexibilityExerciseManager(ExerciseManager):
         if "errors" in validated_exercise:
             errors = validated_exercise["errors"]
             
-        print("git gut")
-            
         #---------------#
         #-- REQUIRED: --#
         #---------------#
@@ -1040,7 +1204,7 @@ class FlexibilityExerciseManager(ExerciseManager):
 
         if len(errors) == 0:
             # Create new validated exercise:
-            f_exercise = FlexibilityExercise.objects.filter(id=kwargs['exercise_id']).update(name=kwargs["name"], description=kwargs["description"], workout=kwargs["workout"], muscle_group=kwargs["muscle_group"], user=kwargs["user"], stretch_type=kwargs["stretch_type"])
+            f_exercise = self.update_fields(kwargs['exercise_id'], name=kwargs["name"], description=kwargs["description"], workout=kwargs["workout"], muscle_group=kwargs["muscle_group"], user=kwargs["user"], stretch_type=kwargs["stretch_type"])
             
             updated_exercise = {
                 "exercise": f_exercise
@@ -1049,15 +1213,182 @@ class FlexibilityExerciseManager(ExerciseManager):
             # Return created Workout
             return updated_exercise
         else:
-            # Else, if validation fails, print errors to console and return errors object:
-            for error in errors:
-                print("Validation Error: ", error)
+            # Else, if validation fails, record errors in the request log and return errors object:
+            request_log.add("validation_errors", *errors)
             # Prepare data for controller:
             errors = {
                 "errors": errors,
             }
             return errors
      
+class ExerciseDailyStatManager(models.Manager):
+    """Additional instance method functions for `ExerciseDailyStat`"""
+
+    def record(self, exercise):
+        """
+        Adds an exercise to the rollup row of its user, day, type and muscle group.
+
+        Parameters:
+        - `self` - Instance to whom this method belongs.
+        - `exercise` - Saved exercise instance.
+        """
+        self._apply(exercise, 1)
+
+    def discard(self, exercise):
+        """
+        Removes an exercise from the rollup row of its user, day, type and muscle group.
+
+        Parameters:
+        - `self` - Instance to whom this method belongs.
+        - `exercise` - Exercise instance, as it was last recorded.
+        """
+        self._apply(exercise, -1)
+
+    def discard_workout(self, workout):
+        """
+        Removes all exercises of a workout from the rollup, before the workout is deleted.
+
+        Parameters:
+        - `self` - Instance to whom this method belongs.
+        - `workout` - Workout instance whose exercises are about to be deleted.
+        """
+        for exercise_type in Exercise.__subclasses__():
+            for exercise in exercise_type.objects.filter(workout__id=workout.id):
+                self.discard(exercise)
+
+    def _apply(self, exercise, sign):
+        # Exercises are bucketed by the day they were last updated, just like the statistics windows:
+        key = {
+            "user_id": exercise.user_id,
+            "day": timezone.localdate(exercise.updated_at),
+            "exercise_type": exercise.class_name(),
+            "muscle_group_id": exercise.muscle_group_id,
+        }
+        changes = {"count": F("count") + sign}
+        for field, value in exercise.rollup_values().items():
+            changes[field] = F(field) + sign * value
+
+        with transaction.atomic():
+            stat, created = self.get_or_create(**key)
+            # Increment in the database so concurrent writers don't overwrite each other:
+            self.filter(pk=stat.pk).update(**changes)
+            # Empty buckets are not needed:
+            self.filter(pk=stat.pk, count__lte=0).delete()
+
+    def rebuild(self, user_id=None):
+        """
+        Recomputes the rollup from the exercise tables, for backfill and repair.
+
+        Parameters:
+        - `self` - Instance to whom this method belongs.
+        - `user_id` - Only rebuild this user's rows; all users if `None`.
+
+        Returns the number of rollup rows created.
+        """
+        created = 0
+        with transaction.atomic():
+            stats = self.all() if user_id is None else self.filter(user_id=user_id)
+            stats.delete()
+
+            for exercise_type in Exercise.__subclasses__():
+                exercises = exercise_type.objects.all() if user_id is None else exercise_type.objects.filter(user_id=user_id)
+                rows = (
+                    exercises.order_by()
+                    .annotate(day=TruncDate("updated_at"))
+                    .values("user_id", "day", "muscle_group_id")
+                    .annotate(count=Count("id"), **exercise_type.rollup_aggregates())
+                )
+                stats = self.bulk_create(
+                    [ExerciseDailyStat(exercise_type=exercise_type.__name__, **row) for row in rows],
+                    batch_size=500,
+                )
+                created += len(stats)
+        # Cached statistics pages may show the counts this repaired:
+        if user_id is None:
+            page_cache.invalidate_all()
+        else:
+            page_cache.invalidate_users([user_id])
+        return created
+
+class ExerciseIndexManager(models.Manager):
+    """Additional instance method functions for `ExerciseIndex`"""
+
+    def sync(self, exercise):
+        """
+        Creates or refreshes the index row of an exercise.
+
+        Parameters:
+        - `self` - Instance to whom this method belongs.
+        - `exercise` - Saved exercise instance.
+        """
+        self.update_or_create(
+            exercise_type=exercise.class_name(),
+            exercise_id=exercise.id,
+            defaults={
+                "user_id": exercise.user_id,
+                "workout_id": exercise.workout_id,
+                "muscle_group_id": exercise.muscle_group_id,
+                "name": exercise.name,
+                "updated_at": exercise.updated_at,
+            },
+        )
+
+    def discard(self, exercise):
+        """
+        Removes the index row of an exercise.
+
+        Parameters:
+        - `self` - Instance to whom this method belongs.
+        - `exercise` - Exercise instance.
+        """
+        self.filter(exercise_type=exercise.class_name(), exercise_id=exercise.id).delete()
+
+    def rebuild(self):
+        """
+        Recreates the whole index from the four exercise tables, for repair.
+
+        Returns the number of index rows created.
+        """
+        created = 0
+        with transaction.atomic():
+            self.all().delete()
+            for exercise_type in Exercise.__subclasses__():
+                rows = exercise_type.objects.order_by().values_list("id", "user_id", "workout_id", "muscle_group_id", "name", "updated_at")
+                index = self.bulk_create(
+                    [
+                        ExerciseIndex(exercise_type=exercise_type.__name__, exercise_id=id, user_id=user_id, workout_id=workout_id, muscle_group_id=muscle_group_id, name=name, updated_at=updated_at)
+                        for id, user_id, workout_id, muscle_group_id, name, updated_at in rows.iterator()
+                    ],
+                    batch_size=500,
+                )
+                created += len(index)
+        page_cache.invalidate_all()
+        return created
+
+    def hydrate(self, index_rows, select_related=()):
+        """
+        Fetches the typed exercises behind index rows, keeping the order of `index_rows`.
+
+        Parameters:
+        - `self` - Instance to whom this method belongs.
+        - `index_rows` - Iterable of `ExerciseIndex` instances, e.g. an ordered (and sliced) queryset.
+        - `select_related` - Relations to join on the typed exercise queries.
+
+        Issues at most one query per exercise type present in `index_rows`.
+        """
+        index_rows = list(index_rows)
+        ids_by_type = {}
+        for row in index_rows:
+            ids_by_type.setdefault(row.exercise_type, []).append(row.exercise_id)
+
+        exercise_types = {exercise_type.__name__: exercise_type for exercise_type in Exercise.__subclasses__()}
+        exercises = {
+            name: exercise_types[name].objects.select_related(*select_related).in_bulk(ids)
+            for name, ids in ids_by_type.items()
+        }
+        # Rows whose exercise was deleted in the meantime are skipped:
+        return [exercises[row.exercise_type][row.exercise_id] for row in index_rows if row.exercise_id in exercises[row.exercise_type]]
+
 class User(models.Model):
     """Creates instances of `User`."""
     username = models.CharField(max_length=20)
@@ -1068,6 +1399,13 @@ class User(models.Model):
     profile_photo_url = models.CharField(max_length=255, blank=True, null=True)
     background_photo_url = models.CharField(max_length=255, blank=True, null=True)
     objects = UserManager() 
+
+    class Meta:
+        # Usernames and emails are unique regardless of case; these also index the login lookups:
+        constraints = [
+            models.UniqueConstraint(Lower('username'), name='workout_user_username_lower_unique'),
+            models.UniqueConstraint(Lower('email'), name='workout_user_email_lower_unique'),
+        ]
     
     def __str__(self):
         return self.username
@@ -1097,6 +1435,17 @@ class Workout(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            # Dashboard (newest by id) and workout lists (newest by `updated_at`) of a user:
+            models.Index(fields=['user', '-id']),
+            models.Index(fields=['user', '-updated_at']),
+            # Shared workouts on a profile:
+            models.Index(fields=['user', 'is_shared', '-updated_at']),
+            # The challenges page; `is_shared` alone isn't selective, so only shared workouts are indexed:
+            models.Index(fields=['challenge'], condition=Q(is_shared=True), name='workout_shared_challenge_idx'),
+        ]
+
     def __str__(self):
         return self.name
     
@@ -1113,6 +1462,10 @@ class UserChallenge(models.Model):
 
     class Meta:
         unique_together = ['user', 'challenge']
+        indexes = [
+            # Participants of a challenge workout, and a user's entry for it:
+            models.Index(fields=['workout', 'user']),
+        ]
         
     def __str__(self):
         return self.challenge.name
@@ -1158,11 +1511,27 @@ class Exercise(models.Model):
     def class_name(self):
         return self.__class__.__name__
 
+    def rollup_values(self):
+        """Type-specific sums this exercise adds to its `ExerciseDailyStat` row."""
+        return {}
+
+    @classmethod
+    def rollup_aggregates(cls):
+        """Aggregates computing `rollup_values()` over a queryset, used by `ExerciseDailyStat.objects.rebuild()`."""
+        return {}
+
 class StrengthTrainingExercise(Exercise):
     """Creates instances of `StrengthTrainingExercise`."""
     weight = models.DecimalField(max_digits=6, decimal_places=2)
     repetitions = models.PositiveIntegerField()
     objects = StrengthTrainingExerciseManager()
+
+    class Meta(Exercise.Meta):
+        indexes = [
+            models.Index(fields=['user', 'updated_at']),
+            models.Index(fields=['workout', 'name']),
+        ]
+
     def __str__(self):
         return self.name
     
@@ -1181,11 +1550,25 @@ class StrengthTrainingExercise(Exercise):
     def exercise_name(self):
         return "Strength Training"
 
+    def rollup_values(self):
+        # Values may still be the raw form strings right after `new_exercise()`:
+        return {"weight_volume": Decimal(str(self.weight)) * Decimal(str(self.repetitions))}
+
+    @classmethod
+    def rollup_aggregates(cls):
+        return {"weight_volume": Sum(F("weight") * F("repetitions"), output_field=DecimalField(max_digits=14, decimal_places=2))}
+
 class EnduranceTrainingExercise(Exercise):
     """Creates instances of `EnduranceTrainingExercise`."""
     duration_minutes = models.PositiveIntegerField()
     distance_km = models.DecimalField(max_digits=6, decimal_places=2)
     objects = EnduranceTrainingExerciseManager()
+
+    class Meta(Exercise.Meta):
+        indexes = [
+            models.Index(fields=['user', 'updated_at']),
+            models.Index(fields=['workout', 'name']),
+        ]
     
     def __str__(self): 
         return self.name
@@ -1204,10 +1587,27 @@ class EnduranceTrainingExercise(Exercise):
     def exercise_name(self):
         return "Endurance Training"
 
+    def rollup_values(self):
+        # Values may still be the raw form strings right after `new_exercise()`:
+        return {
+            "duration_minutes": int(Decimal(str(self.duration_minutes))),
+            "distance_km": Decimal(str(self.distance_km)),
+        }
+
+    @classmethod
+    def rollup_aggregates(cls):
+        return {"duration_minutes": Sum("duration_minutes"), "distance_km": Sum("distance_km")}
+
 class BalanceExercise(Exercise):
     """Creates instances of `BalanceExercise`."""
     difficulty_level = models.CharField(max_length=50)
     objects = BalanceExerciseManager()
+
+    class Meta(Exercise.Meta):
+        indexes = [
+            models.Index(fields=['user', 'updated_at']),
+            models.Index(fields=['workout', 'name']),
+        ]
     
     def __str__(self):
         return self.name
@@ -1227,6 +1627,12 @@ class FlexibilityExercise(Exercise):
     """Creates instances of `FlexibilityExercise`."""
     stretch_type = models.CharField(max_length=50) 
     objects = FlexibilityExerciseManager()
+
+    class Meta(Exercise.Meta):
+        indexes = [
+            models.Index(fields=['user', 'updated_at']),
+            models.Index(fields=['workout', 'name']),
+        ]
     
     def __str__(self):
         return self.name
@@ -1242,6 +1648,63 @@ class FlexibilityExercise(Exercise):
     def exercise_name(self):
         return "Flexibility"
 
+class ExerciseDailyStat(models.Model):
+    """Creates instances of `ExerciseDailyStat`, a per user, day, exercise type and muscle group rollup of exercises."""
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    day = models.DateField()
+    exercise_type = models.CharField(max_length=50)
+    muscle_group = models.ForeignKey(MuscleGroup, on_delete=models.CASCADE)
+    count = models.IntegerField(default=0)
+    weight_volume = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    duration_minutes = models.IntegerField(default=0)
+    distance_km = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    objects = ExerciseDailyStatManager()
+
+    class Meta:
+        unique_together = ['user', 'day', 'exercise_type', 'muscle_group']
+
+    def __str__(self):
+        return "%s %s %s" % (self.day, self.exercise_type, self.count)
+
+class ExerciseIndex(models.Model):
+    """Creates instances of `ExerciseIndex`, one row per exercise across the four exercise tables."""
+    exercise_type = models.CharField(max_length=50)
+    exercise_id = models.BigIntegerField()
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    workout = models.ForeignKey(Workout, on_delete=models.CASCADE)
+    muscle_group = models.ForeignKey(MuscleGroup, on_delete=models.CASCADE)
+    name = models.CharField(max_length=50)
+    updated_at = models.DateTimeField()
+    objects = ExerciseIndexManager()
+
+    class Meta:
+        unique_together = ['exercise_type', 'exercise_id']
+        indexes = [
+            models.Index(fields=['user', 'updated_at']),
+            models.Index(fields=['workout', 'updated_at']),
+        ]
+
+    def __str__(self):
+        return self.name
+
+class SlowQuery(models.Model):
+    """Admin entry of the in-memory slow-query log (see `slow_queries.py`); it has no table."""
+    recorded_at = models.DateTimeField()
+    duration_ms = models.FloatField()
+    alias = models.CharField(max_length=50)
+    view = models.CharField(max_length=255)
+    sql = models.TextField()
+    params = models.TextField()
+    plan = models.TextField()
+    source = models.TextField()
+
+    class Meta:
+        managed = False
+        verbose_name_plural = "slow queries"
+
+    def __str__(self):
+        return "%s ms in %s" % (self.duration_ms, self.view)
+
 class FormData: 
     """Creates instances of `FormData`."""
     def __init__(self, name, type, placeholder, value):
@@ -0,0 +1,138 @@
+"""
+page_cache.py
+
+Per-user cache of the computed contexts of the heaviest pages (dashboard, history, statistics, workout).
+
+Entries are keyed by a version of their user, which the `post_save`/`post_delete` receivers of
+`Workout`, the exercise models, `UserChallenge` and `Challenge` (see `apps.WorkoutConfig.ready()`)
+and the managers' `QuerySet.update()`s replace with a new one. An entry is never read again after its
+user changed something, so it's never stale and doesn't need a short timeout; `PAGE_CACHE_TIMEOUT`
+only bounds how long unused entries take up room. `invalidate_all()` changes the version of everyone,
+e.g. after the statistics were rebuilt, and when a `MuscleGroup`, shown on everyone's pages, changes
+in the admin.
+
+Entries live in the `PAGE_CACHE_ALIAS` cache (see `settings.CACHES`): in-process by default, or a
+file-based or shared cache, so every worker of a server sees the same versions. Lookups are counted
+per view and result in the `workout_page_cache_requests_total` metric.
+"""
+
+import hashlib
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models.signals import post_save
+
+from workout_logger import metrics
+
+from . import replicas
+
+GENERATION_KEY = "page_cache:generation"
+USER_VERSION_KEY = "page_cache:user:%s"
+
+
+def get_cache():
+    return caches[getattr(settings, "PAGE_CACHE_ALIAS", "default")]
+
+
+def is_enabled():
+    return getattr(settings, "PAGE_CACHE_ENABLED", True)
+
+
+def new_version():
+    # Unique rather than incremented, so a version key evicted and made again never matches old entries:
+    return uuid.uuid4().hex
+
+
+def get_versions(user_id):
+    """Returns `(generation, user version)`, making missing ones, in one cache round trip."""
+    cache = get_cache()
+    keys = [GENERATION_KEY, USER_VERSION_KEY % user_id]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            # Another process may have made it first:
+            cache.add(key, new_version(), timeout=None)
+            versions[key] = cache.get(key)
+    return versions[GENERATION_KEY], versions[USER_VERSION_KEY % user_id]
+
+
+def get_key(user_id, view, parts):
+    generation, version = get_versions(user_id)
+    # Parts come from the query string, so they're hashed into a valid key of any length:
+    digest = hashlib.md5(repr(parts).encode()).hexdigest()
+    return "page_cache:%s:%s:%s:%s:%s" % (view, user_id, generation, version, digest)
+
+
+def get_or_set(user_id, view, compute, *parts):
+    """
+    Returns the cached context of `view` for the user, or computes and caches it.
+
+    Args:
+        user_id: Id of the user the context belongs to; only their own data may be in it.
+        view: Name of the page, labelling the metric.
+        compute: Callable returning a picklable context, or `None` if it mustn't be cached. Contexts
+            read from the replica (see `replicas.py`) aren't cached either.
+        parts: What else the context depends on, e.g. the page number.
+    """
+    if not is_enabled():
+        return compute()
+    cache = get_cache()
+    # Read before computing: if the user changes something meanwhile, the entry is stored under the old version:
+    key = get_key(user_id, view, parts)
+    context = cache.get(key)
+    if context is not None:
+        metrics.registry.inc("workout_page_cache_requests_total", (("view", view), ("result", "hit")))
+        return context
+    metrics.registry.inc("workout_page_cache_requests_total", (("view", view), ("result", "miss")))
+    context = compute()
+    # A lagging replica may not have the user's latest writes yet, which the version already counts:
+    if context is not None and replicas.get_read_alias() is None:
+        cache.set(key, context, timeout=getattr(settings, "PAGE_CACHE_TIMEOUT", 3600))
+    return context
+
+
+def bump(keys):
+    get_cache().set_many({key: new_version() for key in keys}, timeout=None)
+
+
+def invalidate_users(user_ids):
+    """Makes the cached pages of the users miss, now and again when the current transaction commits."""
+    keys = [USER_VERSION_KEY % user_id for user_id in set(user_ids) if user_id is not None]
+    if not keys or not is_enabled():
+        return
+    bump(keys)
+    # A page computed before the commit doesn't show the change yet:
+    if transaction.get_connection().in_atomic_block:
+        transaction.on_commit(lambda: bump(keys))
+
+
+def invalidate_all(sender=None, **kwargs):
+    """Makes everyone's cached pages miss, like `invalidate_users()`; also the receiver of `MuscleGroup`."""
+    if not is_enabled():
+        return
+    bump([GENERATION_KEY])
+    if transaction.get_connection().in_atomic_block:
+        transaction.on_commit(lambda: bump([GENERATION_KEY]))
+
+
+def invalidate_owner(sender, instance, **kwargs):
+    """Receiver of the exercise models and `UserChallenge`."""
+    invalidate_users([instance.user_id])
+
+
+def invalidate_workout(sender, instance, signal=None, created=False, **kwargs):
+    """Receiver of `Workout`: its owner, and the participants whose dashboards show it if it's a challenge."""
+    user_ids = [instance.user_id]
+    # Deleting it deleted their entries, which invalidated them already:
+    if instance.challenge_id is not None and signal is post_save and not created:
+        user_ids.extend(instance.userchallenge_set.values_list("user_id", flat=True))
+    invalidate_users(user_ids)
+
+
+def invalidate_participants(sender, instance, **kwargs):
+    """Receiver of `Challenge`, whose name the dashboards of its participants and the workouts of its owners show."""
+    user_ids = list(instance.userchallenge_set.values_list("user_id", flat=True))
+    user_ids.extend(instance.workout_set.values_list("user_id", flat=True))
+    invalidate_users(user_ids)
@@ -0,0 +1,160 @@
+"""
+passwords.py
+
+Hashes and checks passwords with bcrypt on a bounded pool of worker threads.
+
+bcrypt releases the GIL while it works, so running it on a pool lets a worker process keep serving
+other requests while a login is being checked, and `PASSWORD_HASHING_WORKERS` caps how many CPUs
+hashing may use at once. At most `PASSWORD_HASHING_MAX_PENDING` calls are queued or running; past
+that, `PasswordHashingBusy` is raised right away instead of piling up requests behind the pool.
+
+The cost factor is `BCRYPT_ROUNDS`, see `manage.py calibrate_bcrypt`.
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import bcrypt
+from django.conf import settings
+
+DEFAULT_ROUNDS = 14
+DEFAULT_WORKERS = 2
+DEFAULT_MAX_PENDING = 32
+
+
+class PasswordHashingBusy(Exception):
+    """Raised when too many passwords are already waiting to be hashed or checked."""
+
+
+class PasswordHasherPool:
+    """Bounded thread pool running bcrypt calls, with queue-depth metrics."""
+
+    def __init__(self, workers, max_pending):
+        self.max_pending = max_pending
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bcrypt")
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._lock = threading.Lock()
+        self._metrics = {
+            "workers": workers,
+            "max_pending": max_pending,
+            "pending": 0,
+            "running": 0,
+            "peak_pending": 0,
+            "completed": 0,
+            "rejected": 0,
+            "wait_seconds_total": 0.0,
+            "run_seconds_total": 0.0,
+        }
+
+    def run(self, function, *args):
+        """
+        Runs `function(*args)` on the pool and waits for its result.
+
+        Raises:
+            PasswordHashingBusy: If `max_pending` calls are already queued or running.
+        """
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self._metrics["rejected"] += 1
+            raise PasswordHashingBusy()
+
+        with self._lock:
+            self._metrics["pending"] += 1
+            self._metrics["peak_pending"] = max(self._metrics["peak_pending"], self._metrics["pending"])
+        try:
+            return self._executor.submit(self._timed, time.perf_counter(), function, *args).result()
+        finally:
+            with self._lock:
+                self._metrics["pending"] -= 1
+            self._slots.release()
+
+    def _timed(self, queued_at, function, *args):
+        started_at = time.perf_counter()
+        with self._lock:
+            self._metrics["running"] += 1
+            self._metrics["wait_seconds_total"] += started_at - queued_at
+        try:
+            return function(*args)
+        finally:
+            with self._lock:
+                self._metrics["running"] -= 1
+                self._metrics["completed"] += 1
+                self._metrics["run_seconds_total"] += time.perf_counter() - started_at
+
+    def metrics(self):
+        """Returns a snapshot of the pool's counters."""
+        with self._lock:
+            return dict(self._metrics)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """Returns the process-wide `PasswordHasherPool`, created on first use from the settings."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = PasswordHasherPool(
+                workers=getattr(settings, "PASSWORD_HASHING_WORKERS", DEFAULT_WORKERS),
+                max_pending=getattr(settings, "PASSWORD_HASHING_MAX_PENDING", DEFAULT_MAX_PENDING),
+            )
+        return _pool
+
+
+def get_rounds():
+    """Returns the configured bcrypt cost factor."""
+    return getattr(settings, "BCRYPT_ROUNDS", DEFAULT_ROUNDS)
+
+
+def get_hash_rounds(hashed):
+    """
+    Returns the cost factor a bcrypt hash was created with, e.g. 14 for `$2b$14$...`.
+
+    Raises:
+        ValueError: If `hashed` isn't a bcrypt hash.
+    """
+    parts = hashed.split("$")
+    if len(parts) != 4 or not parts[2].isdigit():
+        raise ValueError("Not a bcrypt hash.")
+    return int(parts[2])
+
+
+def hash_password(password, rounds=None):
+    """
+    Hashes a password on the pool.
+
+    Args:
+        password: Password as `str`.
+        rounds: Cost factor, defaults to `BCRYPT_ROUNDS`.
+
+    Returns:
+        Hash as `str`, ready to be stored in `User.password`.
+    """
+    salt = bcrypt.gensalt(rounds or get_rounds())
+    return get_pool().run(bcrypt.hashpw, password.encode(), salt).decode("utf-8")
+
+
+def check_password(password, hashed):
+    """
+    Checks a password against a stored hash on the pool.
+
+    Raises:
+        ValueError: If `hashed` can't be used by bcrypt (e.g. the password was stored unhashed).
+    """
+    return get_pool().run(bcrypt.checkpw, password.encode(), hashed.encode())
+
+
+def needs_rehash(hashed):
+    """Returns `True` if a stored hash was created with a cost factor other than `BCRYPT_ROUNDS`."""
+    try:
+        return get_hash_rounds(hashed) != get_rounds()
+    except ValueError:
+        return False
+
+
+def get_metrics():
+    """Returns the queue-depth and timing counters of the hashing pool."""
+    return get_pool().metrics()
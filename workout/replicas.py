@@ -0,0 +1,124 @@
+"""
+replicas.py
+
+Read replica for the read-only, query-heavy views, so they don't compete with the writes on the primary.
+
+When a `REPLICA_DATABASE` is configured, `middleware.ReplicaMiddleware` makes the GET requests of
+the views in `REPLICA_VIEWS` read from it through `ReplicaRouter`; writes always go to the primary.
+A replica lags behind, so a user who just posted could miss their change: the value of a view in
+`REPLICA_VIEWS` is how many seconds after the user's last POST it keeps reading from the primary
+(read-your-writes), and 0 for views where a stale page is fine. The time of the last POST is kept
+in the `REPLICA_PIN_COOKIE` cookie.
+
+The replica is either a PostgreSQL standby, or a copy of the SQLite database refreshed by
+`manage.py refresh_replica` with SQLite's online backup API.
+"""
+
+import sqlite3
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+SAFE_METHODS = ("GET", "HEAD")
+
+_read_alias = ContextVar("replica_read_alias", default=None)
+
+
+def get_replica_alias():
+    return getattr(settings, "REPLICA_DATABASE", "replica")
+
+
+def is_configured():
+    return get_replica_alias() in connections.settings
+
+
+def get_read_alias():
+    """Returns the database the current request reads from, `None` for the default one."""
+    return _read_alias.get()
+
+
+def set_read_alias(alias):
+    _read_alias.set(alias)
+
+
+@contextmanager
+def reading_from(alias):
+    """Routes the reads inside the block to `alias`, e.g. `reading_from(get_replica_alias())` in a command."""
+    token = _read_alias.set(alias)
+    try:
+        yield
+    finally:
+        _read_alias.reset(token)
+
+
+def get_pin_seconds():
+    """Longest read-your-writes window of `REPLICA_VIEWS`, i.e. how long the last POST is remembered."""
+    return max(getattr(settings, "REPLICA_VIEWS", {}).values(), default=0)
+
+
+def should_read_replica(request, view):
+    """
+    Whether `view` can read from the replica for this request.
+
+    Only GET requests of `REPLICA_VIEWS` do, unless the user posted less than the view's seconds ago.
+    """
+    views = getattr(settings, "REPLICA_VIEWS", {})
+    if request.method not in SAFE_METHODS or view not in views:
+        return False
+    try:
+        last_write = float(request.COOKIES[getattr(settings, "REPLICA_PIN_COOKIE", "replica_pin")])
+    except (KeyError, ValueError):
+        return True
+    return time.time() - last_write >= views[view]
+
+
+def pin_to_primary(response):
+    """Remembers a POST in the response's cookie, so the next reads of the user see its writes."""
+    seconds = get_pin_seconds()
+    if seconds > 0:
+        response.set_cookie(
+            getattr(settings, "REPLICA_PIN_COOKIE", "replica_pin"), "%.3f" % time.time(),
+            max_age=seconds, httponly=True, samesite="Lax",
+        )
+
+
+class ReplicaRouter:
+    """Database router sending the reads of requests marked by `ReplicaMiddleware` to the replica."""
+
+    def db_for_read(self, model, **hints):
+        alias = get_read_alias()
+        if alias is not None and alias in connections.settings:
+            return alias
+        return None
+
+    def db_for_write(self, model, **hints):
+        # Also for instances read from the replica, which Django would save where they came from:
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # The replica holds the same rows as the primary:
+        databases = {DEFAULT_DB_ALIAS, get_replica_alias()}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, **hints):
+        # Migrations reach the replica from the primary:
+        if db == get_replica_alias():
+            return False
+        return None
+
+
+def copy_database(source_path, target_path):
+    """Copies the SQLite database at `source_path` into `target_path`, while both are in use; readers of the target see the old or the new copy."""
+    source = sqlite3.connect(source_path)
+    target = sqlite3.connect(target_path)
+    try:
+        # In one step, so writes to the source don't restart the copy:
+        source.backup(target)
+    finally:
+        target.close()
+        source.close()
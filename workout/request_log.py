@@ -0,0 +1,92 @@
+"""
+request_log.py
+
+Structured request log: one JSON object per line for a sample of the requests, written by the
+`workout.requests` logger (see `settings.LOGGING`) instead of printing to stdout.
+
+`middleware.RequestLogMiddleware` opens a record per request; code serving it (views, managers)
+adds to it with `add()`, e.g. the validation errors a form failed with. When the response is ready
+the record is kept with the sampling rate of its view (`REQUEST_LOG_SAMPLE_RATES`, else
+`REQUEST_LOG_DEFAULT_RATE`), or always if the response is an error. Only data already in memory
+is logged, so logging never runs a query.
+"""
+
+import json
+import logging
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+
+logger = logging.getLogger("workout.requests")
+
+_record = ContextVar("request_log_record", default=None)
+
+
+def add(key, *values):
+    """
+    Appends values to the list `key` of the current request's record, if there is one.
+
+    Args:
+        key: Field of the record, e.g. `validation_errors`.
+        values: JSON-serializable values.
+    """
+    record = _record.get()
+    if record is not None:
+        record.setdefault(key, []).extend(values)
+
+
+def get_sample_rate(view):
+    rates = getattr(settings, "REQUEST_LOG_SAMPLE_RATES", {})
+    return rates.get(view, getattr(settings, "REQUEST_LOG_DEFAULT_RATE", 1.0))
+
+
+def should_log(view, status):
+    if status >= getattr(settings, "REQUEST_LOG_ALWAYS_STATUS", 500):
+        return True
+    rate = get_sample_rate(view)
+    return rate >= 1 or random.random() < rate
+
+
+@contextmanager
+def recording():
+    """Makes `add()` write to the returned record until the block ends."""
+    record = {}
+    token = _record.set(record)
+    try:
+        yield record
+    finally:
+        _record.reset(token)
+
+
+def log_request(request, response, record, duration):
+    """
+    Writes the request's line, if its view is sampled or it failed.
+
+    Args:
+        request: Django HttpRequest object.
+        response: Django HttpResponse object.
+        record: Fields added while serving it, see `recording()`.
+        duration: Seconds taken to produce the response.
+    """
+    match = getattr(request, "resolver_match", None)
+    view = match.view_name if match else "unmatched"
+    if not should_log(view, response.status_code):
+        return
+    # `current_user` was resolved by `SessionUserMiddleware`, reading it costs no query:
+    user = getattr(request, "current_user", None)
+    logger.info(json.dumps(dict(
+        {
+            "time": round(time.time(), 3),
+            "method": request.method,
+            "path": request.path,
+            "view": view,
+            "status": response.status_code,
+            "ms": round(duration * 1000, 2),
+            "user": user.id if user else None,
+            "rate": get_sample_rate(view),
+        },
+        **record,
+    ), default=str))
@@ -0,0 +1,174 @@
+"""
+slow_queries.py
+
+Slow-query log: queries taking longer than `SLOW_QUERY_THRESHOLD` seconds are recorded with their
+SQL, parameters, the view and code that ran them, and their query plan captured right away. Only
+the parameters of reads are kept: writes may carry secrets, e.g. the password hashes of `User`. The
+newest `SLOW_QUERY_LOG_SIZE` entries are kept in memory, per process, and listed in the admin
+under "Slow queries" (see `admin.SlowQueryAdmin`).
+
+Queries are timed by `middleware.SlowQueryMiddleware` during requests, or by `record_slow_queries()`.
+"""
+
+import itertools
+import os
+import threading
+import time
+import traceback
+from collections import deque
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.db import DatabaseError, connections
+from django.utils import timezone
+
+import workout_logger
+
+# Longest parameter list or plan kept per entry:
+MAX_TEXT_LENGTH = 4000
+
+SAVEPOINT_NAME = "slow_query_explain"
+
+REDACTED_PARAMS = "(not recorded for writes)"
+
+# Frames of the query instrumentation (`execute_wrapper`s of the middlewares and this module), not the code running the query:
+INSTRUMENTATION_PATHS = (os.path.dirname(workout_logger.__file__) + os.sep, __file__)
+
+
+class SlowQueryLog:
+    """Thread-safe ring buffer of the newest slow queries."""
+
+    def __init__(self, size):
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self.entries = deque(maxlen=size)
+
+    def add(self, entry):
+        with self._lock:
+            entry["id"] = next(self._ids)
+            self.entries.append(entry)
+
+    def get_entries(self):
+        """Returns the entries, slowest first."""
+        with self._lock:
+            entries = list(self.entries)
+        return sorted(entries, key=lambda entry: -entry["duration_ms"])
+
+    def clear(self):
+        with self._lock:
+            self.entries.clear()
+
+
+log = SlowQueryLog(getattr(settings, "SLOW_QUERY_LOG_SIZE", 200))
+
+
+def get_source():
+    """Returns the innermost project frame of the stack, i.e. the line that ran the query."""
+    base_dir = str(settings.BASE_DIR)
+    for frame in reversed(traceback.extract_stack()):
+        if frame.filename.startswith(base_dir) and "site-packages" not in frame.filename and not frame.filename.startswith(INSTRUMENTATION_PATHS):
+            return "%s:%d in %s\n%s" % (os.path.relpath(frame.filename, base_dir), frame.lineno, frame.name, frame.line)
+    return ""
+
+
+def get_threshold():
+    return getattr(settings, "SLOW_QUERY_THRESHOLD", 0.1)
+
+
+def is_read(sql):
+    return sql.lstrip().upper().startswith(("SELECT", "WITH"))
+
+
+def format_params(sql, params, many=False):
+    if many:
+        return "executemany"
+    if not is_read(sql):
+        return REDACTED_PARAMS
+    return repr(params)[:MAX_TEXT_LENGTH]
+
+
+def explain(connection, sql, params, many=False):
+    """
+    Returns the query plan of a `SELECT`, an empty string for other statements, or why it couldn't be explained.
+
+    Runs on a cursor of its own, bypassing `execute_wrapper`s, so the plan isn't timed or explained again.
+    Inside a transaction it runs under a savepoint, as a failed statement aborts a PostgreSQL transaction.
+    """
+    if many or not is_read(sql):
+        return ""
+    # The driver's cursor raises the driver's errors, not Django's:
+    errors = (DatabaseError, connection.Database.Error)
+    savepoint = connection.in_atomic_block and connection.features.uses_savepoints
+    try:
+        cursor = connection.create_cursor()
+        try:
+            if savepoint:
+                cursor.execute("SAVEPOINT %s" % SAVEPOINT_NAME)
+            try:
+                cursor.execute("%s %s" % (connection.ops.explain_query_prefix(), sql), params)
+                rows = cursor.fetchall()
+            except errors:
+                if savepoint:
+                    cursor.execute("ROLLBACK TO SAVEPOINT %s" % SAVEPOINT_NAME)
+                raise
+            finally:
+                if savepoint:
+                    cursor.execute("RELEASE SAVEPOINT %s" % SAVEPOINT_NAME)
+        finally:
+            cursor.close()
+    except errors as error:
+        return "Not explained: %s" % error
+    # SQLite's rows are `(id, parent, notused, detail)`, other databases return one column:
+    return "\n".join(str(row[-1]) for row in rows)[:MAX_TEXT_LENGTH]
+
+
+class SlowQueryRecorder:
+    """`execute_wrapper` timing queries and recording the slow ones in `log`."""
+
+    def __init__(self, request=None):
+        self.request = request
+        self.threshold = get_threshold()
+
+    def __call__(self, execute, sql, params, many, context):
+        started_at = time.perf_counter()
+        try:
+            result = execute(sql, params, many, context)
+        except Exception:
+            # Recorded without a plan: explaining a failed query would fail too, or hide its error:
+            self.record_if_slow(sql, params, many, context["connection"], started_at, failed=True)
+            raise
+        self.record_if_slow(sql, params, many, context["connection"], started_at)
+        return result
+
+    def record_if_slow(self, sql, params, many, connection, started_at, failed=False):
+        duration = time.perf_counter() - started_at
+        if duration >= self.threshold:
+            self.record(sql, params, many, connection, duration, failed)
+
+    def get_view(self):
+        match = getattr(self.request, "resolver_match", None)
+        if match:
+            return match.view_name
+        return self.request.path if self.request is not None else ""
+
+    def record(self, sql, params, many, connection, duration, failed=False):
+        log.add({
+            "recorded_at": timezone.now(),
+            "duration_ms": round(duration * 1000, 2),
+            "alias": connection.alias,
+            "view": self.get_view(),
+            "sql": sql,
+            "params": format_params(sql, params, many),
+            "plan": "Not explained: the query failed" if failed else explain(connection, sql, params, many),
+            "source": get_source(),
+        })
+
+
+@contextmanager
+def record_slow_queries(request=None):
+    """Records the slow queries run inside the block, on every database alias."""
+    recorder = SlowQueryRecorder(request)
+    with ExitStack() as stack:
+        for alias in connections:
+            stack.enter_context(connections[alias].execute_wrapper(recorder))
+        yield recorder
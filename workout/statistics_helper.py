@@ -0,0 +1,76 @@
+"""
+statistics_helper.py
+
+Builds the chart data of the statistics page from the `ExerciseDailyStat` rollup.
+"""
+
+from datetime import timedelta
+
+from django.db.models import Q, Sum
+from django.utils import timezone
+
+from .models import ExerciseDailyStat, MuscleGroup
+from .views_helper import get_exercises_types
+
+WORKOUT_LABELS = ['Strength', 'Endurance', 'Balance', 'Flexibility']
+
+
+def get_chart_data(user_id, now=None):
+    """
+    Counts the user's exercises per type and per muscle group, for all time, the last week and the last month.
+
+    Reads one grouped query over the user's daily rollup rows (O(days), not O(exercises)) plus one
+    query for the muscle group labels. The week/month windows have day granularity: they start at the
+    beginning of the day 7/30 days before `now`.
+
+    Args:
+        user_id: Id of the user whose exercises are counted.
+        now: Reference time for the week/month windows, defaults to `timezone.now()`.
+
+    Returns:
+        Dictionary in the format expected by `workout/statistics.html`.
+    """
+    now = now or timezone.now()
+    first_day_week = timezone.localdate(now - timedelta(weeks=1))
+    first_day_month = timezone.localdate(now - timedelta(days=30))
+
+    rows = (
+        ExerciseDailyStat.objects.filter(user__id=user_id)
+        .values('exercise_type', 'muscle_group_id')
+        .annotate(
+            total=Sum('count'),
+            week=Sum('count', filter=Q(day__gte=first_day_week)),
+            month=Sum('count', filter=Q(day__gte=first_day_month)),
+        )
+        .order_by()
+    )
+
+    type_index = {exercise_type.__name__: i for i, exercise_type in enumerate(get_exercises_types())}
+    # [all time, week, month] per exercise type and per muscle group id:
+    type_totals = [[0, 0, 0] for _ in type_index]
+    muscle_group_totals = {}
+
+    for row in rows:
+        counts = [row['total'] or 0, row['week'] or 0, row['month'] or 0]
+        muscle_group_counts = muscle_group_totals.setdefault(row['muscle_group_id'], [0, 0, 0])
+        for i, count in enumerate(counts):
+            type_totals[type_index[row['exercise_type']]][i] += count
+            muscle_group_counts[i] += count
+
+    # Muscle groups are keyed by name, so groups sharing a name are charted together:
+    muscle_counts = {}
+    for mg in MuscleGroup.objects.order_by('id').values('id', 'name'):
+        counts = muscle_counts.setdefault(mg['name'], [0, 0, 0])
+        for i, count in enumerate(muscle_group_totals.get(mg['id'], [0, 0, 0])):
+            counts[i] += count
+
+    return {
+        'workout_labels': WORKOUT_LABELS,
+        'workout_data': [counts[0] for counts in type_totals],
+        'workout_data_week': [counts[1] for counts in type_totals],
+        'workout_data_month': [counts[2] for counts in type_totals],
+        'muscle_labels': list(muscle_counts.keys()),
+        'muscle_data': [counts[0] for counts in muscle_counts.values()],
+        'muscle_data_week': [counts[1] for counts in muscle_counts.values()],
+        'muscle_data_month': [counts[2] for counts in muscle_counts.values()],
+    }
@@ -1,3 +1,1123 @@
-from django.test import TestCase
+from datetime import timedelta
 
-# Create your tests here.
+import importlib
+import json
+import logging
+import os
+import re
+import shutil
+import sqlite3
+import tempfile
+import time
+from io import StringIO
+
+from django.apps import apps as django_apps
+from django.contrib.auth.models import Permission, User as AdminUser
+from django.core.management import call_command
+from django.db import IntegrityError, OperationalError, connection, transaction
+from django.db.models import Max
+from django.db.backends.sqlite3.base import DatabaseWrapper as SQLiteDatabaseWrapper
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.urls import resolve
+from django.utils import timezone
+
+import bcrypt
+
+from .benchmarks import check_results, check_timings
+from .database import DEFAULT_PRAGMAS, apply_pragmas, call_with_retry, get_pragmas
+from .slow_queries import REDACTED_PARAMS, explain, log as slow_query_log, record_slow_queries
+from .load_replay import InProcessClient, add_unlogged_routes, get_mix_from_logs, get_user_arguments, percentile, replay, summarize
+from .log_analysis import LogAnalyzer, read_entries
+from .models import *
+from . import page_cache, replicas, request_log
+from .passwords import PasswordHasherPool, PasswordHashingBusy, get_hash_rounds
+from .throttling import get_store, take_token
+from .statistics_helper import get_chart_data
+from .views_helper import load_workout
+from workout_logger.db.health import HealthCheckMixin
+from workout_logger.db.pool import ConnectionPool, PoolTimeout
+from workout_logger.logs import DailyFileHandler, QueuedFileHandler
+from workout_logger import metrics, profiling
+from workout_logger.middleware import ReplicaMiddleware
+from workout_logger.nplusone import NPlusOneError, detect_n_plus_one, fingerprint
+
+
+def get_queued_file_handlers():
+    loggers = [logging.getLogger()] + [logging.getLogger(name) for name in logging.root.manager.loggerDict]
+    return {handler for logger in loggers for handler in logger.handlers if isinstance(handler, QueuedFileHandler)}
+
+
+class TemporaryLogDirMixin:
+    """Logs the requests of the tests into a temporary directory instead of `LOG_DIR`."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        log_dir = tempfile.mkdtemp()
+        cls.addClassCleanup(shutil.rmtree, log_dir, ignore_errors=True)
+        for handler in get_queued_file_handlers():
+            cls.addClassCleanup(handler.file_handler.set_directory, handler.file_handler.directory)
+            handler.file_handler.set_directory(log_dir)
+
+
+# The manifest storage needs `collectstatic`, which is a deployment step; cached session users
+# would leak between tests. Any N+1 query in a view fails the test:
+@override_settings(
+    STATICFILES_STORAGE='django.contrib.staticfiles.storage.StaticFilesStorage',
+    SESSION_USER_CACHE_TTL=0,
+    N_PLUS_ONE_DETECTION=True,
+    N_PLUS_ONE_STRICT=True,
+)
+class WorkoutTestCase(TemporaryLogDirMixin, TestCase):
+    """Shared fixtures: a logged in user with one workout and a muscle group."""
+
+    def setUp(self):
+        # Ids are reused after the rollback of a test, so a user's cached pages would outlive it:
+        self.addCleanup(page_cache.get_cache().clear)
+        self.user = User.objects.create(username="tester", email="tester@example.com", password="unused")
+        self.addCleanup(User.objects.invalidate_session_user, self.user.id)
+        self.muscle_group = MuscleGroup.objects.create(name="Legs", description="Legs")
+        self.workout = Workout.objects.create(name="Leg day", description="Squats", user=self.user)
+        self.login(self.user)
+
+    def login(self, user):
+        session = self.client.session
+        session["user_id"] = user.id
+        session.save()
+
+    def add_strength(self, name="Squat", workout=None, muscle_group=None, user=None):
+        return StrengthTrainingExercise.objects.save_exercise(StrengthTrainingExercise(
+            name=name, description=name,
+            workout=workout or self.workout,
+            muscle_group=muscle_group or self.muscle_group,
+            user=user or self.user,
+            weight=100, repetitions=5,
+        ))
+
+    def add_flexibility(self, name="Stretch", workout=None, muscle_group=None, user=None):
+        return FlexibilityExercise.objects.save_exercise(FlexibilityExercise(
+            name=name, description=name,
+            workout=workout or self.workout,
+            muscle_group=muscle_group or self.muscle_group,
+            user=user or self.user,
+            stretch_type="static",
+        ))
+
+
+class ViewAllTests(WorkoutTestCase):
+
+    def test_history_is_merged_and_sorted_by_database(self):
+        squat = self.add_strength()
+        stretch = self.add_flexibility()
+        other_user = User.objects.create(username="other", email="other@example.com", password="unused")
+        Workout.objects.create(name="Not mine", description="Not mine", user=other_user)
+
+        response = self.client.get("/history")
+
+        page = response.context["data"]
+        self.assertEqual(page.paginator.count, 3)
+        self.assertEqual(
+            [(item.class_name(), item.id) for item in page],
+            [("FlexibilityExercise", stretch.id), ("StrengthTrainingExercise", squat.id), ("Workout", self.workout.id)],
+        )
+
+    def test_history_only_hydrates_the_requested_page(self):
+        for i in range(30):
+            self.add_strength(name="Squat %d" % i)
+
+        # session + user + count + page rows + one lookup per model on the page:
+        with self.assertNumQueries(6):
+            response = self.client.get("/history?page=3")
+
+        page = response.context["data"]
+        self.assertEqual(len(page), 7)
+        self.assertEqual(page[-1].id, self.workout.id)
+
+
+class StatisticsTests(WorkoutTestCase):
+
+    def test_chart_data_counts_per_type_muscle_group_and_window(self):
+        arms = MuscleGroup.objects.create(name="Arms", description="Arms")
+        self.add_strength()
+        old = self.add_strength(muscle_group=arms)
+        StrengthTrainingExercise.objects.filter(id=old.id).update(updated_at=timezone.now() - timedelta(days=10))
+        ExerciseDailyStat.objects.rebuild(user_id=self.user.id)
+        self.add_flexibility(muscle_group=arms)
+
+        chart_data = get_chart_data(self.user.id)
+
+        self.assertEqual(chart_data['workout_data'], [2, 0, 0, 1])
+        self.assertEqual(chart_data['workout_data_week'], [1, 0, 0, 1])
+        self.assertEqual(chart_data['workout_data_month'], [2, 0, 0, 1])
+        self.assertEqual(chart_data['muscle_labels'], ["Legs", "Arms"])
+        self.assertEqual(chart_data['muscle_data'], [1, 2])
+        self.assertEqual(chart_data['muscle_data_week'], [1, 1])
+
+    def test_chart_data_query_count_does_not_grow_with_muscle_groups(self):
+        for i in range(20):
+            muscle_group = MuscleGroup.objects.create(name="Group %d" % i, description="Group")
+            self.add_strength(muscle_group=muscle_group)
+            self.add_flexibility(muscle_group=muscle_group)
+
+        # One grouped query over the rollup plus the muscle group labels:
+        with self.assertNumQueries(2):
+            get_chart_data(self.user.id)
+
+
+    def test_statistics_rows_are_sorted_and_paginated_by_the_database(self):
+        arms = MuscleGroup.objects.create(name="Arms", description="Arms")
+        for i in range(20):
+            self.add_strength(name="Squat %02d" % i)
+        curl = self.add_strength(name="Curl", muscle_group=arms)
+        stretch = self.add_flexibility(name="Stretch", muscle_group=arms)
+
+        # session + user + count + page rows + one query per exercise type on the page + chart data:
+        with self.assertNumQueries(8):
+            response = self.client.get("/statistics?sort=muscle_group&direction=asc")
+
+        page = response.context["data"]
+        self.assertEqual(page.paginator.count, 22)
+        self.assertEqual(list(page)[:2], [curl, stretch])
+        self.assertEqual(page[0].workout_name, "Leg day")
+
+    def test_statistics_rows_sort_by_type_specific_fields(self):
+        light = self.add_strength(name="Light")
+        StrengthTrainingExercise.objects.filter(id=light.id).update(weight=10)
+        heavy = self.add_strength(name="Heavy")
+        stretch = self.add_flexibility()
+
+        response = self.client.get("/statistics?sort=weight&direction=desc")
+
+        self.assertEqual(list(response.context["data"]), [heavy, light, stretch])
+
+
+class ExerciseDailyStatTests(WorkoutTestCase):
+
+    def stats(self):
+        return list(ExerciseDailyStat.objects.order_by("exercise_type").values_list("exercise_type", "muscle_group_id", "count", "weight_volume"))
+
+    def test_rollup_follows_create_update_and_delete(self):
+        arms = MuscleGroup.objects.create(name="Arms", description="Arms")
+        squat = self.add_strength()
+        self.add_strength()
+        self.assertEqual(self.stats(), [("StrengthTrainingExercise", self.muscle_group.id, 2, 1000)])
+
+        StrengthTrainingExercise.objects.update_exercise(
+            exercise_id=squat.id, name="Curl", description="Curl", workout=self.workout,
+            muscle_group=arms, user=self.user, weight="20", repetitions="10",
+        )
+        self.assertEqual(self.stats(), [
+            ("StrengthTrainingExercise", self.muscle_group.id, 1, 500),
+            ("StrengthTrainingExercise", arms.id, 1, 200),
+        ])
+
+        StrengthTrainingExercise.objects.delete_exercise(StrengthTrainingExercise.objects.get(id=squat.id))
+        self.assertEqual(self.stats(), [("StrengthTrainingExercise", self.muscle_group.id, 1, 500)])
+
+    def test_deleting_a_workout_empties_its_rollup(self):
+        self.add_strength()
+        self.add_flexibility()
+
+        self.client.get("/workout/%d/delete" % self.workout.id)
+
+        self.assertEqual(self.stats(), [])
+
+    def test_rebuild_matches_incremental_rollup(self):
+        self.add_strength()
+        self.add_flexibility()
+        incremental = self.stats()
+
+        ExerciseDailyStat.objects.rebuild()
+
+        self.assertEqual(self.stats(), incremental)
+
+    def test_migration_backfills_rollup(self):
+        self.add_strength()
+        self.add_flexibility()
+        incremental = self.stats()
+        ExerciseDailyStat.objects.all().delete()
+
+        migration = importlib.import_module("workout.migrations.0012_exercisedailystat")
+        migration.backfill_exercise_daily_stats(django_apps, None)
+
+        self.assertEqual(self.stats(), incremental)
+
+
+class ExerciseIndexTests(WorkoutTestCase):
+
+    def test_index_follows_create_update_and_delete(self):
+        squat = self.add_strength()
+        stretch = self.add_flexibility()
+        self.assertEqual(
+            set(ExerciseIndex.objects.values_list("exercise_type", "exercise_id", "name")),
+            {("StrengthTrainingExercise", squat.id, "Squat"), ("FlexibilityExercise", stretch.id, "Stretch")},
+        )
+
+        FlexibilityExercise.objects.update_exercise(
+            exercise_id=stretch.id, name="Split", description="Split", workout=self.workout,
+            muscle_group=self.muscle_group, user=self.user, stretch_type="dynamic",
+        )
+        self.assertEqual(ExerciseIndex.objects.get(exercise_type="FlexibilityExercise").name, "Split")
+
+        StrengthTrainingExercise.objects.delete_exercise(squat)
+        self.assertEqual(list(ExerciseIndex.objects.values_list("exercise_type", flat=True)), ["FlexibilityExercise"])
+
+    def test_rebuild_recreates_the_index(self):
+        self.add_strength()
+        self.add_flexibility()
+        ExerciseIndex.objects.all().delete()
+
+        self.assertEqual(ExerciseIndex.objects.rebuild(), 2)
+
+    def test_workout_page_loads_exercises_newest_first(self):
+        squat = self.add_strength()
+        stretch = self.add_flexibility()
+
+        response = self.client.get("/workout/%d" % self.workout.id)
+
+        self.assertEqual([exercise.id for exercise in response.context["exercises"]], [stretch.id, squat.id])
+
+
+class LoadWorkoutTests(WorkoutTestCase):
+
+    def test_loads_exercises_in_bounded_queries_and_memoizes_per_request(self):
+        arms = MuscleGroup.objects.create(name="Arms", description="Arms")
+        squat = self.add_strength(name="Squat")
+        stretch = self.add_flexibility()
+        curl = self.add_strength(name="Curl", muscle_group=arms)
+        request = RequestFactory().get("/")
+
+        # The workout plus one prefetch per exercise type:
+        with self.assertNumQueries(5):
+            workout = load_workout(request, str(self.workout.id))
+            self.assertEqual([exercise.muscle_group.name for exercise in workout.exercises_by_type], ["Arms", "Legs", "Legs"])
+
+        with self.assertNumQueries(0):
+            self.assertIs(load_workout(request, self.workout.id), workout)
+
+        self.assertEqual(workout.exercises_by_type, [curl, squat, stretch])
+        self.assertEqual(workout.exercises, [curl, stretch, squat])
+
+
+class SessionUserTests(WorkoutTestCase):
+
+    def test_logged_out_users_are_redirected_to_login(self):
+        self.client.session.flush()
+        del self.client.cookies["sessionid"]
+
+        response = self.client.get("/statistics")
+
+        self.assertRedirects(response, "/", fetch_redirect_response=False)
+
+    def test_missing_session_user_is_treated_as_logged_out(self):
+        self.user.delete()
+
+        response = self.client.get("/dashboard")
+
+        self.assertRedirects(response, "/", fetch_redirect_response=False)
+
+    @override_settings(SESSION_USER_CACHE_TTL=60)
+    def test_session_user_is_cached_until_updated(self):
+        with self.assertNumQueries(1):
+            User.objects.get_session_user(self.user.id)
+        with self.assertNumQueries(0):
+            cached = User.objects.get_session_user(self.user.id)
+        self.assertEqual(cached.username, "tester")
+
+        User.objects.update(
+            user_id=self.user.id, old_username="tester", old_email="tester@example.com",
+            username="renamed", email="tester@example.com", profile_photo_url="", background_photo_url="",
+        )
+
+        self.assertEqual(User.objects.get_session_user(self.user.id).username, "renamed")
+
+    @override_settings(SESSION_USER_CACHE_TTL=60)
+    def test_session_user_is_invalidated_by_other_workers(self):
+        User.objects.get_session_user(self.user.id)
+        # Another worker sharing the cache changed the user; this one's entry is still there:
+        User.objects.filter(id=self.user.id).update(username="renamed")
+        get_session_user_cache().set(SESSION_USER_VERSION_KEY % self.user.id, "changed elsewhere", timeout=None)
+
+        self.assertEqual(User.objects.get_session_user(self.user.id).username, "renamed")
+
+
+@override_settings(BCRYPT_ROUNDS=4)
+class PasswordTests(WorkoutTestCase):
+
+    def test_login_rehashes_outdated_cost_factor(self):
+        self.user.password = bcrypt.hashpw(b"password123", bcrypt.gensalt(5)).decode()
+        self.user.save()
+
+        response = self.client.post("/", {"username": "tester", "password": "password123"})
+
+        self.assertRedirects(response, "/dashboard", fetch_redirect_response=False)
+        self.user.refresh_from_db()
+        self.assertEqual(get_hash_rounds(self.user.password), 4)
+        self.assertTrue(bcrypt.checkpw(b"password123", self.user.password.encode()))
+
+    def test_register_hashes_with_configured_cost_factor(self):
+        self.client.post("/user/register", {
+            "username": "newbie", "email": "newbie@example.com",
+            "password": "password123", "password_confirmation": "password123",
+        })
+
+        self.assertEqual(get_hash_rounds(User.objects.get(username="newbie").password), 4)
+
+    def test_pool_rejects_calls_over_its_cap(self):
+        pool = PasswordHasherPool(workers=1, max_pending=1)
+        self.assertEqual(pool.run(len, "abc"), 3)
+
+        pool._slots.acquire()
+        with self.assertRaises(PasswordHashingBusy):
+            pool.run(len, "abc")
+
+        metrics = pool.metrics()
+        self.assertEqual((metrics["completed"], metrics["rejected"], metrics["peak_pending"]), (1, 1, 1))
+
+
+@override_settings(BCRYPT_ROUNDS=4, LOGIN_THROTTLE_RATES={"username": (2, 60), "address": (3, 60)})
+class LoginThrottleTests(WorkoutTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.client.logout()
+        get_store().reset()
+        self.addCleanup(get_store().reset)
+
+    def attempt(self, username, address="10.0.0.1"):
+        response = self.client.post("/", {"username": username, "password": "wrong password"}, REMOTE_ADDR=address, follow=True)
+        return [message.message for message in response.context["messages"]]
+
+    def test_attempts_over_the_username_limit_are_rejected_before_hashing(self):
+        self.attempt("tester", "10.0.0.1")
+        self.attempt("Tester", "10.0.0.2")
+
+        with self.assertNumQueries(0):
+            errors = self.attempt("tester", "10.0.0.3")
+
+        self.assertEqual(errors, ["Too many login attempts. Please wait a minute and try again."])
+
+    def test_attempts_over_the_address_limit_are_rejected(self):
+        for username in ["a", "b", "c"]:
+            self.assertEqual(self.attempt(username), ["Username or password is incorrect."])
+
+        self.assertEqual(self.attempt("d"), ["Too many login attempts. Please wait a minute and try again."])
+        self.assertEqual(self.attempt("e", "10.0.0.2"), ["Username or password is incorrect."])
+
+    def test_buckets_refill_over_time(self):
+        allowed, state = take_token(None, 2, 60, now=0)
+        allowed, state = take_token(state, 2, 60, now=0)
+        self.assertEqual(take_token(state, 2, 60, now=10)[0], False)
+        self.assertEqual(take_token(state, 2, 60, now=30)[0], True)
+
+
+class UniqueUserTests(WorkoutTestCase):
+
+    def register(self, username, email):
+        return User.objects.register(
+            username=[username], email=[email], password=["password123"], password_confirmation=["password123"],
+        )
+
+    @override_settings(BCRYPT_ROUNDS=4)
+    def test_username_and_email_are_unique_ignoring_case(self):
+        self.assertEqual(self.register("TESTER", "new@example.com")["errors"], ["Username is already registered to another user."])
+        self.assertEqual(self.register("newbie", "Tester@Example.com")["errors"], ["Email address is already registered to another user."])
+
+    def test_unique_indexes_back_the_validation(self):
+        with self.assertRaises(IntegrityError):
+            with transaction.atomic():
+                User.objects.create(username="Tester", email="other@example.com", password="unused")
+
+        other = User.objects.create(username="other", email="other@example.com", password="unused")
+        validated = User.objects.update(
+            user_id=other.id, old_username="other", old_email="other@example.com",
+            username="other", email="TESTER@example.com", profile_photo_url="", background_photo_url="",
+        )
+        self.assertEqual(validated["errors"], ["Email address is already registered to another user."])
+
+    @override_settings(BCRYPT_ROUNDS=4)
+    def test_login_looks_up_username_ignoring_case(self):
+        self.user.password = bcrypt.hashpw(b"password123", bcrypt.gensalt(4)).decode()
+        self.user.save()
+
+        validated = User.objects.login(username=["TeStEr"], password=["password123"])
+
+        self.assertEqual(validated["logged_in_user"], self.user)
+
+
+@override_settings(BCRYPT_ROUNDS=4)
+class SeedLoadTests(WorkoutTestCase):
+
+    def seed(self, **options):
+        call_command("seed_load", users=5, workouts=4, exercises=3, challenges=2, participants=3, stdout=StringIO(), **options)
+
+    def test_seeds_consistent_rows(self):
+        self.seed()
+
+        exercises = sum(exercise_type.objects.count() for exercise_type in Exercise.__subclasses__())
+        self.assertEqual(User.objects.count(), 6)
+        self.assertEqual(Workout.objects.count(), 21)
+        self.assertEqual(exercises, 60)
+        self.assertEqual(ExerciseIndex.objects.count(), 60)
+        self.assertEqual(UserChallenge.objects.count(), 6)
+        self.assertTrue(all(len(status) == 3 for status in UserChallenge.objects.values_list("exercise_status", flat=True)))
+
+        seeded = set(ExerciseDailyStat.objects.values_list("user_id", "day", "exercise_type", "muscle_group_id", "count", "weight_volume", "duration_minutes", "distance_km"))
+        ExerciseDailyStat.objects.rebuild()
+        rebuilt = set(ExerciseDailyStat.objects.values_list("user_id", "day", "exercise_type", "muscle_group_id", "count", "weight_volume", "duration_minutes", "distance_km"))
+        self.assertEqual(seeded, rebuilt)
+
+        # Seeded ids are written explicitly; new rows of the ORM come after them:
+        workout = Workout.objects.create(name="After seeding", description="New", user=self.user)
+        self.assertEqual(workout.id, Workout.objects.aggregate(max_id=Max("id"))["max_id"])
+
+    def test_same_seed_gives_same_data(self):
+        self.seed(seed=7)
+        first = list(ExerciseIndex.objects.order_by("id").values_list("exercise_type", "name"))
+        self.seed(seed=7)
+        second = list(ExerciseIndex.objects.order_by("id").values_list("exercise_type", "name"))[len(first):]
+
+        self.assertEqual(first, second)
+
+
+class BenchmarkCheckTests(TestCase):
+
+    def test_flags_budget_and_baseline_regressions(self):
+        baseline = {"small": {"dashboard": {"ms": 10, "queries": 3, "peak_kb": 100, "status": 200}}}
+        results = {"small": {
+            "dashboard": {"ms": 30, "queries": 4, "peak_kb": 110, "status": 200},
+            "challenges": {"ms": 900, "queries": 6, "peak_kb": 100, "status": 500},
+        }}
+
+        self.assertEqual(check_results(results, baseline), [
+            "small/dashboard: 4 queries, baseline is 3",
+            "small/challenges: status 500",
+            "small/challenges: 6 queries, budget is 4",
+            "small/challenges: 900.0 ms, budget is 500 ms",
+        ])
+        # Time isn't compared with the baseline there, it's only reported:
+        self.assertEqual(check_timings(results, baseline), ["small/dashboard: 30.0 ms, baseline is 10.0 ms"])
+
+    def test_small_changes_are_within_tolerance(self):
+        baseline = {"small": {"dashboard": {"ms": 2, "queries": 4, "peak_kb": 10, "status": 200}}}
+        results = {"small": {"dashboard": {"ms": 5, "queries": 4, "peak_kb": 50, "status": 200}}}
+
+        self.assertEqual(check_results(results, baseline), [])
+        self.assertEqual(check_timings(results, baseline), [])
+
+
+class MetricsTests(WorkoutTestCase):
+
+    def test_requests_are_exported_in_prometheus_format(self):
+        self.client.get("/dashboard")
+
+        body = self.client.get("/metrics").content.decode()
+
+        self.assertIn('workout_http_requests_total{view="workout.views.dashboard",method="GET",status="200"}', body)
+        self.assertIn('workout_http_request_duration_seconds_bucket{view="workout.views.dashboard",le="+Inf"}', body)
+        self.assertIn('workout_db_queries_per_request_count{view="workout.views.dashboard"}', body)
+        self.assertIn("# TYPE workout_http_response_size_bytes histogram", body)
+        self.assertIn('workout_password_hashing{pid="%d",stat="pending"} 0' % os.getpid(), body)
+
+    def test_only_allowed_addresses_read_metrics(self):
+        self.assertEqual(self.client.get("/metrics", REMOTE_ADDR="203.0.113.5").status_code, 403)
+        with override_settings(METRICS_ALLOWED_ADDRESSES=["*"]):
+            self.assertEqual(self.client.get("/metrics", REMOTE_ADDR="203.0.113.5").status_code, 200)
+
+    def test_metrics_of_all_processes_are_added_up(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        labels = [["view", "workout.views.dashboard"], ["method", "GET"], ["status", 200]]
+        with open(os.path.join(directory, "metrics_1.json"), "w") as file:
+            json.dump({"counters": [["workout_http_requests_total", labels, 1000]], "histograms": []}, file)
+
+        with override_settings(METRICS_DIR=directory):
+            self.client.get("/dashboard")
+            body = self.client.get("/metrics").content.decode()
+
+        line = [line for line in body.splitlines() if line.startswith('workout_http_requests_total{view="workout.views.dashboard",method="GET",status="200"}')][0]
+        self.assertGreater(int(line.split()[-1]), 1000)
+        self.assertTrue(os.path.exists(os.path.join(directory, "metrics_%d.json" % os.getpid())))
+
+
+class NPlusOneTests(WorkoutTestCase):
+
+    def test_fingerprint_masks_values(self):
+        self.assertEqual(
+            fingerprint('SELECT "id" FROM "t" WHERE "id" IN (%s, %s, %s) AND "name" = \'x\' LIMIT 21'),
+            'SELECT "id" FROM "t" WHERE "id" IN (...) AND "name" = ? LIMIT ?',
+        )
+
+    @override_settings(N_PLUS_ONE_THRESHOLD=3)
+    def test_repeated_query_shapes_raise_in_strict_mode(self):
+        workouts = [Workout.objects.create(name="W%d" % i, description="W", user=self.user) for i in range(4)]
+
+        with self.assertRaisesRegex(NPlusOneError, "5 queries shaped like"):
+            with self.assertLogs("workout_logger.nplusone", "WARNING") as logs:
+                with detect_n_plus_one("loop"):
+                    for workout in Workout.objects.all():
+                        workout.user.username
+
+        self.assertIn("tests.py", logs.output[0])
+
+    @override_settings(N_PLUS_ONE_THRESHOLD=3)
+    def test_bounded_queries_pass(self):
+        for i in range(4):
+            Workout.objects.create(name="W%d" % i, description="W", user=self.user)
+
+        with detect_n_plus_one("select_related"):
+            for workout in Workout.objects.select_related("user"):
+                workout.user.username
+
+
+class LogHandlerTests(TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.today = os.path.join(self.directory, "workout_%s.log" % time.strftime("%Y-%m-%d"))
+
+    def make_record(self, message):
+        return logging.LogRecord("workout", logging.INFO, __file__, 0, message, None, None)
+
+    def test_queued_records_are_written_by_the_listener(self):
+        handler = QueuedFileHandler(self.directory)
+        handler.setFormatter(logging.Formatter("%(levelname)s - %(message)s"))
+        handler.handle(self.make_record("GET request to login"))
+        handler.close()
+
+        with open(self.today) as file:
+            self.assertEqual(file.read(), "INFO - GET request to login\n")
+
+    def test_rollover_switches_to_the_current_day_and_prunes_old_files(self):
+        for day in ["2024-06-07", "2024-06-08", "2024-06-09"]:
+            open(os.path.join(self.directory, "workout_%s.log" % day), "w").close()
+        handler = DailyFileHandler(self.directory, backup_count=2)
+        handler.baseFilename = os.path.join(self.directory, "workout_2024-06-09.log")
+        handler.rolloverAt = 0
+
+        handler.handle(self.make_record("after midnight"))
+        handler.close()
+
+        self.assertEqual(sorted(os.listdir(self.directory)), [
+            "workout_2024-06-08.log", "workout_2024-06-09.log", os.path.basename(self.today),
+        ])
+        with open(self.today) as file:
+            self.assertEqual(file.read(), "after midnight\n")
+
+    def test_set_directory_moves_the_next_records(self):
+        other = os.path.join(self.directory, "other")
+        handler = DailyFileHandler(self.directory)
+        handler.handle(self.make_record("before"))
+        handler.set_directory(other)
+        handler.handle(self.make_record("after"))
+        handler.close()
+
+        with open(os.path.join(other, os.path.basename(self.today))) as file:
+            self.assertEqual(file.read(), "after\n")
+
+
+class RequestLogTests(WorkoutTestCase):
+
+    def test_validation_errors_are_logged_as_json(self):
+        self.client.logout()
+        with self.assertLogs("workout.requests", "INFO") as logs:
+            self.client.post("/user/register", {
+                "username": "x", "email": "x@example.com",
+                "password": "password123", "password_confirmation": "password123",
+            })
+
+        line = json.loads(logs.records[0].getMessage())
+        self.assertEqual(line["view"], "workout.views.register")
+        self.assertEqual(line["status"], 302)
+        self.assertIn("Username is required and must be at least 2 characters long.", line["validation_errors"])
+
+    @override_settings(REQUEST_LOG_SAMPLE_RATES={"workout.views.dashboard": 0})
+    def test_unsampled_views_are_skipped(self):
+        with self.assertNoLogs("workout.requests", "INFO"):
+            self.client.get("/dashboard")
+
+    def test_logging_runs_no_queries(self):
+        response = self.client.get("/dashboard")
+
+        with self.assertLogs("workout.requests", "INFO"), self.assertNumQueries(0):
+            request_log.log_request(response.wsgi_request, response, {}, 0.01)
+
+
+class AnalyzeLogsTests(TestCase):
+
+    LOG = """2024-06-08 17:12:01,100 - DEBUG - GET request to login: 
+2024-06-08 17:12:05,100 - DEBUG - POST request to login: 
+2024-06-08 17:12:05,200 - WARNING - User could not be logged in.: 
+2024-06-08 17:12:05,201 - ERROR - Username or password is incorrect.: 
+2024-06-08 17:12:20,100 - DEBUG - POST request to login: 
+2024-06-08 17:12:20,200 - WARNING - User could not be logged in.: 
+2024-06-08 17:12:20,201 - ERROR - Username or password is incorrect.: 
+2024-06-08 17:13:01,100 - DEBUG - POST request to login: 
+2024-06-08 17:13:01,200 - WARNING - Login attempt throttled.: 
+2024-06-08 17:20:00,000 - ERROR - Internal Server Error: /statistics: 
+Traceback (most recent call last):
+  File "views.py", line 1, in statistics
+2024-06-08 17:20:01,100 - DEBUG - GET request to login: 
+2024-06-08 17:30:00,100 - WARNING - User could not be logged in.: 
+"""
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.path = os.path.join(directory, "workout_2024-06-08.log")
+        with open(self.path, "w") as file:
+            file.write(self.LOG)
+
+    def test_analyzer_summarizes_the_log(self):
+        analyzer = LogAnalyzer(burst_window=60, burst_threshold=3).feed(read_entries([self.path]))
+
+        self.assertEqual(analyzer.get_endpoint_rows(), [
+            ("POST login", 3, 1.0, 2), ("GET login", 2, 2 / 3, 1),
+        ])
+        self.assertEqual([count for _, count in analyzer.get_peak_minutes()], [3, 1, 1])
+        self.assertEqual(analyzer.login_failures, 4)
+        self.assertEqual([burst[2] for burst in analyzer.bursts], [3])
+        self.assertEqual(dict(analyzer.validation_errors), {"Username or password is incorrect.": 2})
+
+    def test_validation_errors_are_bounded(self):
+        analyzer = LogAnalyzer(max_messages=4)
+        for _ in range(3):
+            analyzer.add_validation_error("frequent")
+        for i in range(10):
+            analyzer.add_validation_error("rare %d" % i)
+
+        self.assertLessEqual(len(analyzer.validation_errors), 4)
+        self.assertEqual(analyzer.validation_errors["frequent"], 3)
+
+    def test_replay_mix_from_logs(self):
+        self.assertEqual(get_mix_from_logs([self.path]), ({"login": 2, "login_post": 3}, {}))
+
+    def test_replay_mix_adds_unlogged_routes(self):
+        mix, added = add_unlogged_routes({"login": 2, "login_post": 3}, {"dashboard": 5, "login_post": 1})
+
+        # Five dashboards per login, as in the profile:
+        self.assertEqual(mix, {"login": 2, "login_post": 3, "dashboard": 15})
+        self.assertEqual(added, ["dashboard"])
+
+    def test_csv_output(self):
+        output = StringIO()
+        call_command("analyze_logs", self.path, format="csv", burst_threshold=3, stdout=output)
+
+        lines = output.getvalue().splitlines()
+        self.assertEqual(lines[0], "section,name,count,per_minute,peak_per_minute,until")
+        self.assertIn("endpoint,POST login,3,1.000,2,", lines)
+        self.assertIn("login_burst,2024-06-08T17:12:05,3,,,2024-06-08T17:13:01", lines)
+
+
+# Simulated users run in their own threads, which only see committed data:
+@override_settings(STATICFILES_STORAGE="django.contrib.staticfiles.storage.StaticFilesStorage", BCRYPT_ROUNDS=4)
+class ReplayLoadTests(TemporaryLogDirMixin, TransactionTestCase):
+
+    def test_percentile(self):
+        self.assertEqual([percentile([1, 2, 3, 4], percent) for percent in [25, 50, 99]], [1, 2, 4])
+
+    def test_replay_in_process(self):
+        call_command("seed_load", users=2, workouts=2, exercises=2, challenges=1, participants=1, stdout=StringIO())
+        # One user: the threads of several would contend for the table locks of the in-memory test database:
+        users = get_user_arguments(1, "password123")
+
+        results, elapsed = replay(InProcessClient, users, {"dashboard": 1, "join_challenge": 1}, requests=8)
+
+        rows = summarize(results, elapsed)
+        self.assertEqual(sum(row["requests"] for row in rows), 8)
+        self.assertEqual(sum(row["errors"] for row in rows), 0)
+        self.assertEqual({status for samples in results.values() for _, status in samples} - {200, 302}, set())
+        # Logged in, so the dashboard renders instead of redirecting to the login page:
+        self.assertTrue(all(status == 200 for _, status in results.get("dashboard", [])))
+
+
+class ProfilingTests(WorkoutTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        settings = override_settings(PROFILING_ENABLED=True, PROFILING_DIR=self.directory)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def test_signed_header_writes_a_profile(self):
+        response = self.client.get("/dashboard", HTTP_X_PROFILE=profiling.make_token())
+
+        self.assertEqual(os.listdir(self.directory), [response["X-Profile"]])
+        self.assertRegex(response["X-Profile"], r"_dashboard_\d+ms\.pstats$")
+
+    def test_unsigned_requests_are_not_profiled(self):
+        self.client.get("/dashboard", HTTP_X_PROFILE="forged")
+        # Only for staff users of the admin:
+        self.client.get("/dashboard?profile")
+
+        self.assertEqual(os.listdir(self.directory), [])
+
+    @override_settings(PROFILING_MODE="sample", PROFILING_INTERVAL=0.001)
+    def test_stack_sampler_writes_collapsed_stacks(self):
+        response = self.client.get("/statistics", HTTP_X_PROFILE=profiling.make_token())
+
+        with open(os.path.join(self.directory, response["X-Profile"])) as file:
+            lines = file.read().splitlines()
+        self.assertTrue(all(re.match(r"^\S.* \d+$", line) for line in lines))
+
+    @override_settings(PROFILING_MAX_FILES=2)
+    def test_old_profiles_are_pruned(self):
+        now = time.time()
+        for name, modified_at in [("expired", 0), ("0", now), ("1", now - 10), ("2", now - 20)]:
+            path = os.path.join(self.directory, name + ".pstats")
+            open(path, "w").close()
+            os.utime(path, (modified_at, modified_at))
+
+        profiling.prune(self.directory)
+
+        self.assertEqual(sorted(os.listdir(self.directory)), ["0.pstats", "1.pstats"])
+
+    def test_disabled_middleware_is_left_out(self):
+        with override_settings(PROFILING_ENABLED=False):
+            response = self.client.get("/dashboard", HTTP_X_PROFILE=profiling.make_token())
+
+        self.assertNotIn("X-Profile", response)
+
+
+@override_settings(SLOW_QUERY_THRESHOLD=0)
+class SlowQueryTests(WorkoutTestCase):
+
+    def setUp(self):
+        super().setUp()
+        slow_query_log.clear()
+        self.addCleanup(slow_query_log.clear)
+
+    def test_queries_are_recorded_with_their_plan(self):
+        self.client.get("/workout/%d" % self.workout.id)
+
+        entry = next(entry for entry in slow_query_log.get_entries() if '"workout_workout"."id" = %s' in entry["sql"])
+        self.assertEqual(entry["view"], "workout.views.workout")
+        self.assertEqual(entry["params"], "(%d,)" % self.workout.id)
+        self.assertIn("USING INTEGER PRIMARY KEY", entry["plan"])
+        self.assertIn("views_helper.py", entry["source"])
+
+    def test_failed_explains_are_reported(self):
+        # Inside the test's transaction, which must stay usable:
+        self.assertTrue(explain(connection, "SELECT * FROM missing_table WHERE id = %s", (1,)).startswith("Not explained: no such table"))
+        self.assertTrue(Workout.objects.filter(id=self.workout.id).exists())
+
+    def test_failed_queries_keep_their_error(self):
+        with self.assertRaisesMessage(OperationalError, "no such table: missing_table"):
+            with record_slow_queries(), connection.cursor() as cursor:
+                cursor.execute("SELECT * FROM missing_table")
+
+        entry = slow_query_log.get_entries()[0]
+        self.assertEqual(entry["plan"], "Not explained: the query failed")
+
+    def test_admin_lists_the_log(self):
+        self.client.get("/dashboard")
+        admin = AdminUser.objects.create_superuser("admin", "admin@example.com", "unused")
+        self.client.force_login(admin)
+
+        response = self.client.get("/admin/workout/slowquery/")
+
+        self.assertContains(response, "workout.views.dashboard")
+        self.assertContains(response, "workout_userchallenge")
+
+    def test_admin_needs_permissions_to_read_and_clear_the_log(self):
+        self.client.get("/dashboard")
+        staff = AdminUser.objects.create_user("staff", "staff@example.com", "unused", is_staff=True)
+        self.client.force_login(staff)
+
+        self.assertEqual(self.client.get("/admin/workout/slowquery/").status_code, 403)
+
+        staff.user_permissions.add(Permission.objects.get(codename="view_slowquery"))
+        response = self.client.post("/admin/workout/slowquery/", {"clear": "Clear"})
+
+        self.assertEqual(response.status_code, 403)
+        self.assertTrue(slow_query_log.get_entries())
+        self.assertNotContains(self.client.get("/admin/workout/slowquery/"), 'name="clear"')
+
+    def test_parameters_of_writes_are_not_recorded(self):
+        with record_slow_queries():
+            User.objects.filter(id=self.user.id).update(password="secret hash")
+
+        entry = next(entry for entry in slow_query_log.get_entries() if entry["sql"].startswith("UPDATE"))
+        self.assertEqual(entry["params"], REDACTED_PARAMS)
+
+
+class SQLiteTuningTests(TestCase):
+
+    def test_pragmas_are_applied(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        raw_connection = sqlite3.connect(os.path.join(directory, "db.sqlite3"))
+        self.addCleanup(raw_connection.close)
+
+        apply_pragmas(raw_connection, DEFAULT_PRAGMAS)
+
+        self.assertEqual(raw_connection.execute("PRAGMA journal_mode").fetchone(), ("wal",))
+        self.assertEqual(raw_connection.execute("PRAGMA busy_timeout").fetchone(), (5000,))
+
+    @override_settings(SQLITE_PRAGMAS=DEFAULT_PRAGMAS, SQLITE_KEEP_JOURNAL_MODE=["/srv/db.sqlite3"])
+    def test_journal_mode_of_kept_databases_is_left_alone(self):
+        self.assertNotIn("journal_mode", get_pragmas("/srv/db.sqlite3"))
+        self.assertEqual(get_pragmas("/srv/other.sqlite3")["journal_mode"], "WAL")
+
+    def test_locked_writes_are_retried_with_backoff(self):
+        calls, sleeps = [], []
+
+        def write():
+            calls.append(1)
+            if len(calls) < 3:
+                raise OperationalError("database is locked")
+            return "written"
+
+        self.assertEqual(call_with_retry(write, retries=5, base_delay=0.01, max_delay=0.5, sleep=sleeps.append), "written")
+        self.assertEqual(len(calls), 3)
+        self.assertTrue(0 <= sleeps[0] <= 0.01 and 0 <= sleeps[1] <= 0.02)
+
+    def test_other_errors_and_exhausted_retries_are_raised(self):
+        calls = []
+
+        def write():
+            calls.append(1)
+            raise OperationalError("database is locked")
+
+        with self.assertRaises(OperationalError):
+            call_with_retry(write, retries=2, sleep=lambda delay: None)
+        self.assertEqual(len(calls), 3)
+
+        # Not a lock, so not retried:
+        with self.assertRaises(IntegrityError):
+            call_with_retry(self.raise_integrity_error, sleep=self.fail)
+
+    def raise_integrity_error(self):
+        raise IntegrityError("UNIQUE constraint failed")
+
+
+def is_usable(raw_connection):
+    try:
+        raw_connection.execute("SELECT 1")
+    except sqlite3.ProgrammingError:
+        return False
+    return True
+
+
+class HealthCheckedDatabaseWrapper(HealthCheckMixin, SQLiteDatabaseWrapper):
+    pass
+
+
+# SQLite connections stand in for PostgreSQL ones, which need a server:
+class ConnectionPoolTests(TestCase):
+
+    def make_pool(self, **kwargs):
+        pool = ConnectionPool(lambda: sqlite3.connect(":memory:", check_same_thread=False), is_usable=is_usable, **kwargs)
+        self.addCleanup(pool.close)
+        return pool
+
+    def test_connections_are_reused(self):
+        pool = self.make_pool()
+        raw_connection = pool.get()
+        pool.put(raw_connection)
+
+        self.assertIs(pool.get(), raw_connection)
+        self.assertEqual(pool.get_stats(), {"idle": 0, "opened": 1, "reused": 1, "discarded": 0})
+
+    def test_get_waits_for_a_connection(self):
+        pool = self.make_pool(max_size=1, timeout=0.01)
+        raw_connection = pool.get()
+        with self.assertRaises(PoolTimeout):
+            pool.get()
+
+        pool.put(raw_connection, discard=True)
+        self.assertIsNot(pool.get(), raw_connection)
+
+    def test_broken_connections_are_replaced(self):
+        pool = self.make_pool(check_after=0)
+        raw_connection = pool.get()
+        pool.put(raw_connection)
+        # Dropped while idle, e.g. by a server restart:
+        raw_connection.close()
+
+        self.assertTrue(is_usable(pool.get()))
+        self.assertEqual(pool.get_stats()["discarded"], 1)
+
+    def test_health_checks(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        # Django never closes in-memory databases:
+        wrapper = HealthCheckedDatabaseWrapper(dict(connection.settings_dict, NAME=os.path.join(directory, "db.sqlite3"), CONN_MAX_AGE=60, CONN_HEALTH_CHECKS=True))
+        self.addCleanup(wrapper.close)
+        checks = []
+
+        def is_wrapper_usable():
+            checks.append(1)
+            return False
+
+        wrapper.is_usable = is_wrapper_usable
+        wrapper.cursor().close()
+        raw_connection = wrapper.connection
+        # New connections aren't checked, and kept after the request:
+        wrapper.close_if_unusable_or_obsolete()
+        self.assertEqual(checks, [])
+
+        wrapper.cursor().close()
+        wrapper.cursor().close()
+        self.assertEqual(checks, [1])
+        self.assertIsNot(wrapper.connection, raw_connection)
+
+
+# The tests have no replica, so `default` stands in for it:
+@override_settings(REPLICA_DATABASE="default", REPLICA_VIEWS={"workout.views.statistics": 10, "workout.views.profile_online": 0})
+class ReplicaTests(TestCase):
+
+    def get_read_alias(self, method, path, pinned_at=None):
+        """Runs a request through `ReplicaMiddleware`; returns the database its view read from and the response."""
+        aliases = []
+
+        def view(request):
+            middleware.process_view(request, None, (), {})
+            aliases.append(replicas.get_read_alias())
+            return HttpResponse()
+
+        middleware = ReplicaMiddleware(view)
+        request = RequestFactory().generic(method, path)
+        request.resolver_match = resolve(path)
+        if pinned_at is not None:
+            request.COOKIES["replica_pin"] = str(pinned_at)
+        response = middleware(request)
+        self.assertIsNone(replicas.get_read_alias())
+        return aliases[0], response
+
+    def test_replica_views_read_from_the_replica(self):
+        self.assertEqual(self.get_read_alias("GET", "/statistics")[0], "default")
+        self.assertIsNone(self.get_read_alias("GET", "/dashboard")[0])
+        self.assertIsNone(self.get_read_alias("POST", "/statistics")[0])
+
+    def test_reads_stick_to_the_primary_after_a_post(self):
+        response = self.get_read_alias("POST", "/workout/1/complete")[1]
+        self.assertEqual(response.cookies["replica_pin"]["max-age"], 10)
+        pinned_at = float(response.cookies["replica_pin"].value)
+
+        self.assertIsNone(self.get_read_alias("GET", "/statistics", pinned_at)[0])
+        self.assertEqual(self.get_read_alias("GET", "/statistics", pinned_at - 11)[0], "default")
+        # A stale profile is fine:
+        self.assertEqual(self.get_read_alias("GET", "/profile/1", pinned_at)[0], "default")
+
+    def test_router(self):
+        router = replicas.ReplicaRouter()
+        self.assertIsNone(router.db_for_read(Workout))
+        with replicas.reading_from("default"):
+            self.assertEqual(router.db_for_read(Workout), "default")
+        with replicas.reading_from("missing"):
+            self.assertIsNone(router.db_for_read(Workout))
+        self.assertEqual(router.db_for_write(Workout), "default")
+        self.assertFalse(router.allow_migrate("default", "workout"))
+
+    def test_copy_database(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        source_path, target_path = os.path.join(directory, "db.sqlite3"), os.path.join(directory, "replica.sqlite3")
+        with sqlite3.connect(source_path) as source:
+            source.execute("CREATE TABLE workout (id INTEGER PRIMARY KEY)")
+            source.execute("INSERT INTO workout VALUES (1)")
+        source.close()
+
+        replicas.copy_database(source_path, target_path)
+
+        target = sqlite3.connect(target_path)
+        self.addCleanup(target.close)
+        self.assertEqual(target.execute("SELECT id FROM workout").fetchall(), [(1,)])
+
+
+class PageCacheTests(WorkoutTestCase):
+
+    def get_count(self, view, result):
+        return metrics.registry.counters[("workout_page_cache_requests_total", (("view", view), ("result", result)))]
+
+    def test_pages_are_cached_until_the_user_changes_something(self):
+        self.add_strength("Squat")
+        hits, misses = self.get_count("statistics", "hit"), self.get_count("statistics", "miss")
+        self.client.get("/statistics")
+        with self.assertNumQueries(2):
+            # Only the session and the session user:
+            response = self.client.get("/statistics")
+        self.assertContains(response, "Squat")
+        self.assertEqual((self.get_count("statistics", "hit") - hits, self.get_count("statistics", "miss") - misses), (1, 1))
+
+        self.add_strength("Lunge")
+        self.assertContains(self.client.get("/statistics"), "Lunge")
+
+        StrengthTrainingExercise.objects.update_fields(StrengthTrainingExercise.objects.get(name="Lunge").id, name="Deadlift")
+        self.assertContains(self.client.get("/statistics"), "Deadlift")
+
+        self.workout.name = "Push day"
+        self.workout.save()
+        self.assertContains(self.client.get("/workout/%d" % self.workout.id), "Push day")
+
+    def test_changes_of_other_users_keep_the_cache(self):
+        other = User.objects.create(username="other", email="other@example.com", password="unused")
+        self.client.get("/dashboard")
+        hits = self.get_count("dashboard", "hit")
+
+        Workout.objects.create(name="Other day", description="Other", user=other)
+
+        self.client.get("/dashboard")
+        self.assertEqual(self.get_count("dashboard", "hit") - hits, 1)
+
+    def test_challenge_changes_reach_participants(self):
+        other = User.objects.create(username="other", email="other@example.com", password="unused")
+        challenge = Challenge.objects.create(name="Thirty days", description="Daily")
+        workout = Workout.objects.create(name="Challenge day", description="Run", user=other, challenge=challenge, is_shared=True)
+        UserChallenge.objects.create(user=self.user, challenge=challenge, workout=workout)
+        self.assertContains(self.client.get("/dashboard"), "Thirty days")
+
+        challenge.name = "Sixty days"
+        challenge.save()
+
+        self.assertContains(self.client.get("/dashboard"), "Sixty days")
+
+    def test_challenge_changes_reach_the_owner(self):
+        challenge = Challenge.objects.create(name="Thirty days", description="Daily")
+        self.workout.challenge = challenge
+        self.workout.is_shared = True
+        self.workout.save()
+        # The cached workout comes with its challenge:
+        self.assertEqual(self.client.get("/workout/%d" % self.workout.id).context["workout"].challenge.name, "Thirty days")
+
+        challenge.name = "Sixty days"
+        challenge.save()
+
+        self.assertEqual(self.client.get("/workout/%d" % self.workout.id).context["workout"].challenge.name, "Sixty days")
+
+    def test_muscle_group_changes_reach_everyone(self):
+        self.add_strength("Squat")
+        self.assertContains(self.client.get("/statistics"), "Legs")
+        self.assertContains(self.client.get("/workout/%d" % self.workout.id), "Legs")
+
+        self.muscle_group.name = "Quads"
+        self.muscle_group.save()
+
+        self.assertContains(self.client.get("/statistics"), "Quads")
+        self.assertContains(self.client.get("/workout/%d" % self.workout.id), "Quads")
+
+    def test_workouts_of_other_users_are_not_cached(self):
+        other = User.objects.create(username="other", email="other@example.com", password="unused")
+        workout = Workout.objects.create(name="Other day", description="Other", user=other)
+
+        response = self.client.get("/workout/%d" % workout.id)
+
+        self.assertRedirects(response, "/workout", fetch_redirect_response=False)
+        self.assertEqual(page_cache.get_cache().get(page_cache.get_key(self.user.id, "workout", (workout.id,))), None)
+
+    def test_pages_read_from_the_replica_are_not_cached(self):
+        self.add_strength("Squat")
+        # `default` stands in for a replica that hasn't caught up with the write yet:
+        with replicas.reading_from("default"):
+            self.assertContains(self.client.get("/statistics"), "Squat")
+
+        key = page_cache.get_key(self.user.id, "statistics", ("updated_at", "desc", 1, timezone.localdate()))
+        self.assertIsNone(page_cache.get_cache().get(key))
+        # Computed from the primary, it's cached:
+        self.client.get("/statistics")
+        self.assertIsNotNone(page_cache.get_cache().get(key))
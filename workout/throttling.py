@@ -0,0 +1,130 @@
+"""
+throttling.py
+
+Token-bucket limits on login attempts, keyed by username and by client address.
+
+Every attempt takes one token from the bucket of the username and one from the bucket of the
+client address. A bucket holds up to `capacity` tokens and refills at `capacity / period` tokens per
+second, so bursts are allowed but the long-term rate is bounded. Attempts over the limit are
+rejected before the password is looked at, which keeps brute force from spending our CPU on bcrypt.
+
+Buckets live either in this process (`LOGIN_THROTTLE_STORE = "memory"`, an LRU dictionary of at
+most `LOGIN_THROTTLE_MAX_KEYS` buckets) or in a Django cache (`"cache"`, shared between workers when
+the cache is, e.g. Redis or Memcached).
+"""
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+
+# {kind: (capacity, period in seconds)}:
+DEFAULT_RATES = {
+    "username": (5, 60),
+    "address": (20, 60),
+}
+
+
+def take_token(state, capacity, period, now):
+    """
+    Refills a bucket for the time elapsed since it was last used and takes one token.
+
+    Args:
+        state: `(tokens, updated_at)` of the bucket, or `None` for a new (full) bucket.
+        capacity: Size of the bucket.
+        period: Seconds to refill an empty bucket.
+        now: Current time, in seconds.
+
+    Returns:
+        `(allowed, new_state)`.
+    """
+    tokens, updated_at = state or (capacity, now)
+    tokens = min(capacity, tokens + (now - updated_at) * capacity / period)
+    if tokens < 1:
+        return False, (tokens, now)
+    return True, (tokens - 1, now)
+
+
+class MemoryBucketStore:
+    """Buckets kept in this process, evicting the least recently used ones past `LOGIN_THROTTLE_MAX_KEYS`."""
+
+    def __init__(self):
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key, capacity, period, now):
+        with self._lock:
+            allowed, self._buckets[key] = take_token(self._buckets.get(key), capacity, period, now)
+            self._buckets.move_to_end(key)
+            while len(self._buckets) > getattr(settings, "LOGIN_THROTTLE_MAX_KEYS", 10000):
+                self._buckets.popitem(last=False)
+        return allowed
+
+    def reset(self):
+        with self._lock:
+            self._buckets.clear()
+
+
+class CacheBucketStore:
+    """
+    Buckets kept in a Django cache, so every worker using that cache shares them.
+
+    Reading and writing a bucket are two cache calls; concurrent attempts on the same key may both
+    get the last token, which is acceptable for a rate limit.
+    """
+
+    def take(self, key, capacity, period, now):
+        cache = caches[getattr(settings, "LOGIN_THROTTLE_CACHE_ALIAS", "default")]
+        allowed, state = take_token(cache.get(key), capacity, period, now)
+        # A bucket untouched for a whole period is full again, it doesn't need to be kept:
+        cache.set(key, state, timeout=period)
+        return allowed
+
+    def reset(self):
+        pass
+
+
+_memory_store = MemoryBucketStore()
+
+
+def get_store():
+    """Returns the bucket store selected by `LOGIN_THROTTLE_STORE`."""
+    if getattr(settings, "LOGIN_THROTTLE_STORE", "memory") == "cache":
+        return CacheBucketStore()
+    return _memory_store
+
+
+def get_client_address(request):
+    """Returns the address the request came from."""
+    return request.META.get("REMOTE_ADDR", "")
+
+
+def allow_login_attempt(username, address):
+    """
+    Takes a token for a login attempt from the username's and the address's buckets.
+
+    Args:
+        username: Username the attempt is for (normalized to lower case).
+        address: Client address, see `get_client_address()`.
+
+    Returns:
+        `True` if the attempt may go on, `False` if it's over the limit.
+    """
+    if not getattr(settings, "LOGIN_THROTTLE_ENABLED", True):
+        return True
+
+    rates = getattr(settings, "LOGIN_THROTTLE_RATES", DEFAULT_RATES)
+    store = get_store()
+    now = time.time()
+    allowed = True
+    # Both buckets are always charged, so rotating usernames doesn't spare the address and vice versa:
+    for kind, value in (("address", address), ("username", username.strip().lower())):
+        capacity, period = rates[kind]
+        # Hashed, so any username makes a valid cache key:
+        key = "login_throttle:%s:%s" % (kind, hashlib.sha1(value.encode()).hexdigest())
+        if not store.take(key, capacity, period, now):
+            allowed = False
+    return allowed
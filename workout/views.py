@@ -8,23 +8,20 @@ This module contains the views for the workout app.
 from django.shortcuts import render, redirect
 from django.contrib import messages # access django's `messages` module.
 from .models import *
+from django.db import transaction
 from django.db.models import Q
 from .views_helper import *
+from .statistics_helper import get_chart_data
+from .throttling import allow_login_attempt, get_client_address
+from .database import retry_on_locked
+from . import page_cache
 from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
-from itertools import chain
 import logging 
-import datetime
-from itertools import chain
 from django.shortcuts import redirect
 from django.utils import timezone
 from datetime import timedelta
 
 
-current_date = datetime.datetime.now().strftime("%Y-%m-%d")
-filename = f"workout_{current_date}.log"
-
-logging.basicConfig(level=logging.DEBUG, filename=filename, filemode="a+", format="%(asctime)s - %(levelname)s - %(message)s: ")
-
 # authentication
 def login(request):
     """
@@ -43,12 +40,16 @@ def login(request):
 
     if request.method == "POST":
         logging.debug("POST request to login")
+        # Reject attempts over the rate limit before any password hashing:
+        if not allow_login_attempt(request.POST.get("username", ""), get_client_address(request)):
+            logging.warning("Login attempt throttled.")
+            messages.error(request, "Too many login attempts. Please wait a minute and try again.", extra_tags='login')
+            return redirect("/")
         # Validate login data:
         validated = User.objects.login(**request.POST)
         try:
             # If errors, reload login page with errors:
             if len(validated["errors"]) > 0:
-                print("User could not be logged in.")
                 logging.warning("User could not be logged in.")
                 # Loop through errors and Generate Django Message for each with custom level and tag:
                 for error in validated["errors"]:
@@ -58,7 +59,6 @@ def login(request):
                 return redirect("/")
         except KeyError:
             # If validation successful, set session, and load dashboard based on user level:
-            print("User passed validation and is logged in.")
             # Set session to validated User:
             request.session["user_id"] = validated["logged_in_user"].id
             # Fetch dashboard data and load appropriate dashboard page:
@@ -86,7 +86,6 @@ def register(request):
         # If errors, reload register page with errors:
         try:
             if len(validated["errors"]) > 0:
-                print("User could not be registered.")
                 # Loop through errors and Generate Django Message for each with custom level and tag:
                 for error in validated["errors"]:
                     messages.error(request, error, extra_tags='registration')
@@ -95,7 +94,6 @@ def register(request):
                 return redirect("/user/register")
         except KeyError:
             # If validation successful, set session and load dashboard based on user level:
-            print("User passed validation and has been created.")
             # Set session to validated User:
             request.session["user_id"] = validated["logged_in_user"].id
             # Load Dashboard:
@@ -118,6 +116,7 @@ def logout(request):
     return redirect("/")
 
 # dashboard
+@user_required
 def dashboard(request):
     """
     GET - Loads dashboard.
@@ -132,31 +131,28 @@ def dashboard(request):
         Django HttpResponse object.
     """
 
-    try:
-        # Check for valid session:
-        user = User.objects.get(id=request.session["user_id"])
+    user = request.current_user
 
+    def get_context():
         # Get recent workouts for logged in user:
         recent_workouts = Workout.objects.filter(user__id=user.id).order_by('-id')[:4]
         # user_challenges = UserChallenge.objects.filter(user__id=user.id)
-        user_challenges = UserChallenge.objects.filter(user=user)
-        print(user_challenges)
-        # Gather any page data:
-        data = {
-            'user': user,
-            'recent_workouts': recent_workouts,
-            'user_challenges': user_challenges,
+        user_challenges = UserChallenge.objects.filter(user=user).select_related('challenge', 'workout')
+        return {
+            'recent_workouts': list(recent_workouts),
+            'user_challenges': list(user_challenges),
         }
 
-        # Load dashboard with data:
-        return render(request, "workout/dashboard.html", data)
+    # Gather any page data, cached until the user changes something:
+    data = {
+        'user': user,
+        **page_cache.get_or_set(user.id, "dashboard", get_context),
+    }
 
-    except (KeyError, User.DoesNotExist) as err:
-        # If existing session not found:
-        messages.info(request, "You must be logged in to view this page.", extra_tags="invalid_session")
-        logging.warning("User must be logged in to view 'dashboard'.")
-        return redirect("/")
+    # Load dashboard with data:
+    return render(request, "workout/dashboard.html", data)
 
+@user_required
 def view_all(request):
     """
     GET - Loads `View All` Workouts page.
@@ -164,56 +160,43 @@ def view_all(request):
     Args:
         request: Django HttpRequest object.
         user: User object.
-        workout_list: QuerySet of all workouts.
-        ste_list: QuerySet of all StrengthTrainingExercises.
-        ete_list: QuerySet of all EnduranceTrainingExercises.
-        be_list: QuerySet of all BalanceExercises.
-        fe_list: QuerySet of all FlexibilityExercises.
+        history_rows: `UNION ALL` QuerySet of all workouts and exercises.
         page: Current page number.
-        data_list: List of all exercises.
-        paginator: Paginator object.
+        paginator: HistoryPaginator object.
         data: Dictionary of page data.
 
     Returns:
         Django HttpResponse object.
     """
 
-    try:
-        # Check for valid session:
-        user = User.objects.get(id=request.session["user_id"])
-
-        workout_list = Workout.objects.filter(user__id=user.id)
-        ste_list = StrengthTrainingExercise.objects.filter(user__id=user.id)
-        ete_list = EnduranceTrainingExercise.objects.filter(user__id=user.id)
-        be_list = BalanceExercise.objects.filter(user__id=user.id)
-        fe_list = FlexibilityExercise.objects.filter(user__id=user.id)
-        
-        page = request.GET.get('page', 1)
-        data_list = list(chain(workout_list, ste_list,ete_list, be_list, fe_list))
-        paginator = Paginator(sorted(data_list, key=lambda x: x.updated_at, reverse=True), 12)
+    user = request.current_user
+    page = request.GET.get('page', 1)
+
+    def get_context():
+        # Workouts and exercises are merged, sorted and paginated by the database;
+        # only the rows of the requested page are turned into model instances:
+        history_rows = get_history_rows(user.id)
+
+        paginator = HistoryPaginator(history_rows, 12)
         try:
             data = paginator.page(page)
         except PageNotAnInteger:
             data = paginator.page(1)
         except EmptyPage:
             data = paginator.page(paginator.num_pages)
+        return {'data': freeze_page(data)}
 
-        # Gather any page data:
-        data = {
-            'user': user,
-            'data': data,
-        }
-
-        # Load dashboard with data:
-        return render(request, "workout/view_all.html", data)
+    # Gather any page data, cached until the user changes something:
+    data = {
+        'user': user,
+        **page_cache.get_or_set(user.id, "view_all", get_context, page),
+    }
 
-    except (KeyError, User.DoesNotExist) as err:
-        # If existing session not found:
-        messages.info(request, "You must be logged in to view this page.", extra_tags="invalid_session")
-        logging.warning("User must be logged in to view 'view_all'.")
-        return redirect("/")
+    # Load dashboard with data:
+    return render(request, "workout/view_all.html", data)
 
 # challanges
+@user_required
 def challenges(request):
     """
     GET - Loads `Challenges` page.
@@ -228,32 +211,27 @@ def challenges(request):
     Returns:
         Django HttpResponse object.
     """
-    try:
-        # Check if the session is valid:
-        user = User.objects.get(id=request.session["user_id"])
-
-        # Get workouts assigned to the logged-in user or shared workouts:
-        challenges = Workout.objects.filter(Q(is_shared=True) & ~Q(challenge=None))
-        user_challenges = UserChallenge.objects.filter(user=user).values_list('workout_id', flat=True)
+    user = request.current_user
 
-        print(challenges)
+    # Get workouts assigned to the logged-in user or shared workouts:
+    challenges = Workout.objects.filter(Q(is_shared=True) & ~Q(challenge=None))
+    user_challenges = UserChallenge.objects.filter(user=user).values_list('workout_id', flat=True)
 
-        # Get unique challenges from those workouts:
-        # challenges = Challenge.objects.filter(workout__in=workouts).distinct()
+    # Get unique challenges from those workouts:
+    # challenges = Challenge.objects.filter(workout__in=workouts).distinct()
 
-        # Collect page data:
-        data = {
-            'user': user,
-            'challenges': challenges,
-            'user_challenges': user_challenges,
-        }
+    # Collect page data:
+    data = {
+        'user': user,
+        'challenges': challenges,
+        'user_challenges': user_challenges,
+    }
 
-        # Load the page with challenges with data:
-        return render(request, "workout/challenges.html", data)
-    except User.DoesNotExist:
-        # Handling case when the user is not logged in or does not exist
-        return redirect('login')  # Redirect to login page or handle the error appropriately
+    # Load the page with challenges with data:
+    return render(request, "workout/challenges.html", data)
 
+@user_required
+@retry_on_locked
 def join_challenge(request, challenge_id):
     """
     POST - Join a challenge.
@@ -270,21 +248,14 @@ def join_challenge(request, challenge_id):
     """
     if request.method == "POST":
         try:
-            user = User.objects.get(id=request.session["user_id"])
-            workout = Workout.objects.get(id=challenge_id)
+            user = request.current_user
+            workout = load_workout(request, challenge_id)
             challenge = workout.challenge
-            
-            ste = StrengthTrainingExercise.objects.filter(workout__id=workout.id)
-            ete = EnduranceTrainingExercise.objects.filter(workout__id=workout.id)
-            be = BalanceExercise.objects.filter(workout__id=workout.id)
-            fe = FlexibilityExercise.objects.filter(workout__id=workout.id)
-            
-            exercises = list(chain(ste, ete, be, fe))
 
             # Check if the user has already joined the challenge
             user_challenge, created = UserChallenge.objects.get_or_create(
                 user=user, challenge=challenge, workout=workout,
-                defaults={'joined_at': timezone.now(), 'exercise_status': [False] * len(exercises)}
+                defaults={'joined_at': timezone.now(), 'exercise_status': [False] * len(workout.exercises_by_type)}
             )
 
             if created:
@@ -294,14 +265,13 @@ def join_challenge(request, challenge_id):
                 user_challenge.delete()
                 messages.success(request, "Successfully exited the challenge.")
 
-            return redirect("challenges")
-        except User.DoesNotExist:
-            messages.error(request, "User does not exist.")
             return redirect("challenges")
         except Workout.DoesNotExist:
             messages.error(request, "Workout does not exist.")
             return redirect('login')
     
+@user_required
+@retry_on_locked
 def view_challenge(request, id):
     """
     GET - View challenge.
@@ -316,66 +286,49 @@ def view_challenge(request, id):
         Django HttpResponse object.
     """
     
-    try:
-        # Check for valid session:
-        user = User.objects.get(id=request.session["user_id"])
+    user = request.current_user
 
-        user_challenge = UserChallenge.objects.get(Q(workout_id=id) & Q(user_id=user.id))
-        workout = Workout.objects.get(id=user_challenge.workout_id)
-        challenge = Challenge.objects.get(Q(id=user_challenge.challenge_id) & Q())
-                
-        user_challenge_all = UserChallenge.objects.filter(workout_id=id)
+    user_challenge = UserChallenge.objects.get(Q(workout_id=id) & Q(user_id=user.id))
+    workout = load_workout(request, user_challenge.workout_id)
+    challenge = Challenge.objects.get(Q(id=user_challenge.challenge_id) & Q())
+            
+    user_challenge_all = UserChallenge.objects.filter(workout_id=id)
 
-        # Wyciągnij user_id z user_challenge_all
-        user_ids = user_challenge_all.values_list('user_id', flat=True)
+    # Wyciągnij user_id z user_challenge_all
+    user_ids = user_challenge_all.values_list('user_id', flat=True)
 
-        # Pobierz użytkowników na podstawie user_id
-        users = User.objects.filter(id__in=user_ids)
-        user_list = list(users)
+    # Pobierz użytkowników na podstawie user_id
+    users = User.objects.filter(id__in=user_ids)
+    user_list = list(users)
 
-        print(user_list)
-        
-        if request.method == "POST":
-            # Process form data
-            exercise_status = []
-            for i in range(len(user_challenge.exercise_status)):
-                print(i)
-                print(bool(request.POST.get(f'exercise_{i}')))
-                exercise_status.append(bool(request.POST.get(f'exercise_{i}')))
-            user_challenge.exercise_status = exercise_status
-            user_challenge.save()
-            messages.success(request, "Exercise status updated successfully.")
-
-        # Getting all exercises for this workout: 
-        ste = StrengthTrainingExercise.objects.filter(workout__id=id)
-        ete = EnduranceTrainingExercise.objects.filter(workout__id=id)
-        be = BalanceExercise.objects.filter(workout__id=id)
-        fe = FlexibilityExercise.objects.filter(workout__id=id)
+    if request.method == "POST":
+        # Process form data
+        exercise_status = []
+        for i in range(len(user_challenge.exercise_status)):
+            exercise_status.append(bool(request.POST.get(f'exercise_{i}')))
+        user_challenge.exercise_status = exercise_status
+        user_challenge.save()
+        messages.success(request, "Exercise status updated successfully.")
+
+    # Getting all exercises for this workout, in the order `exercise_status` was stored in:
+    exercises_with_status = []
+    for i, exercise in enumerate(workout.exercises_by_type):
+        exercise_status = user_challenge.exercise_status[i]
+        exercises_with_status.append((exercise, exercise_status))
         
-        exercises = list(chain(ste, ete, be, fe))
-        exercises_with_status = []
-        for exercise in exercises:
-            exercise_status = user_challenge.exercise_status[exercises.index(exercise)]
-            exercises_with_status.append((exercise, exercise_status))
-            
 
-        # Gather any page data:
-        data = {
-            'user': user,
-            'challenge': challenge,
-            'exercises_with_status': exercises_with_status,
-            'users': user_list,
-        }
+    # Gather any page data:
+    data = {
+        'user': user,
+        'challenge': challenge,
+        'exercises_with_status': exercises_with_status,
+        'users': user_list,
+    }
 
-        # If get request, load workout page with data:
-        return render(request, "workout/view_challenge.html", data)
+    # If get request, load workout page with data:
+    return render(request, "workout/view_challenge.html", data)
 
-    except (KeyError, User.DoesNotExist) as err:
-        # If existing session not found:
-        messages.info(request, "You must be logged in to view this page.", extra_tags="invalid_session")
-        logging.warning("User must be logged in to view 'workout'.")
-        return redirect("/")
-    
+@user_required
 def preview_challenge(request, id):
     """
     GET - View challenge.
@@ -390,44 +343,26 @@ def preview_challenge(request, id):
     Returns:
         Django HttpResponse object.
     """
-    try:
-        # Check for valid session:
-        user = User.objects.get(id=request.session["user_id"])
-
-        workout = Workout.objects.get(id=id)
-        challenge = Challenge.objects.get(id=workout.challenge_id)
+    user = request.current_user
 
-        print(workout)
-        print(challenge)
+    # Getting the workout with all its exercises:
+    workout = load_workout(request, id)
+    challenge = workout.challenge
 
-        # Getting all exercises for this workout: 
-        ste = StrengthTrainingExercise.objects.filter(workout__id=id)
-        ete = EnduranceTrainingExercise.objects.filter(workout__id=id)
-        be = BalanceExercise.objects.filter(workout__id=id)
-        fe = FlexibilityExercise.objects.filter(workout__id=id)
-        
-        exercises = list(chain(ste, ete, be, fe))
-        
-        print(exercises)
-
-        # Gather any page data:
-        data = {
-            'user': user,
-            'workout': workout,
-            'challenge': challenge,
-            'exercises': exercises,
-        }
 
-        # If get request, load workout page with data:
-        return render(request, "workout/preview_challenge.html", data)
+    # Gather any page data:
+    data = {
+        'user': user,
+        'workout': workout,
+        'challenge': challenge,
+        'exercises': workout.exercises_by_type,
+    }
 
-    except (KeyError, User.DoesNotExist) as err:
-        # If existing session not found:
-        messages.info(request, "You must be logged in to view this page.", extra_tags="invalid_session")
-        logging.warning("User must be logged in to view 'workout'.")
-        return redirect("/")
+    # If get request, load workout page with data:
+    return render(request, "workout/preview_challenge.html", data)
 
 # muscle group
+@user_required
 def muscle_group(request):
     """
     GET - View muscle groups.
@@ -441,30 +376,21 @@ def muscle_group(request):
     Returns:
         Django HttpResponse object.
     """
-    try:
-        # Check for valid session:
-        user = User.objects.get(id=request.session["user_id"])
-        
-        muscle_group = MuscleGroup.objects.all().order_by('name')
-
-        print(muscle_group)
-        
-        # Gather any page data:
-        data = {
-            'user': user,
-            'muscle_group': muscle_group,
-        }
+    user = request.current_user
+    
+    muscle_group = MuscleGroup.objects.all().order_by('name')
 
-        # If get request, load workout page with data:
-        return render(request, "workout/muscle_group.html", data)
+    # Gather any page data:
+    data = {
+        'user': user,
+        'muscle_group': muscle_group,
+    }
 
-    except (KeyError, User.DoesNotExist) as err:
-        # If existing session not found:
-        messages.info(request, "You must be logged in to view this page.", extra_tags="invalid_session")
-        logging.warning("User must be logged in to view 'muscle_group'.")
-        return redirect("/")
+    # If get request, load workout page with data:
+    return render(request, "workout/muscle_group.html", data)
 
 # exercise
+@user_required
 def exercise(request, id):
     """
     GET - View exercise.
@@ -484,53 +410,46 @@ def exercise(request, id):
         logging.error("User must select an exercise type.")
         return redirect("/exercise")
     
-    try:
-        # Check for valid session:
-        user = User.objects.get(id=request.session["user_id"])
-        exercise_class = get_exercise_by_class_name(exercise_type)
-        exercise = exercise_class.objects.get(id=id)
-        redirect_url = "/exercise"
-        
-        # check if workout is owned by user
-        if exercise.user != user:
-            messages.error(request, "You do not have permission to view this exercise.", extra_tags='exercise')
-            logging.error("User does not have permission to view exercise.")
-            return redirect("/exercise")
-            
-        workout_id = None
-        try:
-            workout_id = request.GET["redirect_workout"]
-            if(workout_id != None):
-                redirect_url = "/workout/" + workout_id
-        except KeyError as err:
-            pass
-        
-        try:
-            redirect_view_all = request.GET["redirect_view_all"]
-            if(redirect_view_all != None and redirect_view_all == "true"):
-                redirect_url = "/history"
-        except KeyError as err:
-            pass
+    user = request.current_user
+    exercise_class = get_exercise_by_class_name(exercise_type)
+    exercise = exercise_class.objects.get(id=id)
+    redirect_url = "/exercise"
+    
+    # check if workout is owned by user
+    if exercise.user != user:
+        messages.error(request, "You do not have permission to view this exercise.", extra_tags='exercise')
+        logging.error("User does not have permission to view exercise.")
+        return redirect("/exercise")
         
-        # Gather any page data:
-        data = {
-            'user': user,
-            'exercise': exercise,
-            'workouts': Workout.objects.filter(user__id=user.id).order_by('-updated_at'),
-            'muscle_groups': MuscleGroup.objects.all().order_by('-updated_at'),
-            'redirect_url': redirect_url,
-            'redirect_workout': workout_id,
-        }
-
-        # If get request, load exercise page with data:
-        return render(request, "workout/exercise.html", data)
-
-    except (KeyError, User.DoesNotExist) as err:
-        # If existing session not found:
-        messages.info(request, "You must be logged in to view this page.", extra_tags="invalid_session")
-        logging.warning("User must be logged in to view 'exercise'.")
-        return redirect("/")
-
+    workout_id = None
+    try:
+        workout_id = request.GET["redirect_workout"]
+        if(workout_id != None):
+            redirect_url = "/workout/" + workout_id
+    except KeyError as err:
+        pass
+    
+    try:
+        redirect_view_all = request.GET["redirect_view_all"]
+        if(redirect_view_all != None and redirect_view_all == "true"):
+            redirect_url = "/history"
+    except KeyError as err:
+        pass
+    
+    # Gather any page data:
+    data = {
+        'user': user,
+        'exercise': exercise,
+        'workouts': Workout.objects.filter(user__id=user.id).order_by('-updated_at'),
+        'muscle_groups': MuscleGroup.objects.all().order_by('-updated_at'),
+        'redirect_url': redirect_url,
+        'redirect_workout': workout_id,
+    }
+
+    # If get request, load exercise page with data:
+    return render(request, "workout/exercise.html", data)
+
+@user_required
 def edit_exercise(request, id):
     """
     GET - load edit exercise, POST - submit edit exercise
@@ -545,67 +464,60 @@ def edit_exercise(request, id):
         Django HttpResponse object. 
     """
         
-    try:
-        user = User.objects.get(id=request.session["user_id"])
-        
-        if request.method == "GET":
-            logging.debug("GET request to edit exercise")
+    user = request.current_user
+    
+    if request.method == "GET":
+        logging.debug("GET request to edit exercise")
 
-            # If get request, load edit exercise page with data:
-            return redirect("/exercise/" + id)
+        # If get request, load edit exercise page with data:
+        return redirect("/exercise/" + id)
 
-        if request.method == "POST":
-            logging.debug("POST request to edit exercise")
-            workout_id = request.POST["workout_id"]
-            muscle_group_id = request.POST["muscle_group"]
-            exercise_type = request.POST["exercise_type"]
+    if request.method == "POST":
+        logging.debug("POST request to edit exercise")
+        workout_id = request.POST["workout_id"]
+        muscle_group_id = request.POST["muscle_group"]
+        exercise_type = request.POST["exercise_type"]
 
-            try:
-                redirect_url = request.POST["redirect"]
-            except KeyError as err:
-                pass
+        try:
+            redirect_url = request.POST["redirect"]
+        except KeyError as err:
+            pass
 
-            exercise = get_exercise_by_class_name(exercise_type)
-            
-            exercise_model = {
-                "exercise_id": id,
-                "name": request.POST["name"],
-                "description": request.POST["description"],
-                "workout": Workout.objects.get(id=workout_id),
-                "muscle_group": MuscleGroup.objects.get(id=muscle_group_id),
-                "user": user,
-            }
-            
-            # Add form data to exercise model:
-            for form_field in exercise().form_data():
-                exercise_model[form_field.name] = request.POST[form_field.name]
+        exercise = get_exercise_by_class_name(exercise_type)
+        
+        exercise_model = {
+            "exercise_id": id,
+            "name": request.POST["name"],
+            "description": request.POST["description"],
+            "workout": Workout.objects.get(id=workout_id),
+            "muscle_group": MuscleGroup.objects.get(id=muscle_group_id),
+            "user": user,
+        }
+        
+        # Add form data to exercise model:
+        for form_field in exercise().form_data():
+            exercise_model[form_field.name] = request.POST[form_field.name]
 
-            # Begin validation of a new exercise:
-            validated = exercise.objects.update_exercise(**exercise_model)
-            
-            # If errors, reload register page with errors:
-            try:
-                if len(validated["errors"]) > 0:
-                    logging.error("Exercise could not be edited.")
-                    print("Exercise could not be created.")
-
-                    # Loop through errors and Generate Django Message for each with custom level and tag:
-                    for error in validated["errors"]:
-                        messages.error(request, error, extra_tags='exercise')
-                        logging.error(error)
-                    # Reload workout page:
-                    return redirect("/exercise/" + id + "?exercise_type=" + exercise_type + "&current_muscle_group_id=" + muscle_group_id + "&current_workout_id=" + workout_id)
-            except KeyError:
-                # If validation successful, load newly created workout page:
-                print("Exercise passed validation and has been created.")
-                # Reload workout:
+        # Begin validation of a new exercise:
+        validated = exercise.objects.update_exercise(**exercise_model)
+        
+        # If errors, reload register page with errors:
+        try:
+            if len(validated["errors"]) > 0:
+                logging.error("Exercise could not be edited.")
+
+                # Loop through errors and Generate Django Message for each with custom level and tag:
+                for error in validated["errors"]:
+                    messages.error(request, error, extra_tags='exercise')
+                    logging.error(error)
+                # Reload workout page:
                 return redirect("/exercise/" + id + "?exercise_type=" + exercise_type + "&current_muscle_group_id=" + muscle_group_id + "&current_workout_id=" + workout_id)
-    except (KeyError, User.DoesNotExist) as err:
-        # If existing session not found:
-        messages.info(request, "You must be logged in to view this page.", extra_tags="invalid_session")
-        logging.warning("User must be logged in to view 'edit_exercise'.")
-        return redirect("/")
+        except KeyError:
+            # If validation successful, load newly created workout page:
+            # Reload workout:
+            return redirect("/exercise/" + id + "?exercise_type=" + exercise_type + "&current_muscle_group_id=" + muscle_group_id + "&current_workout_id=" + workout_id)
 
+@user_required
 def new_exercise(request):
     """
     GET - load new exercise, POST - submit new exercise
@@ -630,91 +542,80 @@ def new_exercise(request):
     if(current_muscle_group_id == None):
         current_muscle_group_id = -1
         
-    try:
-        # Check for valid session:
-        user = User.objects.get(id=request.session["user_id"]) 
+    user = request.current_user
+    
+    # Getting all exercises of this user, newest first:
+    index_rows = ExerciseIndex.objects.filter(user__id=user.id).order_by('-updated_at', '-id')
+    exercises = get_exercises(index_rows, select_related=('workout', 'muscle_group'))
+    
+    # Gather any page data:
+    data = {
+        'user': user,
+        'exercises': exercises,
+        'exercise_types': get_exercises_types(),
+        'current_exercise': exercise_type,
+        'current_workout_id': int(current_workout_id),
+        'current_muscle_group_id': int(current_muscle_group_id),
+        'workouts': Workout.objects.filter(user__id=user.id).order_by('-updated_at'), 
+        'muscle_groups': MuscleGroup.objects.order_by('name'),
+
+    }
+    
+    if request.method == "GET":
+        logging.debug("GET request to new exercise")
+        # If get request, load `add exercise` page with data:
+        return render(request, "workout/add_exercise.html", data)
+
+    if request.method == "POST":
+        logging.debug("POST request to new exercise")
+        workout_id = request.POST["workout_id"]
+        muscle_group_id = request.POST["muscle_group"]
+        exercise_type = request.POST["exercise_type"]
+        redirect_url = "/exercise"
         
-        ste = StrengthTrainingExercise.objects.filter(user__id=user.id)
-        ete = EnduranceTrainingExercise.objects.filter(user__id=user.id)
-        be = BalanceExercise.objects.filter(user__id=user.id)
-        fe = FlexibilityExercise.objects.filter(user__id=user.id)
         
-        exercises = list(chain(ste, ete, be, fe))
+        if(exercise_type == None):
+            exercise_type = StrengthTrainingExercise().class_name
         
-        # Gather any page data:
-        data = {
-            'user': user,
-            'exercises': sorted(exercises, key=lambda x: x.updated_at, reverse=True),
-            'exercise_types': get_exercises_types(),
-            'current_exercise': exercise_type,
-            'current_workout_id': int(current_workout_id),
-            'current_muscle_group_id': int(current_muscle_group_id),
-            'workouts': Workout.objects.filter(user__id=user.id).order_by('-updated_at'), 
-            'muscle_groups': MuscleGroup.objects.order_by('name'),
+        try:
+            redirect_url = request.POST["redirect"]
+        except KeyError as err:
+            pass
 
+        exercise = get_exercise_by_class_name(exercise_type)
+        
+        exercise_model = {
+            "name": request.POST["name"],
+            "description": request.POST["description"],
+            "workout": Workout.objects.get(id=workout_id),
+            "muscle_group": MuscleGroup.objects.get(id=muscle_group_id),
+            "user": user,
         }
         
-        if request.method == "GET":
-            logging.debug("GET request to new exercise")
-            # If get request, load `add exercise` page with data:
-            return render(request, "workout/add_exercise.html", data)
-
-        if request.method == "POST":
-            logging.debug("POST request to new exercise")
-            workout_id = request.POST["workout_id"]
-            muscle_group_id = request.POST["muscle_group"]
-            exercise_type = request.POST["exercise_type"]
-            redirect_url = "/exercise"
-            
-            
-            if(exercise_type == None):
-                exercise_type = StrengthTrainingExercise().class_name
-            
-            try:
-                redirect_url = request.POST["redirect"]
-            except KeyError as err:
-                pass
+        # Add form data to exercise model:
+        for form_field in exercise().form_data():
+            exercise_model[form_field.name] = request.POST[form_field.name]
 
-            exercise = get_exercise_by_class_name(exercise_type)
-            
-            exercise_model = {
-                "name": request.POST["name"],
-                "description": request.POST["description"],
-                "workout": Workout.objects.get(id=workout_id),
-                "muscle_group": MuscleGroup.objects.get(id=muscle_group_id),
-                "user": user,
-            }
-            
-            # Add form data to exercise model:
-            for form_field in exercise().form_data():
-                exercise_model[form_field.name] = request.POST[form_field.name]
+        # Begin validation of a new exercise:
+        validated = exercise.objects.new_exercise(**exercise_model)
+        
+        # If errors, reload register page with errors:
+        try:
+            if len(validated["errors"]) > 0:
+                logging.error("Exercise could not be created.")
 
-            # Begin validation of a new exercise:
-            validated = exercise.objects.new_exercise(**exercise_model)
-            
-            # If errors, reload register page with errors:
-            try:
-                if len(validated["errors"]) > 0:
-                    logging.error("Exercise could not be created.")
-                    print("Exercise could not be created.")
-
-                    # Loop through errors and Generate Django Message for each with custom level and tag:
-                    for error in validated["errors"]:
-                        messages.error(request, error, extra_tags='exercise')
-                        logging.error(error)
-                    # Reload workout page:
-                    return redirect(redirect_url + "?exercise_type=" + exercise_type + "&current_muscle_group_id=" + muscle_group_id + "&current_workout_id=" + workout_id)
-            except KeyError:
-                # If validation successful, load newly created workout page:
-                print("Exercise passed validation and has been created.")
-                # Reload workout:
-                return redirect( redirect_url + "?exercise_type=" + exercise_type + "&current_muscle_group_id=" + muscle_group_id + "&current_workout_id=" + workout_id)
-    except (KeyError, User.DoesNotExist) as err:
-        # If existing session not found:
-        messages.info(request, "You must be logged in to view this page.", extra_tags="invalid_session")
-        logging.warning("User must be logged in to view 'new_exercise'.")
-        return redirect("/")       
+                # Loop through errors and Generate Django Message for each with custom level and tag:
+                for error in validated["errors"]:
+                    messages.error(request, error, extra_tags='exercise')
+                    logging.error(error)
+                # Reload workout page:
+                return redirect(redirect_url + "?exercise_type=" + exercise_type + "&current_muscle_group_id=" + muscle_group_id + "&current_workout_id=" + workout_id)
+        except KeyError:
+            # If validation successful, load newly created workout page:
+            # Reload workout:
+            return redirect( redirect_url + "?exercise_type=" + exercise_type + "&current_muscle_group_id=" + muscle_group_id + "&current_workout_id=" + workout_id)
     
+@user_required
 def delete_exercise(request, id):
     """
     GET - Delete a exercise.
@@ -728,54 +629,46 @@ def delete_exercise(request, id):
     Returns:
         Django HttpResponse object.
     """
+    user = request.current_user
+    
+    redirect_url = "/exercise" 
     try:
-        # Check for valid session:
-        user = User.objects.get(id=request.session["user_id"])
-        
-        redirect_url = "/exercise" 
-        try:
-            workout_id = request.GET["redirect_workout"]
-            if(workout_id != None):
-                redirect_url = "/workout/" + workout_id
-        except KeyError as err:
-            pass
-        
-        try:
-            redirect_view_all = request.GET["redirect_view_all"]
-            if(redirect_view_all != None and redirect_view_all == "true"):
-                redirect_url = "/history"
-        except KeyError as err:
-            pass
-
-        exercise_type = request.GET.get('exercise_type')
-        if(exercise_type == None):
-            messages.error(request, "You must select an exercise type.", extra_tags='exercise')
-            logging.error("User must select an exercise type.")
-            return redirect(redirect_url + "/" + id)
+        workout_id = request.GET["redirect_workout"]
+        if(workout_id != None):
+            redirect_url = "/workout/" + workout_id
+    except KeyError as err:
+        pass
     
-        # check if exercise is owned by user
-        exercise_class = get_exercise_by_class_name(exercise_type)
-        exercise = exercise_class.objects.get(id=id)
-
-        if exercise.user != user:
-            messages.error(request, "You do not have permission to delete this exercise.", extra_tags='exercise')
-            logging.error("User does not have permission to delete exercise.")
-            return redirect(redirect_url) 
-        else:
-            # Delete workout:
-            exercise.delete()
-        
-        # Load dashboard:
-        return redirect(redirect_url)
-
+    try:
+        redirect_view_all = request.GET["redirect_view_all"]
+        if(redirect_view_all != None and redirect_view_all == "true"):
+            redirect_url = "/history"
+    except KeyError as err:
+        pass
 
-    except (KeyError, User.DoesNotExist) as err:
-        # If existing session not found:
-        messages.info(request, "You must be logged in to view this page.", extra_tags="invalid_session")
-        logging.warning("User must be logged in to view 'delete_exercise'.")
-        return redirect("/")
+    exercise_type = request.GET.get('exercise_type')
+    if(exercise_type == None):
+        messages.error(request, "You must select an exercise type.", extra_tags='exercise')
+        logging.error("User must select an exercise type.")
+        return redirect(redirect_url + "/" + id)
+
+    # check if exercise is owned by user
+    exercise_class = get_exercise_by_class_name(exercise_type)
+    exercise = exercise_class.objects.get(id=id)
+
+    if exercise.user != user:
+        messages.error(request, "You do not have permission to delete this exercise.", extra_tags='exercise')
+        logging.error("User does not have permission to delete exercise.")
+        return redirect(redirect_url) 
+    else:
+        # Delete exercise, keeping the statistics rollup in sync:
+        exercise_class.objects.delete_exercise(exercise)
+    
+    # Load dashboard:
+    return redirect(redirect_url)
 
 # workout 
+@user_required
 def workout(request, id):
     """
     GET - View workout.
@@ -796,45 +689,38 @@ def workout(request, id):
     if(current_muscle_group_id == None):
         current_muscle_group_id = 0
     
-    try:
-        # Check for valid session:
-        user = User.objects.get(id=request.session["user_id"])
-        workout = Workout.objects.get(id=id)
-        
-        # check if workout is owned by user
-        if workout.user != user:
-            messages.error(request, "You do not have permission to view this workout.", extra_tags='workout')
-            logging.error("User does not have permission to view workout.")
-            return redirect("/workout")
-
-        # Getting all exercises for this workout: 
-        ste = StrengthTrainingExercise.objects.filter(workout__id=id)
-        ete = EnduranceTrainingExercise.objects.filter(workout__id=id)
-        be = BalanceExercise.objects.filter(workout__id=id)
-        fe = FlexibilityExercise.objects.filter(workout__id=id)
-        
-        exercises = list(chain(ste, ete, be, fe))
-
-        # Gather any page data:
-        data = {
-            'user': user,
+    user = request.current_user
+
+    def get_context():
+        workout = load_workout(request, id)
+        # check if workout is owned by user; other users' workouts aren't cached, their changes don't invalidate this user's pages:
+        if workout.user_id != user.id:
+            return None
+        return {
             'workout': workout,
-            'exercises': sorted(exercises, key=lambda x: x.updated_at, reverse=True),
-            'muscle_groups': MuscleGroup.objects.order_by('name'),
-            'exercise_types': get_exercises_types(),
-            'current_exercise': exercise_type,
-            'current_muscle_group_id': int(current_muscle_group_id),
+            'exercises': workout.exercises,
         }
 
-        # If get request, load workout page with data:
-        return render(request, "workout/workout.html", data)
-
-    except (KeyError, User.DoesNotExist) as err:
-        # If existing session not found:
-        messages.info(request, "You must be logged in to view this page.", extra_tags="invalid_session")
-        logging.warning("User must be logged in to view 'workout'.")
-        return redirect("/")
-
+    context = page_cache.get_or_set(user.id, "workout", get_context, int(id))
+    if context is None:
+        messages.error(request, "You do not have permission to view this workout.", extra_tags='workout')
+        logging.error("User does not have permission to view workout.")
+        return redirect("/workout")
+
+    # Gather any page data:
+    data = {
+        'user': user,
+        **context,
+        'muscle_groups': MuscleGroup.objects.order_by('name'),
+        'exercise_types': get_exercises_types(),
+        'current_exercise': exercise_type,
+        'current_muscle_group_id': int(current_muscle_group_id),
+    }
+
+    # If get request, load workout page with data:
+    return render(request, "workout/workout.html", data)
+
+@user_required
 def edit_workout(request, id):
     """
     GET - load edit workout, POST - submit edit workout
@@ -849,68 +735,55 @@ def edit_workout(request, id):
         Django HttpResponse object.
     """
 
-    try:
-        # Check for valid session:
-        user = User.objects.get(id=request.session["user_id"])
-        
-        # Getting all exercises for this workout: 
-        ste = StrengthTrainingExercise.objects.filter(workout__id=id)
-        ete = EnduranceTrainingExercise.objects.filter(workout__id=id)
-        be = BalanceExercise.objects.filter(workout__id=id)
-        fe = FlexibilityExercise.objects.filter(workout__id=id)
+    user = request.current_user
+    
+    # Getting the workout with all its exercises:
+    workout = load_workout(request, id)
         
-        exercises = list(chain(ste, ete, be, fe))
-            
-        # Gather any page data:
-        data = {
-            'user': user,
-            'workout': Workout.objects.get(id=id),
-            'exercises': sorted(exercises, key=lambda x: x.updated_at, reverse=True),
-        }
+    # Gather any page data:
+    data = {
+        'user': user,
+        'workout': workout,
+        'exercises': workout.exercises,
+    }
 
-        if request.method == "GET":
-            logging.debug("GET request to edit workout")
-            # If get request, load edit workout page with data:
-            return render(request, "workout/edit_workout.html", data)
-        if request.method == "POST":
-            logging.debug("POST request to edit workout")
-            # check if workout is owned by user
-            if data['workout'].user != user:
-                messages.error(request, "You do not have permission to delete this workout.", extra_tags='workout')
-                logging.error("User does not have permission to delete workout.")
-                return redirect("/workout") 
-            # If post request, validate update workout data:
-            # Unpack request object and build our custom tuple:
-            workout = {
-                'name': request.POST['name'],
-                'description': request.POST['description'],
-                'workout_id': data['workout'].id,
-            }
-            # Begin validation of updated workout:
-            # validated = Workout.objects.update(**workout)
-            # If errors, reload register page with errors:
-            try:
-                # if len(validated["errors"]) > 0:
-                #     logging.error("Workout could not be edited.")
-                #     print("Workout could not be edited.")
-                #     # Loop through errors and Generate Django Message for each with custom level and tag:
-                #     for error in validated["errors"]:
-                #         messages.error(request, error, extra_tags='edit')
-                #         logging.error(error)
-                #     # Reload workout page:
-                    return redirect("/workout/" + str(data['workout'].id) + "/edit")
-            except KeyError:
-                # If validation successful, load newly created workout page:
-                print("Edited workout passed validation and has been updated.")
-                # Load workout:
+    if request.method == "GET":
+        logging.debug("GET request to edit workout")
+        # If get request, load edit workout page with data:
+        return render(request, "workout/edit_workout.html", data)
+    if request.method == "POST":
+        logging.debug("POST request to edit workout")
+        # check if workout is owned by user
+        if data['workout'].user != user:
+            messages.error(request, "You do not have permission to delete this workout.", extra_tags='workout')
+            logging.error("User does not have permission to delete workout.")
+            return redirect("/workout") 
+        # If post request, validate update workout data:
+        # Unpack request object and build our custom tuple:
+        workout = {
+            'name': request.POST['name'],
+            'description': request.POST['description'],
+            'workout_id': data['workout'].id,
+        }
+        # Begin validation of updated workout:
+        # validated = Workout.objects.update(**workout)
+        # If errors, reload register page with errors:
+        try:
+            # if len(validated["errors"]) > 0:
+            #     logging.error("Workout could not be edited.")
+            #     print("Workout could not be edited.")
+            #     # Loop through errors and Generate Django Message for each with custom level and tag:
+            #     for error in validated["errors"]:
+            #         messages.error(request, error, extra_tags='edit')
+            #         logging.error(error)
+            #     # Reload workout page:
                 return redirect("/workout/" + str(data['workout'].id) + "/edit")
+        except KeyError:
+            # If validation successful, load newly created workout page:
+            # Load workout:
+            return redirect("/workout/" + str(data['workout'].id) + "/edit")
 
-    except (KeyError, User.DoesNotExist) as err:
-        # If existing session not found:
-        messages.info(request, "You must be logged in to view this page.", extra_tags="invalid_session")
-        logging.warning("User must be logged in to view 'edit_workout'.")
-        return redirect("/")
-
+@user_required
 def new_workout(request):
     """
     GET - load new workout, POST - submit new workout
@@ -924,48 +797,40 @@ def new_workout(request):
     Returns:
         Django HttpResponse object.
     """
-    try:
-        # Check for valid session:
-        user = User.objects.get(id=request.session["user_id"])
-        workouts = Workout.objects.filter(user__id=user.id).order_by('-updated_at')
-        # Gather any page data:
-        data = {
-            'user': user,
-            'workouts': workouts,
-        }
+    user = request.current_user
+    workouts = Workout.objects.filter(user__id=user.id).order_by('-updated_at')
+    # Gather any page data:
+    data = {
+        'user': user,
+        'workouts': workouts,
+    }
 
-        if request.method == "GET":
-            logging.debug("GET request to new workout")
-            # If get request, load `add workout` page with data:
-            return render(request, "workout/add_workout.html", data)
-
-        if request.method == "POST":
-            logging.debug("POST request to new workout")
-            # Unpack request.POST for validation
-            workout_data = {
-                "name": request.POST["name"],
-                "description": request.POST["description"],
-                "user": user
-            }
-
-            # Begin validation and creation of a new workout
-            try:
-                new_workout = Workout.objects.create(**workout_data)
-                messages.success(request, "Workout created successfully!")
-                logging.info("Workout created successfully.")
-                return redirect('/workout/' + str(new_workout.id))
-            except Exception as e:
-                logging.error("Error creating workout: %s", e)
-                messages.error(request, "Error creating workout: " + str(e), extra_tags='workout')
-                return redirect("/workout")
-
-    except (KeyError, User.DoesNotExist) as err:
-        # If existing session not found:
-        messages.info(request, "You must be logged in to view this page.", extra_tags="invalid_session")
-        logging.warning("User must be logged in to view 'new_workout'.")
-        return redirect("/")
+    if request.method == "GET":
+        logging.debug("GET request to new workout")
+        # If get request, load `add workout` page with data:
+        return render(request, "workout/add_workout.html", data)
 
+    if request.method == "POST":
+        logging.debug("POST request to new workout")
+        # Unpack request.POST for validation
+        workout_data = {
+            "name": request.POST["name"],
+            "description": request.POST["description"],
+            "user": user
+        }
+
+        # Begin validation and creation of a new workout
+        try:
+            new_workout = Workout.objects.create(**workout_data)
+            messages.success(request, "Workout created successfully!")
+            logging.info("Workout created successfully.")
+            return redirect('/workout/' + str(new_workout.id))
+        except Exception as e:
+            logging.error("Error creating workout: %s", e)
+            messages.error(request, "Error creating workout: " + str(e), extra_tags='workout')
+            return redirect("/workout")
 
+@user_required
 def delete_workout(request, id):
     """
     GET - Delete a workout.
@@ -980,31 +845,26 @@ def delete_workout(request, id):
         Django HttpResponse object.
     """
 
-    try:
-        # Check for valid session:
-        user = User.objects.get(id=request.session["user_id"])
-        
-        # check if workout is owned by user
-        workout = Workout.objects.get(id=id)
-        
-        if workout.user != user:
-            messages.error(request, "You do not have permission to delete this workout.", extra_tags='workout')
-            logging.error("User does not have permission to delete workout.")
-            return redirect("/workout")
-        else:
-            # Delete workout:
+    user = request.current_user
+    
+    # check if workout is owned by user
+    workout = Workout.objects.get(id=id)
+    
+    if workout.user != user:
+        messages.error(request, "You do not have permission to delete this workout.", extra_tags='workout')
+        logging.error("User does not have permission to delete workout.")
+        return redirect("/workout")
+    else:
+        # Delete workout, removing its exercises from the statistics rollup:
+        with transaction.atomic():
+            ExerciseDailyStat.objects.discard_workout(workout)
             workout.delete()
 
-        # Load dashboard:
-        return redirect('/workout')
-
-
-    except (KeyError, User.DoesNotExist) as err:
-        # If existing session not found:
-        messages.info(request, "You must be logged in to view this page.", extra_tags="invalid_session")
-        logging.warning("User must be logged in to view 'delete_workout'.")
-        return redirect("/")
+    # Load dashboard:
+    return redirect('/workout')
 
+@user_required
+@retry_on_locked
 def complete_workout(request, id):
     """
     POST - complete a workout
@@ -1019,50 +879,43 @@ def complete_workout(request, id):
         Django HttpResponse object.
     """
 
-    try:
-        # Check for valid session:
-        user = User.objects.get(id=request.session["user_id"])
-
-        if request.method == "GET":
-            logging.debug("GET request to complete workout")
-            # If get request, bring back to workout page.
-            # Note, for now, GET request for this method not being utilized:
-            return redirect("/workout/" + id)
-
-        if request.method == "POST":
-            logging.debug("POST request to complete workout")
-            # Update Workout.completed field for this instance:
-            workout = Workout.objects.get(id=id)
-            redirect_url = "/workout/" + id
-
-            try:
-                redirect_url = request.POST["redirect"]
-            except KeyError as err:
-                pass
-
-            # check if workout is owned by user
-            if workout.user != user:
-                messages.error(request, "You do not have permission to complete this workout.", extra_tags='workout')
-                logging.error("User does not have permission to complete workout.")
-                redirect_url = "/workout"
-                return redirect(redirect_url)
-            
-            is_completed = workout.completed
-            if is_completed:
-                workout.completed = False
-            else:    
-                workout.completed = True 
-            workout.save()
-
-            # Return to workout:
-            return redirect(redirect_url)
+    user = request.current_user
+
+    if request.method == "GET":
+        logging.debug("GET request to complete workout")
+        # If get request, bring back to workout page.
+        # Note, for now, GET request for this method not being utilized:
+        return redirect("/workout/" + id)
 
-    except (KeyError, User.DoesNotExist) as err:
-        # If existing session not found:
-        messages.info(request, "You must be logged in to view this page.", extra_tags="invalid_session")
-        logging.warning("User must be logged in to view 'complete_workout'.")
-        return redirect("/")
+    if request.method == "POST":
+        logging.debug("POST request to complete workout")
+        # Update Workout.completed field for this instance:
+        workout = Workout.objects.get(id=id)
+        redirect_url = "/workout/" + id
 
+        try:
+            redirect_url = request.POST["redirect"]
+        except KeyError as err:
+            pass
+
+        # check if workout is owned by user
+        if workout.user != user:
+            messages.error(request, "You do not have permission to complete this workout.", extra_tags='workout')
+            logging.error("User does not have permission to complete workout.")
+            redirect_url = "/workout"
+            return redirect(redirect_url)
+        
+        is_completed = workout.completed
+        if is_completed:
+            workout.completed = False
+        else:    
+            workout.completed = True 
+        workout.save()
+
+        # Return to workout:
+        return redirect(redirect_url)
+
+@user_required
 def share_workout(request, id):
     """
     POST - share a workout
@@ -1076,51 +929,44 @@ def share_workout(request, id):
         Django HttpResponse object.
     """
 
-    try:
-        # Check for valid session:
-        user = User.objects.get(id=request.session["user_id"])
-
-        if request.method == "GET":
-            logging.debug("GET request to share workout")
-            # If get request, bring back to workout page.
-            # Note, for now, GET request for this method not being utilized:
-            return redirect("/workout/" + id)
-
-        if request.method == "POST":
-            logging.debug("POST request to share workout")
-            # Update Workout.is_shared field for this instance:
-            workout = Workout.objects.get(id=id)
-            redirect_url = "/workout/" + id
-
-            try:
-                redirect_url = request.POST["redirect"]
-            except KeyError as err:
-                pass
-
-            # check if workout is owned by user
-            if workout.user != user:
-                messages.error(request, "You do not have permission to share this workout.", extra_tags='workout')
-                logging.error("User does not have permission to share workout.")
-                redirect_url = "/workout"
-                return redirect(redirect_url)
-            
-            is_shared = workout.is_shared
-            if is_shared:
-                workout.is_shared = False
-            else:    
-                workout.is_shared = True 
-            workout.save()
-
-            # Return to workout:
-            return redirect(redirect_url)
+    user = request.current_user
+
+    if request.method == "GET":
+        logging.debug("GET request to share workout")
+        # If get request, bring back to workout page.
+        # Note, for now, GET request for this method not being utilized:
+        return redirect("/workout/" + id)
 
-    except (KeyError, User.DoesNotExist) as err:
-        # If existing session not found:
-        messages.info(request, "You must be logged in to view this page.", extra_tags="invalid_session")
-        logging.warning("User must be logged in to view 'share_workout'.")
-        return redirect("/")
+    if request.method == "POST":
+        logging.debug("POST request to share workout")
+        # Update Workout.is_shared field for this instance:
+        workout = Workout.objects.get(id=id)
+        redirect_url = "/workout/" + id
+
+        try:
+            redirect_url = request.POST["redirect"]
+        except KeyError as err:
+            pass
+
+        # check if workout is owned by user
+        if workout.user != user:
+            messages.error(request, "You do not have permission to share this workout.", extra_tags='workout')
+            logging.error("User does not have permission to share workout.")
+            redirect_url = "/workout"
+            return redirect(redirect_url)
+        
+        is_shared = workout.is_shared
+        if is_shared:
+            workout.is_shared = False
+        else:    
+            workout.is_shared = True 
+        workout.save()
+
+        # Return to workout:
+        return redirect(redirect_url)
 
 #profile
+@user_required
 def profile(request):
     """
     GET - View profile.
@@ -1135,16 +981,9 @@ def profile(request):
         Django HttpResponse object.
     """
 
-    try:
-        # Check for valid session:
-        return profile_online(request, request.session["user_id"])
-
-    except (KeyError, User.DoesNotExist) as err:
-        # If existing session not found:
-        messages.info(request, "You must be logged in to view this page.", extra_tags="invalid_session")
-        logging.warning("User must be logged in to view 'profile'.")
-        return redirect("/")
-    
+    return profile_online(request, request.current_user.id)
+
+@user_required
 def profile_online(request, id):
     """
     GET - View profile.
@@ -1159,36 +998,35 @@ def profile_online(request, id):
         Django HttpResponse object.
     """
 
-    try:
-        # Check for valid session:
-        user = User.objects.get(id=request.session["user_id"])
-        profile = User.objects.get(id=id)
-        workout = Workout.objects.filter(user__id=profile.id, is_shared=True).order_by('-updated_at')[:5]
-        exercise = []
-
-        for w in workout:
-            exercise.extend(StrengthTrainingExercise.objects.filter(workout__id=w.id))
-            exercise.extend(EnduranceTrainingExercise.objects.filter(workout__id=w.id))
-            exercise.extend(BalanceExercise.objects.filter(workout__id=w.id))
-            exercise.extend(FlexibilityExercise.objects.filter(workout__id=w.id))
-        
-        # Gather any page data:
-        data = {
-            'user': user,
-            'profile': profile,
-            'shared_workouts': workout,
-            'shared_exercises': sorted(exercise, key=lambda x: x.updated_at, reverse=True),
-        }
-
-        # If get request, load profile page with data:
-        return render(request, "workout/profile.html", data)
+    user = request.current_user
 
-    except (KeyError, User.DoesNotExist) as err:
-        # If existing session not found:
-        messages.info(request, "You must be logged in to view this page.", extra_tags="invalid_session")
-        logging.warning("User must be logged in to view 'profile'.")
-        return redirect("/")
+    # Own profile doesn't need another lookup:
+    if str(user.id) == str(id):
+        profile = user
+    else:
+        try:
+            profile = User.objects.get(id=id)
+        except User.DoesNotExist:
+            messages.error(request, "User does not exist.")
+            return redirect("/dashboard")
+    workout = list(Workout.objects.filter(user__id=profile.id, is_shared=True).order_by('-updated_at')[:5])
 
+    # Getting the exercises of all shared workouts at once, newest first:
+    index_rows = ExerciseIndex.objects.filter(workout__in=workout).order_by('-updated_at', '-id')
+    exercise = get_exercises(index_rows)
+    
+    # Gather any page data:
+    data = {
+        'user': user,
+        'profile': profile,
+        'shared_workouts': workout,
+        'shared_exercises': exercise,
+    }
+
+    # If get request, load profile page with data:
+    return render(request, "workout/profile.html", data)
+
+@user_required
 def edit_profile(request):
     """
     GET - load edit profile, POST - submit edit profile
@@ -1201,63 +1039,52 @@ def edit_profile(request):
     Returns:
         Django HttpResponse object.
     """
-    try:
-        # Check for valid session:
-        user = User.objects.get(id=request.session["user_id"])
+    user = request.current_user
+    
+    # Gather any page data:
+    data = {
+        'user': user,
+        'profile': user,
+    }
+
+    # If get request, load profile page with data:
+    if request.method == "GET":
+        logging.debug("GET request to edit profile")
+        # If get request, load edit workout page with data:
+        return render(request, "workout/edit_profile.html", data)
+    if request.method == "POST":
+        logging.debug("POST request to edit profile")
         
-        # Gather any page data:
-        data = {
-            'user': user,
-            'profile': user,
+        # check if 
+        profile = {
+            'user_id': user.id,
+            'old_username': user.username,
+            'old_email': user.email,
+            'username': request.POST['username'],
+            'email': request.POST['email'],
+            'profile_photo_url': request.POST['profile_photo_url'],
+            'background_photo_url': request.POST['background_photo_url'],
         }
-
-        # If get request, load profile page with data:
-        if request.method == "GET":
-            logging.debug("GET request to edit profile")
-            # If get request, load edit workout page with data:
-            return render(request, "workout/edit_profile.html", data)
-        if request.method == "POST":
-            logging.debug("POST request to edit profile")
-            
-            # check if 
-            profile = {
-                'user_id': user.id,
-                'old_username': user.username,
-                'old_email': user.email,
-                'username': request.POST['username'],
-                'email': request.POST['email'],
-                'profile_photo_url': request.POST['profile_photo_url'],
-                'background_photo_url': request.POST['background_photo_url'],
-            }
-            
-            # Begin validation of updated profile:
-            validated = User.objects.update(**profile)
-            # If errors, reload register page with errors:
-            
-            try:
-                if len(validated["errors"]) > 0:
-                    logging.error("Profile could not be edited.")
-                    print("Profile could not be edited.")
-                    # Loop through errors and Generate Django Message for each with custom level and tag:
-                    for error in validated["errors"]:
-                        messages.error(request, error, extra_tags='edit')
-                        logging.error(error)
-                    # Reload workout page:
-                    return redirect("/profile/edit")
-            except KeyError:
-                # If validation successful, load newly created workout page:
-                print("Edited profile passed validation and has been updated.")
-                # Load workout:
+        
+        # Begin validation of updated profile:
+        validated = User.objects.update(**profile)
+        # If errors, reload register page with errors:
+        
+        try:
+            if len(validated["errors"]) > 0:
+                logging.error("Profile could not be edited.")
+                # Loop through errors and Generate Django Message for each with custom level and tag:
+                for error in validated["errors"]:
+                    messages.error(request, error, extra_tags='edit')
+                    logging.error(error)
+                # Reload workout page:
                 return redirect("/profile/edit")
+        except KeyError:
+            # If validation successful, load newly created workout page:
+            # Load workout:
+            return redirect("/profile/edit")
 
-
-    except (KeyError, User.DoesNotExist) as err:
-        # If existing session not found:
-        messages.info(request, "You must be logged in to view this page.", extra_tags="invalid_session")
-        logging.warning("User must be logged in to view 'profile'.")
-        return redirect("/")
-
-
+@user_required
 def edit_profile_password(request):
     """
     GET - load edit profile password, POST - submit edit profile password
@@ -1270,60 +1097,50 @@ def edit_profile_password(request):
     Returns:
         Django HttpResponse object.
     """
-    try:
-        # Check for valid session:
-        user = User.objects.get(id=request.session["user_id"])
+    user = request.current_user
+    
+    # Gather any page data:
+    data = {
+        'profile': user,
+    }
+
+    # If get request, load profile page with data:
+    if request.method == "GET":
+        logging.error("GET request to edit profile password")
+        # If get request, load edit workout page with data:
+        return redirect("/profile/edit")
+    if request.method == "POST":
+        logging.debug("POST request to edit profile")
         
-        # Gather any page data:
-        data = {
-            'profile': user,
+        # check if 
+        profile = {
+            'user_id': user.id,
+            'old_password': user.password,
+            'current_password': request.POST['current_password'],
+            'new_password': request.POST['new_password'],
+            'repeat_password': request.POST['repeat_password'],
         }
-
-        # If get request, load profile page with data:
-        if request.method == "GET":
-            logging.error("GET request to edit profile password")
-            # If get request, load edit workout page with data:
-            return redirect("/profile/edit")
-        if request.method == "POST":
-            logging.debug("POST request to edit profile")
-            
-            # check if 
-            profile = {
-                'user_id': user.id,
-                'old_password': user.password,
-                'current_password': request.POST['current_password'],
-                'new_password': request.POST['new_password'],
-                'repeat_password': request.POST['repeat_password'],
-            }
-            
-            # Begin validation of updated profile:
-            validated = User.objects.update_password(**profile)
-            # If errors, reload register page with errors:
-            
-            try:
-                if len(validated["errors"]) > 0:
-                    logging.error("Profile password could not be edited.")
-                    print("Profile password could not be edited.")
-                    # Loop through errors and Generate Django Message for each with custom level and tag:
-                    for error in validated["errors"]:
-                        messages.error(request, error, extra_tags='edit password')
-                        logging.error(error)
-                    # Reload workout page:
-                    return redirect("/profile/edit")
-            except KeyError:
-                # If validation successful, load newly created workout page:
-                print("Edited profile password passed validation and has been updated.")
-                # Load workout:
+        
+        # Begin validation of updated profile:
+        validated = User.objects.update_password(**profile)
+        # If errors, reload register page with errors:
+        
+        try:
+            if len(validated["errors"]) > 0:
+                logging.error("Profile password could not be edited.")
+                # Loop through errors and Generate Django Message for each with custom level and tag:
+                for error in validated["errors"]:
+                    messages.error(request, error, extra_tags='edit password')
+                    logging.error(error)
+                # Reload workout page:
                 return redirect("/profile/edit")
-
-    except (KeyError, User.DoesNotExist) as err:
-        # If existing session not found:
-        messages.info(request, "You must be logged in to view this page.", extra_tags="invalid_session")
-        logging.warning("User must be logged in to view 'profile'.")
-        return redirect("/")
-
+        except KeyError:
+            # If validation successful, load newly created workout page:
+            # Load workout:
+            return redirect("/profile/edit")
 
 #statistics     
+@user_required
 def statistics(request):
     """
     GET - View statistics.
@@ -1331,8 +1148,8 @@ def statistics(request):
     Args:
         request: Django HttpRequest object.
         user: User object.
-        data_list: List of all exercises.
-        paginator: Paginator object.
+        statistics_rows: Ordered QuerySet of the user's exercise index rows.
+        paginator: ExerciseIndexPaginator object.
         data: Dictionary of page data.
         sort_field: Field to sort by.
         sort_direction: Direction to sort by.
@@ -1340,52 +1157,18 @@ def statistics(request):
     Returns:
         Django HttpResponse object.
     """
-    try:
-        user = User.objects.get(id=request.session["user_id"])
-        
-        now = timezone.now()
-        last_week = now - timedelta(weeks=1)
-        last_month = now - timedelta(days=30)
-
-        ste_list = StrengthTrainingExercise.objects.filter(user__id=user.id)
-        ete_list = EnduranceTrainingExercise.objects.filter(user__id=user.id)
-        be_list = BalanceExercise.objects.filter(user__id=user.id)
-        fe_list = FlexibilityExercise.objects.filter(user__id=user.id)
-
-        # Filtering data
-        ste_list_week = ste_list.filter(updated_at__gte=last_week)
-        ete_list_week = ete_list.filter(updated_at__gte=last_week)
-        be_list_week = be_list.filter(updated_at__gte=last_week)
-        fe_list_week = fe_list.filter(updated_at__gte=last_week)
-
-        ste_list_month = ste_list.filter(updated_at__gte=last_month)
-        ete_list_month = ete_list.filter(updated_at__gte=last_month)
-        be_list_month = be_list.filter(updated_at__gte=last_month)
-        fe_list_month = fe_list.filter(updated_at__gte=last_month)
-        
-        sort_field = request.GET.get('sort', 'updated_at')
-        sort_direction = request.GET.get('direction', 'desc')
-
-        data_list = list(chain(ste_list, ete_list, be_list, fe_list))
-
-        # Add workout name attribute for sorting
-        for item in data_list:
-            item.workout_name = item.workout.name if hasattr(item, 'workout') else ''
-
-        def get_sort_key(item):
-            if sort_field == 'muscle_group':
-                return item.muscle_group.name if hasattr(item, 'muscle_group') and item.muscle_group else ''
-            if sort_field == 'workout_name':
-                return item.workout_name
-            value = getattr(item, sort_field, '')
-            if callable(value):
-                value = value()
-            return value
+    user = request.current_user
+    
+    sort_field = request.GET.get('sort', 'updated_at')
+    sort_direction = request.GET.get('direction', 'desc')
+    page = request.GET.get('page', 1)
 
-        sorted_data_list = sorted(data_list, key=get_sort_key, reverse=(sort_direction == 'desc'))
-        paginator = Paginator(sorted_data_list, 12)
+    def get_context():
+        # Sorting and pagination happen in the database; only the page's exercises are loaded,
+        # together with their workout and muscle group:
+        statistics_rows = get_statistics_rows(user.id, sort_field, sort_direction)
+        paginator = ExerciseIndexPaginator(statistics_rows, 12, select_related=('workout', 'muscle_group'))
 
-        page = request.GET.get('page', 1)
         try:
             data = paginator.page(page)
         except PageNotAnInteger:
@@ -1393,67 +1176,25 @@ def statistics(request):
         except EmptyPage:
             data = paginator.page(paginator.num_pages)
 
-        ste_counts = ste_list.count()
-        ete_counts = ete_list.count()
-        be_counts = be_list.count()
-        fe_counts = fe_list.count()
-        
-        ste_counts_week = ste_list_week.count()
-        ete_counts_week = ete_list_week.count()
-        be_counts_week = be_list_week.count()
-        fe_counts_week = fe_list_week.count()
-        
-        ste_counts_month = ste_list_month.count()
-        ete_counts_month = ete_list_month.count()
-        be_counts_month = be_list_month.count()
-        fe_counts_month = fe_list_month.count()
-
-        muscle_groups = MuscleGroup.objects.all()
-        muscle_counts = {mg.name: 0 for mg in muscle_groups}
-        muscle_counts_week = {mg.name: 0 for mg in muscle_groups}
-        muscle_counts_month = {mg.name: 0 for mg in muscle_groups}
-
-        for mg in muscle_groups:
-            muscle_counts[mg.name] += ste_list.filter(muscle_group=mg).count()
-            muscle_counts[mg.name] += ete_list.filter(muscle_group=mg).count()
-            muscle_counts[mg.name] += be_list.filter(muscle_group=mg).count()
-            muscle_counts[mg.name] += fe_list.filter(muscle_group=mg).count()
-
-            muscle_counts_week[mg.name] += ste_list_week.filter(muscle_group=mg).count()
-            muscle_counts_week[mg.name] += ete_list_week.filter(muscle_group=mg).count()
-            muscle_counts_week[mg.name] += be_list_week.filter(muscle_group=mg).count()
-            muscle_counts_week[mg.name] += fe_list_week.filter(muscle_group=mg).count()
-
-            muscle_counts_month[mg.name] += ste_list_month.filter(muscle_group=mg).count()
-            muscle_counts_month[mg.name] += ete_list_month.filter(muscle_group=mg).count()
-            muscle_counts_month[mg.name] += be_list_month.filter(muscle_group=mg).count()
-            muscle_counts_month[mg.name] += fe_list_month.filter(muscle_group=mg).count()
-
-        chart_data = {
-            'workout_labels': ['Strength', 'Endurance', 'Balance', 'Flexibility'],
-            'workout_data': [ste_counts, ete_counts, be_counts, fe_counts],
-            'workout_data_week': [ste_counts_week, ete_counts_week, be_counts_week, fe_counts_week],
-            'workout_data_month': [ste_counts_month, ete_counts_month, be_counts_month, fe_counts_month],
-            'muscle_labels': list(muscle_counts.keys()),
-            'muscle_data': list(muscle_counts.values()),
-            'muscle_data_week': list(muscle_counts_week.values()),
-            'muscle_data_month': list(muscle_counts_month.values())
-        }
+        # Add workout name attribute for the table:
+        for item in data:
+            item.workout_name = item.workout.name
 
-        data = {
-            'user': user,
-            'data': data,
-            'chart_data': chart_data,
-            'sort_field': sort_field,
-            'sort_direction': sort_direction,
+        return {
+            'data': freeze_page(data),
+            # Per-type and per-muscle-group counts, read from the daily statistics rollup:
+            'chart_data': get_chart_data(user.id),
         }
 
-        return render(request, "workout/statistics.html", data)
+    # The week and month charts move with the day:
+    data = {
+        'user': user,
+        **page_cache.get_or_set(user.id, "statistics", get_context, sort_field, sort_direction, page, timezone.localdate()),
+        'sort_field': sort_field,
+        'sort_direction': sort_direction,
+    }
 
-    except (KeyError, User.DoesNotExist) as err:
-        messages.info(request, "You must be logged in to view this page.", extra_tags="invalid_session")
-        logging.warning("User must be logged in to view 'view_all'.")
-        return redirect("/")
+    return render(request, "workout/statistics.html", data)
 
 #other    
 def redirect_to_dashboard(request):
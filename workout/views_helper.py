@@ -1,3 +1,10 @@
+import logging
+from collections import defaultdict
+from functools import wraps
+from django.contrib import messages
+from django.core.paginator import Page, Paginator
+from django.shortcuts import redirect
+from django.db.models import Case, CharField, F, OuterRef, Prefetch, Subquery, Value, When
 from .models import *
 
 def get_exercises_types():
@@ -7,7 +14,7 @@ def get_exercises_types():
         BalanceExercise,
         FlexibilityExercise,
     ]
-    
+
 def get_exercise_by_class_name(class_name):
     for exercise_type in get_exercises_types():
         if exercise_type.__name__ == class_name:
@@ -19,4 +26,192 @@ def get_view_by_class_name(class_name):
     for exercise_type in get_exercises_types():
         if exercise_type.__name__ == class_name:
             return exercise_type.__name__.lower()
-    return None
\ No newline at end of file
+    return None
+
+def user_required(view):
+    """
+    Decorator for views of logged in users.
+
+    `SessionUserMiddleware` resolves the session user into `request.current_user`; if there's none,
+    the user is sent back to the login page instead of calling the view.
+    """
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if getattr(request, 'current_user', None) is None:
+            messages.info(request, "You must be logged in to view this page.", extra_tags="invalid_session")
+            logging.warning("User must be logged in to view '%s'." % view.__name__)
+            return redirect("/")
+        return view(request, *args, **kwargs)
+    return wrapper
+
+def get_history_rows(user_id):
+    """
+    Builds a single `UNION ALL` query over the user's workouts and exercise index rows.
+
+    Every branch only selects `(id, updated_at, kind)`, so the database does the merge, the
+    ordering and the LIMIT/OFFSET of a page; no model instances are created here.
+    """
+    workouts = (
+        Workout.objects.filter(user__id=user_id)
+        .order_by()
+        .annotate(kind=Value(Workout.__name__, output_field=CharField()))
+        .values('id', 'updated_at', 'kind')
+    )
+    exercises = (
+        ExerciseIndex.objects.filter(user__id=user_id)
+        .order_by()
+        .values('exercise_id', 'updated_at', 'exercise_type')
+    )
+    return workouts.union(exercises, all=True).order_by('-updated_at', '-id')
+
+def hydrate_history_rows(rows):
+    """
+    Turns `(id, updated_at, kind)` rows back into model instances, keeping their order.
+
+    Issues at most one `in_bulk` query per model present in `rows`.
+    """
+    rows = list(rows)
+    ids_by_kind = defaultdict(list)
+    for row in rows:
+        ids_by_kind[row['kind']].append(row['id'])
+
+    models = {model.__name__: model for model in [Workout] + get_exercises_types()}
+    instances = {
+        kind: models[kind].objects.in_bulk(ids)
+        for kind, ids in ids_by_kind.items()
+    }
+    # Rows deleted between the page query and the lookup above are simply skipped:
+    return [instances[row['kind']][row['id']] for row in rows if row['id'] in instances[row['kind']]]
+
+class HistoryPaginator(Paginator):
+    """`Paginator` over `get_history_rows()` which only hydrates the rows of the requested page."""
+
+    def _get_page(self, object_list, number, paginator):
+        return super()._get_page(hydrate_history_rows(object_list), number, paginator)
+
+def freeze_page(page):
+    """
+    Returns a copy of a `Page` which can be cached: its objects in a list, and a paginator over a
+    `range` of the same length in place of the query, which pickling would run in full.
+    """
+    paginator = page.paginator
+    frozen_paginator = Paginator(range(paginator.count), paginator.per_page, paginator.orphans, paginator.allow_empty_first_page)
+    return Page(list(page.object_list), page.number, frozen_paginator)
+
+def get_exercises(index_rows, select_related=()):
+    """
+    Loads the typed exercises behind `ExerciseIndex` rows, in the order of the rows.
+
+    Args:
+        index_rows: Filtered and ordered `ExerciseIndex` QuerySet (or list of rows).
+        select_related: Relations of the typed exercises the page displays.
+
+    Returns:
+        List of exercise instances.
+    """
+    return ExerciseIndex.objects.hydrate(index_rows, select_related=select_related)
+
+class ExerciseIndexPaginator(Paginator):
+    """`Paginator` over an `ExerciseIndex` QuerySet which only loads the typed exercises of the requested page."""
+
+    def __init__(self, object_list, per_page, select_related=(), **kwargs):
+        self.select_related = select_related
+        super().__init__(object_list, per_page, **kwargs)
+
+    def _get_page(self, object_list, number, paginator):
+        return super()._get_page(get_exercises(object_list, select_related=self.select_related), number, paginator)
+
+# Sort fields of the statistics table shared by all exercise types, mapped to `ExerciseIndex` lookups:
+STATISTICS_SORT_FIELDS = {
+    'updated_at': 'updated_at',
+    'name': 'name',
+    'class_name': 'exercise_type',
+    'muscle_group': 'muscle_group__name',
+    'workout_name': 'workout__name',
+}
+
+def get_statistics_sort_expression(sort_field):
+    """
+    Returns the `ExerciseIndex` ordering expression for a statistics sort field.
+
+    Type-specific fields (e.g. `weight`) are read from their exercise table with a correlated
+    subquery; rows of other exercise types sort as NULL. Unknown fields sort by `updated_at`.
+    """
+    if sort_field in STATISTICS_SORT_FIELDS:
+        return F(STATISTICS_SORT_FIELDS[sort_field])
+
+    shared_fields = ['id'] + [field.name for field in Exercise._meta.fields]
+    for exercise_type in get_exercises_types():
+        type_fields = [field.name for field in exercise_type._meta.fields if field.name not in shared_fields]
+        if sort_field in type_fields:
+            value = exercise_type.objects.filter(id=OuterRef('exercise_id')).values(sort_field)[:1]
+            return Case(
+                When(exercise_type=exercise_type.__name__, then=Subquery(value)),
+                default=None,
+                output_field=exercise_type._meta.get_field(sort_field),
+            )
+
+    return F('updated_at')
+
+def get_statistics_rows(user_id, sort_field, sort_direction):
+    """
+    Builds the ordered `ExerciseIndex` QuerySet of the statistics table.
+
+    Args:
+        user_id: Id of the user whose exercises are listed.
+        sort_field: One of `STATISTICS_SORT_FIELDS` or a type-specific exercise field.
+        sort_direction: `asc` or `desc`.
+
+    Returns:
+        QuerySet of `ExerciseIndex` rows, ordered by the database.
+    """
+    expression = get_statistics_sort_expression(sort_field)
+    if sort_direction == 'desc':
+        ordering = [expression.desc(), F('id').desc()]
+    else:
+        ordering = [expression.asc(), F('id').asc()]
+    return ExerciseIndex.objects.filter(user__id=user_id).order_by(*ordering)
+
+def load_workout(request, workout_id):
+    """
+    Loads a workout with its exercises and their muscle groups, memoized for the current request.
+
+    Uses the `related_name='%(class)s'` reverse relations, so it always costs one query for the
+    workout (and its challenge) plus one prefetch query per exercise type; repeated calls with the
+    same id during the request cost nothing.
+
+    Args:
+        request: Django HttpRequest object, used to memoize the result.
+        workout_id: Id of the workout to load.
+
+    Returns:
+        Workout object with two extra attributes:
+        - `exercises_by_type`: exercises grouped by type, then by name, muscle group and id.
+          `UserChallenge.exercise_status` is stored positionally in this order, so it must not change.
+        - `exercises`: the same exercises, newest first.
+
+    Raises:
+        Workout.DoesNotExist: If there's no such workout.
+    """
+    loaded_workouts = request.__dict__.setdefault('_loaded_workouts', {})
+    workout_id = int(workout_id)
+
+    if workout_id not in loaded_workouts:
+        prefetches = [
+            Prefetch(
+                exercise_type.__name__.lower(),
+                queryset=exercise_type.objects.select_related('muscle_group').order_by('name', 'muscle_group_id', 'id'),
+            )
+            for exercise_type in get_exercises_types()
+        ]
+        workout = Workout.objects.select_related('challenge').prefetch_related(*prefetches).get(id=workout_id)
+
+        workout.exercises_by_type = [
+            exercise
+            for exercise_type in get_exercises_types()
+            for exercise in getattr(workout, exercise_type.__name__.lower()).all()
+        ]
+        workout.exercises = sorted(workout.exercises_by_type, key=lambda x: (x.updated_at, x.id), reverse=True)
+        loaded_workouts[workout_id] = workout
+
+    return loaded_workouts[workout_id]
@@ -0,0 +1,40 @@
+"""
+health.py
+
+Health checks of persistent connections (`CONN_MAX_AGE` > 0), as `CONN_HEALTH_CHECKS` does from Django 4.1.
+
+A connection kept from a previous request may have been closed by the server in between, and
+Django 4.0 only notices when a query fails. With `CONN_HEALTH_CHECKS`, the first query of every
+request checks the connection first and reconnects if it's unusable. Connections opened during
+the request aren't checked.
+"""
+
+
+class HealthCheckMixin:
+    """Mixin for `DatabaseWrapper`s of backends whose connections can break while they're idle."""
+
+    health_check_done = False
+
+    @property
+    def health_check_enabled(self):
+        return bool(self.settings_dict.get("CONN_HEALTH_CHECKS")) and self.settings_dict["CONN_MAX_AGE"] != 0
+
+    def connect(self):
+        super().connect()
+        self.health_check_done = True
+
+    def close_if_health_check_failed(self):
+        if self.connection is None or not self.health_check_enabled or self.health_check_done:
+            return
+        if not self.is_usable():
+            self.close()
+        self.health_check_done = True
+
+    def _cursor(self, name=None):
+        self.close_if_health_check_failed()
+        return super()._cursor(name)
+
+    def close_if_unusable_or_obsolete(self):
+        # Called at the start and end of every request (see `django.db.close_old_connections`):
+        self.health_check_done = False
+        super().close_if_unusable_or_obsolete()
@@ -0,0 +1,103 @@
+"""
+pool.py
+
+Thread-safe pool of DB-API connections, used by the pooled PostgreSQL backend (see `postgresql/base.py`).
+
+At most `max_size` connections are open at a time; `get()` waits up to `timeout` seconds for one to
+be returned when they're all in use, instead of failing at once like `psycopg2.pool`. The most
+recently returned connection is handed out first. Connections idle for longer than `check_after`
+seconds are checked with `is_usable` before they're handed out, and closed if they're broken or
+were idle for longer than `max_idle` seconds, e.g. when the server or a firewall dropped them.
+"""
+
+import threading
+import time
+
+
+class PoolTimeout(Exception):
+    pass
+
+
+class ConnectionPool:
+
+    def __init__(self, connect, max_size=10, timeout=10, max_idle=300, check_after=1, is_usable=None):
+        """
+        Args:
+            connect: Callable opening a new connection.
+            is_usable: Predicate on an idle connection, e.g. running `SELECT 1`; connections are always usable without it.
+        """
+        self.connect = connect
+        self.max_size = max_size
+        self.timeout = timeout
+        self.max_idle = max_idle
+        self.check_after = check_after
+        self.is_usable = is_usable
+        self.opened = self.reused = self.discarded = 0
+        # `[(connection, returned at)]`, most recently returned last:
+        self._idle = []
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max_size)
+
+    def get(self):
+        """
+        Returns an idle connection, or a new one.
+
+        Raises:
+            PoolTimeout: All `max_size` connections stayed in use for `timeout` seconds.
+        """
+        if not self._slots.acquire(timeout=self.timeout):
+            raise PoolTimeout("No database connection was returned to the pool in %s seconds (%d in use)." % (self.timeout, self.max_size))
+        try:
+            while True:
+                with self._lock:
+                    if not self._idle:
+                        break
+                    connection, returned_at = self._idle.pop()
+                idle = time.monotonic() - returned_at
+                if idle > self.max_idle or (idle > self.check_after and self.is_usable is not None and not self.is_usable(connection)):
+                    self._close(connection)
+                    continue
+                with self._lock:
+                    self.reused += 1
+                return connection
+            connection = self.connect()
+            with self._lock:
+                self.opened += 1
+            return connection
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def put(self, connection, discard=False):
+        """Returns a connection got from `get()`, which must not be in a transaction; it's closed instead with `discard`."""
+        try:
+            if discard:
+                self._close(connection)
+            else:
+                with self._lock:
+                    self._idle.append((connection, time.monotonic()))
+        finally:
+            self._slots.release()
+
+    def _close(self, connection):
+        with self._lock:
+            self.discarded += 1
+        try:
+            connection.close()
+        except Exception:
+            # Already broken:
+            pass
+
+    def close(self):
+        """Closes the idle connections; the ones in use are closed when they're returned with `discard`."""
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for connection, _ in idle:
+            try:
+                connection.close()
+            except Exception:
+                pass
+
+    def get_stats(self):
+        with self._lock:
+            return {"idle": len(self._idle), "opened": self.opened, "reused": self.reused, "discarded": self.discarded}
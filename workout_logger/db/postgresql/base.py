@@ -0,0 +1,105 @@
+"""
+base.py
+
+PostgreSQL backend sharing the connections of a process through a `ConnectionPool`, selected
+by `settings.py` when `DATABASE_URL` is a PostgreSQL URL.
+
+Django opens a connection per thread; this backend takes it from the pool instead, and returns it
+when Django closes it: at the end of every request with `CONN_MAX_AGE = 0`, or once it's older
+than `CONN_MAX_AGE`. The threads of a worker then share at most `POOL["MAX_SIZE"]` server
+connections, and requests don't pay for opening one. The pool of a database is made on first
+use in every process, so gunicorn workers forked from a preloaded app don't share connections.
+"""
+
+import os
+import threading
+
+from django.db.backends.postgresql import base
+from psycopg2 import extensions, extras
+
+from ..health import HealthCheckMixin
+from ..pool import ConnectionPool, PoolTimeout
+
+Database = base.Database
+
+DEFAULT_POOL_OPTIONS = {"MAX_SIZE": 10, "TIMEOUT": 10, "MAX_IDLE": 300, "CHECK_AFTER": 1}
+
+# `{(process id, connection parameters): pool}`:
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def is_usable(connection):
+    """Pings an idle psycopg2 connection."""
+    if connection.closed:
+        return False
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1")
+    except Database.Error:
+        return False
+    return True
+
+
+def get_pool(conn_params, options):
+    key = (os.getpid(), repr(sorted(conn_params.items())))
+    with _pools_lock:
+        if key not in _pools:
+            options = dict(DEFAULT_POOL_OPTIONS, **options)
+            _pools[key] = ConnectionPool(
+                lambda: Database.connect(**conn_params),
+                max_size=options["MAX_SIZE"],
+                timeout=options["TIMEOUT"],
+                max_idle=options["MAX_IDLE"],
+                check_after=options["CHECK_AFTER"],
+                is_usable=is_usable,
+            )
+        return _pools[key]
+
+
+def close_pools():
+    """Closes the idle connections of every pool of this process."""
+    with _pools_lock:
+        pools = [pool for (pid, _), pool in _pools.items() if pid == os.getpid()]
+    for pool in pools:
+        pool.close()
+
+
+class DatabaseWrapper(HealthCheckMixin, base.DatabaseWrapper):
+    pool = None
+
+    def get_new_connection(self, conn_params):
+        self.pool = get_pool(conn_params, self.settings_dict.get("POOL", {}))
+        try:
+            connection = self.pool.get()
+        except PoolTimeout as error:
+            # Raised as `django.db.OperationalError` by `wrap_database_errors`:
+            raise Database.OperationalError(str(error)) from error
+
+        # As `base.DatabaseWrapper.get_new_connection()` does for a new connection:
+        options = self.settings_dict["OPTIONS"]
+        try:
+            self.isolation_level = options["isolation_level"]
+        except KeyError:
+            self.isolation_level = connection.isolation_level
+        else:
+            if self.isolation_level != connection.isolation_level:
+                connection.set_session(isolation_level=self.isolation_level)
+        extras.register_default_jsonb(conn_or_curs=connection, loads=lambda x: x)
+        return connection
+
+    def _close(self):
+        if self.connection is None:
+            return
+        if self.pool is None:
+            return super()._close()
+        with self.wrap_database_errors:
+            # A connection closed in an atomic block is kept by Django until the block exits, so it
+            # can't be handed to another thread; neither can a broken one:
+            discard = self.in_atomic_block or self.connection.closed or self.connection.get_transaction_status() == extensions.TRANSACTION_STATUS_UNKNOWN
+            try:
+                if not discard and self.connection.get_transaction_status() != extensions.TRANSACTION_STATUS_IDLE:
+                    self.connection.rollback()
+            except Database.Error:
+                discard = True
+            self.pool.put(self.connection, discard=discard)
@@ -0,0 +1,95 @@
+"""
+logs.py
+
+Logging handlers used by `settings.LOGGING`.
+
+Records are formatted on the calling thread and put on a queue by `QueuedFileHandler`; a
+`QueueListener` thread writes them to `<LOG_DIR>/workout_<date>.log` through `DailyFileHandler`,
+so requests never wait for file I/O. The file name follows the date, so long-running workers
+switch to a new file at midnight instead of writing to the day they were started on.
+"""
+
+import atexit
+import glob
+import os
+import queue
+import time
+from logging.handlers import QueueHandler, QueueListener, TimedRotatingFileHandler
+
+
+class DailyFileHandler(TimedRotatingFileHandler):
+    """
+    Writes to `<directory>/<prefix>_<YYYY-MM-DD>.log`, switching to the next day's file at midnight.
+
+    Keeps the `backup_count` most recent files besides the current one, all of them if 0.
+    """
+
+    def __init__(self, directory, prefix="workout", backup_count=0, encoding="utf-8"):
+        self.directory = directory
+        self.prefix = prefix
+        os.makedirs(directory, exist_ok=True)
+        super().__init__(self.get_filename(time.time()), when="midnight", backupCount=backup_count, encoding=encoding, delay=True)
+
+    def get_filename(self, timestamp):
+        return os.path.join(self.directory, "%s_%s.log" % (self.prefix, time.strftime("%Y-%m-%d", time.localtime(timestamp))))
+
+    def set_directory(self, directory):
+        """Writes the next records to `directory`, e.g. a temporary one in tests."""
+        self.acquire()
+        try:
+            if self.stream:
+                self.stream.close()
+                self.stream = None
+            os.makedirs(directory, exist_ok=True)
+            self.directory = directory
+            self.baseFilename = os.path.abspath(self.get_filename(time.time()))
+        finally:
+            self.release()
+
+    def doRollover(self):
+        if self.stream:
+            self.stream.close()
+            self.stream = None
+        now = int(time.time())
+        self.baseFilename = os.path.abspath(self.get_filename(now))
+        self.rolloverAt = self.computeRollover(now)
+        if self.backupCount > 0:
+            # Date-named files sort chronologically:
+            files = sorted(
+                path for path in glob.glob(os.path.join(os.path.abspath(self.directory), "%s_*.log" % self.prefix))
+                if path != self.baseFilename
+            )
+            for path in files[:-self.backupCount]:
+                os.remove(path)
+
+
+class QueuedFileHandler(QueueHandler):
+    """
+    Puts formatted records on a queue, written to daily files by a background `QueueListener`.
+
+    Args:
+        directory: Directory of the log files.
+        prefix: Start of the log file names.
+        backup_count: Days of log files to keep, all if 0.
+        max_queued: Records held while the listener catches up; further ones are dropped rather than blocking.
+    """
+
+    def __init__(self, directory, prefix="workout", backup_count=0, max_queued=10000):
+        super().__init__(queue.Queue(max_queued))
+        self.file_handler = DailyFileHandler(directory, prefix, backup_count)
+        self.listener = QueueListener(self.queue, self.file_handler)
+        self.listener.start()
+        atexit.register(self.close)
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            pass
+
+    def close(self):
+        # Writes out the queued records before the process exits:
+        if self.listener._thread is not None:
+            self.listener.stop()
+        self.file_handler.close()
+        super().close()
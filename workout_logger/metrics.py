@@ -0,0 +1,190 @@
+"""
+metrics.py
+
+Request metrics (see `middleware.MetricsMiddleware`), kept in-process and rendered in the
+Prometheus text format by the `/metrics` view.
+
+With several worker processes (e.g. gunicorn), set `METRICS_DIR`: every process then writes its
+counters to `<METRICS_DIR>/metrics_<pid>.json` at most every `METRICS_FLUSH_INTERVAL` seconds, and
+`/metrics` adds up the files of all processes. Empty the directory when the server starts.
+"""
+
+import glob
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+
+from workout.passwords import get_metrics as get_password_hashing_metrics
+
+# Upper bounds of the histogram buckets, `+Inf` is implied:
+LATENCY_BUCKETS = [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10]
+SIZE_BUCKETS = [1024, 4096, 16384, 65536, 262144, 1048576]
+QUERY_BUCKETS = [0, 1, 2, 5, 10, 20, 50, 100]
+
+METRIC_HELP = {
+    "workout_http_requests_total": ("counter", "HTTP responses by view, method and status code."),
+    "workout_http_request_duration_seconds": ("histogram", "Time to produce a response, by view."),
+    "workout_http_response_size_bytes": ("histogram", "Size of response bodies, by view."),
+    "workout_db_queries_per_request": ("histogram", "SQL queries run by one request, by view."),
+    "workout_db_query_duration_seconds_total": ("counter", "Time spent in SQL, by view."),
+    "workout_page_cache_requests_total": ("counter", "Page cache lookups by view and result (hit or miss), see workout/page_cache.py."),
+    "workout_password_hashing": ("gauge", "State of the bcrypt pool of the answering process, see workout/passwords.py."),
+}
+
+
+class MetricsRegistry:
+    """Thread-safe counters and histograms, keyed by metric name and a tuple of label pairs."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters = defaultdict(float)
+        # {key: [count per bucket..., count in +Inf, sum]}:
+        self.histograms = {}
+        self._flushed_at = 0
+
+    def inc(self, name, labels, value=1):
+        with self._lock:
+            self.counters[(name, labels)] += value
+
+    def observe(self, name, labels, value, buckets):
+        with self._lock:
+            histogram = self.histograms.get((name, labels))
+            if histogram is None:
+                histogram = self.histograms[(name, labels)] = [0] * (len(buckets) + 2)
+            for i, bound in enumerate(buckets):
+                if value <= bound:
+                    histogram[i] += 1
+                    break
+            else:
+                histogram[len(buckets)] += 1
+            histogram[-1] += value
+
+    def snapshot(self):
+        """Returns the metrics as a JSON-serializable dictionary."""
+        with self._lock:
+            return {
+                "counters": [[name, list(labels), value] for (name, labels), value in self.counters.items()],
+                "histograms": [[name, list(labels), list(values)] for (name, labels), values in self.histograms.items()],
+            }
+
+    def flush(self, force=False):
+        """Writes this process's snapshot to `METRICS_DIR`, at most every `METRICS_FLUSH_INTERVAL` seconds."""
+        directory = getattr(settings, "METRICS_DIR", None)
+        if not directory:
+            return
+        now = time.monotonic()
+        if not force and now - self._flushed_at < getattr(settings, "METRICS_FLUSH_INTERVAL", 5):
+            return
+        self._flushed_at = now
+
+        os.makedirs(directory, exist_ok=True)
+        # Written to a temporary file first, so readers never see half a file:
+        descriptor, path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        with os.fdopen(descriptor, "w") as file:
+            json.dump(self.snapshot(), file)
+        os.replace(path, os.path.join(directory, "metrics_%d.json" % os.getpid()))
+
+
+registry = MetricsRegistry()
+
+
+def collect():
+    """
+    Returns the metrics of all processes, merged into one snapshot.
+
+    Only this process's metrics without `METRICS_DIR`.
+    """
+    directory = getattr(settings, "METRICS_DIR", None)
+    if not directory:
+        return registry.snapshot()
+
+    registry.flush(force=True)
+    counters = defaultdict(float)
+    histograms = {}
+    for path in glob.glob(os.path.join(directory, "metrics_*.json")):
+        try:
+            with open(path) as file:
+                snapshot = json.load(file)
+        except (OSError, ValueError):
+            # Replaced or removed while we were reading it:
+            continue
+        for name, labels, value in snapshot["counters"]:
+            counters[(name, tuple(map(tuple, labels)))] += value
+        for name, labels, values in snapshot["histograms"]:
+            key = (name, tuple(map(tuple, labels)))
+            if key in histograms:
+                histograms[key] = [a + b for a, b in zip(histograms[key], values)]
+            else:
+                histograms[key] = values
+    return {
+        "counters": [[name, list(labels), value] for (name, labels), value in counters.items()],
+        "histograms": [[name, list(labels), values] for (name, labels), values in histograms.items()],
+    }
+
+
+def format_labels(labels):
+    return "{%s}" % ",".join('%s="%s"' % (key, str(value).replace("\\", "\\\\").replace('"', '\\"')) for key, value in labels)
+
+
+def format_number(value):
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else "%d" % value
+
+
+def render(snapshot, gauges=()):
+    """
+    Renders a snapshot in the Prometheus text exposition format.
+
+    Args:
+        snapshot: Output of `collect()`.
+        gauges: Extra `(name, labels, value)` samples of this process.
+    """
+    samples = defaultdict(list)
+    for name, labels, value in sorted(snapshot["counters"]):
+        samples[name].append("%s%s %s" % (name, format_labels(labels), format_number(value)))
+    for name, labels, values in sorted(snapshot["histograms"], key=lambda histogram: histogram[:2]):
+        buckets = {
+            "workout_http_request_duration_seconds": LATENCY_BUCKETS,
+            "workout_http_response_size_bytes": SIZE_BUCKETS,
+            "workout_db_queries_per_request": QUERY_BUCKETS,
+        }[name]
+        cumulative = 0
+        for bound, count in zip(buckets + ["+Inf"], values[:-1]):
+            cumulative += count
+            samples[name].append("%s_bucket%s %d" % (name, format_labels(list(labels) + [("le", bound)]), cumulative))
+        samples[name].append("%s_sum%s %s" % (name, format_labels(labels), format_number(values[-1])))
+        samples[name].append("%s_count%s %d" % (name, format_labels(labels), cumulative))
+    for name, labels, value in gauges:
+        samples[name].append("%s%s %s" % (name, format_labels(labels), format_number(value)))
+
+    lines = []
+    for name in sorted(samples):
+        kind, help = METRIC_HELP[name]
+        lines.append("# HELP %s %s" % (name, help))
+        lines.append("# TYPE %s %s" % (name, kind))
+        lines.extend(samples[name])
+    return "\n".join(lines) + "\n"
+
+
+def get_password_hashing_gauges():
+    return [
+        ("workout_password_hashing", [("pid", os.getpid()), ("stat", key)], value)
+        for key, value in sorted(get_password_hashing_metrics().items())
+    ]
+
+
+def metrics_view(request):
+    """
+    GET - Metrics of all workers in the Prometheus text format.
+
+    Only served to `METRICS_ALLOWED_ADDRESSES` (local clients by default), or to everyone if it contains `*`.
+    """
+    allowed = getattr(settings, "METRICS_ALLOWED_ADDRESSES", ["127.0.0.1", "::1"])
+    if "*" not in allowed and request.META.get("REMOTE_ADDR") not in allowed:
+        return HttpResponseForbidden()
+    return HttpResponse(render(collect(), get_password_hashing_gauges()), content_type="text/plain; version=0.0.4; charset=utf-8")
@@ -1,5 +1,19 @@
+import logging
+import random
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
 from django.http import HttpResponseForbidden
 
+from workout import replicas, request_log, slow_queries
+from workout.models import User
+
+from . import metrics, profiling
+from .nplusone import detect_n_plus_one
+
 class BlockStaticFilesMiddleware:
     """ Middleware to block access to static files """
     
@@ -7,8 +21,140 @@ class BlockStaticFilesMiddleware:
         self.get_response = get_response
 
     def __call__(self, request):
-        print(request.path)
         if request.path.endswith(('.jpg', '.png', '.gif')) or request.path.startswith('/static/'):
             return redirect("/dashboard")
         response = self.get_response(request)
         return response
+
+class SessionUserMiddleware:
+    """ Middleware resolving the logged in `User` once per request into `request.current_user` """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        # `None` when nobody is logged in, or the session's user no longer exists:
+        request.current_user = None
+        if "user_id" in request.session:
+            request.current_user = User.objects.get_session_user(request.session["user_id"])
+        return self.get_response(request)
+
+class ReplicaMiddleware:
+    """ Middleware sending the reads of `REPLICA_VIEWS` to the replica database, see `workout/replicas.py`; left out of the chain without a replica """
+
+    def __init__(self, get_response):
+        if not replicas.is_configured():
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with replicas.reading_from(None):
+            response = self.get_response(request)
+        if request.method not in replicas.SAFE_METHODS:
+            replicas.pin_to_primary(response)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        # Middleware above the view still reads from the primary:
+        if replicas.should_read_replica(request, request.resolver_match.view_name):
+            replicas.set_read_alias(replicas.get_replica_alias())
+
+class ProfilingMiddleware:
+    """ Middleware profiling requests that ask for it or are sampled, see `profiling.py`; left out of the chain unless `PROFILING_ENABLED` """
+
+    def __init__(self, get_response):
+        if not getattr(settings, "PROFILING_ENABLED", False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.header = "HTTP_" + getattr(settings, "PROFILING_HEADER", "X-Profile").upper().replace("-", "_")
+        self.query_param = getattr(settings, "PROFILING_QUERY_PARAM", "profile")
+        self.sample_rate = getattr(settings, "PROFILING_SAMPLE_RATE", 0)
+
+    def __call__(self, request):
+        if self.should_profile(request):
+            return profiling.profile_request(request, self.get_response)
+        return self.get_response(request)
+
+    def should_profile(self, request):
+        token = request.META.get(self.header)
+        if token is not None:
+            return profiling.is_valid_token(token)
+        if self.query_param in request.GET:
+            # Staff users of the Django admin, not users of the app:
+            return request.user.is_staff
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+class MetricsMiddleware:
+    """ Middleware recording latency, SQL queries, response size and status of every request, see `metrics.py` """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        sql = {"queries": 0, "seconds": 0.0}
+
+        def count_query(execute, sql_text, params, many, context):
+            started_at = time.perf_counter()
+            try:
+                return execute(sql_text, params, many, context)
+            finally:
+                sql["queries"] += 1
+                sql["seconds"] += time.perf_counter() - started_at
+
+        started_at = time.perf_counter()
+        with ExitStack() as stack:
+            for alias in connections:
+                stack.enter_context(connections[alias].execute_wrapper(count_query))
+            response = self.get_response(request)
+        duration = time.perf_counter() - started_at
+
+        # Labelled by view rather than path, so ids in URLs don't multiply the series:
+        match = request.resolver_match
+        view = match.view_name if match else "unmatched"
+        metrics.registry.inc("workout_http_requests_total", (("view", view), ("method", request.method), ("status", response.status_code)))
+        metrics.registry.observe("workout_http_request_duration_seconds", (("view", view),), duration, metrics.LATENCY_BUCKETS)
+        metrics.registry.observe("workout_db_queries_per_request", (("view", view),), sql["queries"], metrics.QUERY_BUCKETS)
+        metrics.registry.inc("workout_db_query_duration_seconds_total", (("view", view),), sql["seconds"])
+        if not response.streaming:
+            metrics.registry.observe("workout_http_response_size_bytes", (("view", view),), len(response.content), metrics.SIZE_BUCKETS)
+        metrics.registry.flush()
+        return response
+
+class NPlusOneMiddleware:
+    """ Middleware reporting query shapes a request repeats more than `N_PLUS_ONE_THRESHOLD` times, see `nplusone.py` """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not getattr(settings, "N_PLUS_ONE_DETECTION", False):
+            return self.get_response(request)
+        with detect_n_plus_one("%s %s" % (request.method, request.path)):
+            return self.get_response(request)
+
+class SlowQueryMiddleware:
+    """ Middleware recording queries slower than `SLOW_QUERY_THRESHOLD` seconds, see `workout/slow_queries.py`; off if it's `None` """
+
+    def __init__(self, get_response):
+        if slow_queries.get_threshold() is None:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with slow_queries.record_slow_queries(request):
+            return self.get_response(request)
+
+class RequestLogMiddleware:
+    """ Middleware writing a sampled JSON line per request, see `workout/request_log.py` """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not request_log.logger.isEnabledFor(logging.INFO):
+            return self.get_response(request)
+        started_at = time.perf_counter()
+        with request_log.recording() as record:
+            response = self.get_response(request)
+        request_log.log_request(request, response, record, time.perf_counter() - started_at)
+        return response
@@ -0,0 +1,113 @@
+"""
+nplusone.py
+
+Detects N+1 queries: the same SQL shape run over and over in one request, typically by touching
+a relation of every object of a loop.
+
+Every query is reduced to a fingerprint (parameters, literals and `IN (...)` lists are masked), and
+counted per request. Shapes run more than `N_PLUS_ONE_THRESHOLD` times are reported with the
+project stack frames of their first run: logged as warnings, appended as JSON lines to
+`N_PLUS_ONE_REPORT` if set (for CI), and raised as `NPlusOneError` when `N_PLUS_ONE_STRICT` is on.
+"""
+
+import json
+import logging
+import os
+import re
+import traceback
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+FINGERPRINT_PATTERNS = [
+    (re.compile(r"'(?:[^']|'')*'"), "?"),
+    (re.compile(r"\b\d+(?:\.\d+)?\b"), "?"),
+    (re.compile(r"%s"), "?"),
+    (re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)"), "(...)"),
+    (re.compile(r"\s+"), " "),
+]
+
+
+class NPlusOneError(Exception):
+    """Raised in strict mode when a request repeats a query shape more than the threshold."""
+
+
+def fingerprint(sql):
+    """Returns the shape of a query, e.g. `SELECT ... WHERE "id" = ?` for any id."""
+    for pattern, replacement in FINGERPRINT_PATTERNS:
+        sql = pattern.sub(replacement, sql)
+    return sql.strip()
+
+
+def get_project_stack():
+    """Returns the calling frames from the project's own code, formatted, innermost last."""
+    base_dir = str(settings.BASE_DIR)
+    frames = [
+        frame for frame in traceback.extract_stack()[:-2]
+        if frame.filename.startswith(base_dir) and "site-packages" not in frame.filename and frame.filename != __file__
+    ]
+    return traceback.format_list(frames)
+
+
+class QueryCounter:
+    """`execute_wrapper` counting query fingerprints and keeping the stack of each shape's first run."""
+
+    def __init__(self):
+        self.counts = {}
+        self.stacks = {}
+
+    def __call__(self, execute, sql, params, many, context):
+        key = fingerprint(sql)
+        self.counts[key] = self.counts.get(key, 0) + 1
+        if key not in self.stacks:
+            self.stacks[key] = get_project_stack()
+        return execute(sql, params, many, context)
+
+    def findings(self, threshold):
+        """Returns `[{fingerprint, count, stack}]` of the shapes run more than `threshold` times."""
+        return [
+            {"fingerprint": key, "count": count, "stack": self.stacks[key]}
+            for key, count in sorted(self.counts.items(), key=lambda item: -item[1])
+            if count > threshold
+        ]
+
+
+def report(findings, label):
+    """Logs findings, appends them to `N_PLUS_ONE_REPORT` and raises in strict mode."""
+    if not findings:
+        return
+    for finding in findings:
+        logger.warning(
+            "Possible N+1 in %s: %d queries shaped like %s\n%s",
+            label, finding["count"], finding["fingerprint"], "".join(finding["stack"]),
+        )
+
+    path = getattr(settings, "N_PLUS_ONE_REPORT", None)
+    if path:
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, "a") as file:
+            for finding in findings:
+                file.write(json.dumps(dict(finding, label=label)) + "\n")
+
+    if getattr(settings, "N_PLUS_ONE_STRICT", False):
+        raise NPlusOneError("%s repeats %d queries shaped like %s" % (label, findings[0]["count"], findings[0]["fingerprint"]))
+
+
+@contextmanager
+def detect_n_plus_one(label, threshold=None):
+    """
+    Counts the queries run inside the block on every database alias and reports repeated shapes.
+
+    Usable directly in tests, e.g. `with detect_n_plus_one("statistics chart"): ...`.
+    """
+    counter = QueryCounter()
+    with ExitStack() as stack:
+        for alias in connections:
+            stack.enter_context(connections[alias].execute_wrapper(counter))
+        yield counter
+    if threshold is None:
+        threshold = getattr(settings, "N_PLUS_ONE_THRESHOLD", 5)
+    report(counter.findings(threshold), label)
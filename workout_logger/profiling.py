@@ -0,0 +1,153 @@
+"""
+profiling.py
+
+Profiles of single requests (see `middleware.ProfilingMiddleware`), to see why a page is slow in production.
+
+A request is profiled when it carries a signed `PROFILING_HEADER` (see `make_token()`), when an admin
+(a staff user logged in to `/admin`) adds `?<PROFILING_QUERY_PARAM>` to the URL, or when it's drawn
+by `PROFILING_SAMPLE_RATE`. `PROFILING_MODE` picks the profiler:
+
+- `cprofile`: deterministic profile of every function call, saved as `.pstats` (`python -m pstats`,
+  snakeviz, ...).
+- `sample`: the request's stack is sampled every `PROFILING_INTERVAL` seconds from another thread,
+  which adds little overhead, and saved as `.collapsed` stacks for flamegraph.pl or speedscope.
+
+Profiles are written to `PROFILING_DIR`, which keeps the newest `PROFILING_MAX_FILES` of at most
+`PROFILING_MAX_AGE` seconds. Only one request per process is profiled at a time.
+"""
+
+import cProfile
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core import signing
+
+SIGNING_SALT = "workout_logger.profiling"
+PROFILE_SUFFIXES = (".pstats", ".collapsed")
+
+_lock = threading.Lock()
+
+
+def make_token():
+    """Returns a value of `PROFILING_HEADER` that enables profiling for `PROFILING_TOKEN_MAX_AGE` seconds."""
+    return signing.dumps("profile", salt=SIGNING_SALT)
+
+
+def is_valid_token(token):
+    try:
+        return signing.loads(token, salt=SIGNING_SALT, max_age=getattr(settings, "PROFILING_TOKEN_MAX_AGE", 3600)) == "profile"
+    except signing.BadSignature:
+        return False
+
+
+def collapse(frame):
+    """Returns the stack of `frame` in the collapsed format, outermost call first: `a (file:1);b (file:7)`."""
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append("%s (%s:%d)" % (code.co_name, os.path.basename(code.co_filename), code.co_firstlineno))
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+class StackSampler:
+    """Counts the collapsed stacks of one thread, sampled every `interval` seconds from a background thread."""
+
+    def __init__(self, thread_id, interval):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                self.stacks[collapse(frame)] += 1
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        self._thread.join()
+
+    def dump(self, path):
+        with open(path, "w") as file:
+            for stack, count in self.stacks.most_common():
+                file.write("%s %d\n" % (stack, count))
+
+
+class CProfiler:
+    """`cProfile` with the interface of `StackSampler`."""
+
+    def __init__(self):
+        self.profile = cProfile.Profile()
+
+    def start(self):
+        self.profile.enable()
+
+    def stop(self):
+        self.profile.disable()
+
+    def dump(self, path):
+        self.profile.dump_stats(path)
+
+
+def get_profiler():
+    if getattr(settings, "PROFILING_MODE", "cprofile") == "sample":
+        return StackSampler(threading.get_ident(), getattr(settings, "PROFILING_INTERVAL", 0.005)), ".collapsed"
+    return CProfiler(), ".pstats"
+
+
+def prune(directory):
+    """Removes profiles older than `PROFILING_MAX_AGE` seconds, then the oldest beyond `PROFILING_MAX_FILES`."""
+    paths = [os.path.join(directory, name) for name in os.listdir(directory) if name.endswith(PROFILE_SUFFIXES)]
+    paths.sort(key=os.path.getmtime, reverse=True)
+    oldest = time.time() - getattr(settings, "PROFILING_MAX_AGE", 7 * 86400)
+    for index, path in enumerate(paths):
+        if index >= getattr(settings, "PROFILING_MAX_FILES", 100) or os.path.getmtime(path) < oldest:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                # Pruned by another process:
+                pass
+
+
+def profile_request(request, get_response):
+    """
+    Runs `get_response` under the configured profiler and saves the profile.
+
+    The response names the file in its `X-Profile` header. Requests arriving while another one is
+    profiled aren't profiled.
+    """
+    if not _lock.acquire(blocking=False):
+        return get_response(request)
+    try:
+        profiler, suffix = get_profiler()
+        started_at = time.perf_counter()
+        profiler.start()
+        try:
+            response = get_response(request)
+        finally:
+            profiler.stop()
+        elapsed = time.perf_counter() - started_at
+
+        directory = settings.PROFILING_DIR
+        os.makedirs(directory, exist_ok=True)
+        name = "%s_%d_%s_%dms%s" % (
+            time.strftime("%Y%m%d-%H%M%S"), os.getpid(),
+            re.sub(r"[^A-Za-z0-9]+", "-", request.path).strip("-") or "root", elapsed * 1000, suffix,
+        )
+        profiler.dump(os.path.join(directory, name))
+        prune(directory)
+    finally:
+        _lock.release()
+    response["X-Profile"] = name
+    return response